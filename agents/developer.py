@@ -1,4 +1,7 @@
 from crewai import Agent
+
+from observability import is_verbose
+
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -30,7 +33,7 @@ def create_developer(llm) -> Agent:
         你具备持续学习的能力，能够快速掌握新技术和工具。
         你善于与团队协作，能够进行有效的代码审查和技术分享。
         ''',
-        verbose=True,
+        verbose=is_verbose(),
         allow_delegation=False,
         llm=llm,
         max_iter=3,
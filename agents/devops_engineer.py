@@ -1,4 +1,7 @@
 from crewai import Agent
+
+from observability import is_verbose
+
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -30,7 +33,7 @@ def create_devops_engineer(llm) -> Agent:
         你具有安全意识，能够实施安全最佳实践，保护系统和数据安全。
         你善于自动化重复性工作，提高团队效率和系统可靠性。
         ''',
-        verbose=True,
+        verbose=is_verbose(),
         allow_delegation=False,
         llm=llm,
         max_iter=3,
@@ -1,6 +1,8 @@
 from crewai import Agent
 from typing import List, Optional
 
+from observability import is_verbose
+
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -24,7 +26,7 @@ def create_project_manager(llm) -> Agent:
         你具有出色的沟通协调能力，能够有效地管理跨职能团队。
         你注重质量控制和风险管理，确保项目按时交付。
         ''',
-        verbose=True,
+        verbose=is_verbose(),
         allow_delegation=True,  # 允许委派任务给其他智能体
         llm=llm,
         max_iter=3,
@@ -1,4 +1,7 @@
 from crewai import Agent
+
+from observability import is_verbose
+
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -28,7 +31,7 @@ def create_requirements_analyst(llm) -> Agent:
         你注重细节，善于发现需求中的矛盾和遗漏，确保需求的完整性和一致性。
         你具有良好的文档编写能力，能够产出高质量的需求文档。
         ''',
-        verbose=True,
+        verbose=is_verbose(),
         allow_delegation=False,
         llm=llm,
         max_iter=3,
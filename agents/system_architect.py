@@ -1,4 +1,7 @@
 from crewai import Agent
+
+from observability import is_verbose
+
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -29,7 +32,7 @@ def create_system_architect(llm) -> Agent:
         你注重系统的非功能性需求，如性能、安全性、可用性等。
         你善于权衡技术复杂度和业务价值，做出最优的架构决策。
         ''',
-        verbose=True,
+        verbose=is_verbose(),
         allow_delegation=False,
         llm=llm,
         max_iter=3,
@@ -1,4 +1,7 @@
 from crewai import Agent
+
+from observability import is_verbose
+
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -30,7 +33,7 @@ def create_test_engineer(llm) -> Agent:
         你注重测试效率，能够合理安排测试优先级，平衡测试覆盖率和时间成本。
         你具有良好的沟通能力，能够清晰地描述缺陷和测试结果。
         ''',
-        verbose=True,
+        verbose=is_verbose(),
         allow_delegation=False,
         llm=llm,
         max_iter=3,
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+确定性的模拟LLM
+
+替换 litellm.completion：按提示内容的哈希生成固定的响应（相同提示得到相同输出），
+响应长度和延迟可配置，不访问网络。LiteLLMWrapper 和 CrewAI 内置的 LLM 都经由 litellm.completion 调用模型，
+因此两条路径都会使用模拟响应。响应采用 CrewAI 智能体期望的 "Final Answer:" 格式；
+请求带有 tools（如 CrewAI 长期记忆的任务评估经 instructor 发起的结构化输出请求）时，
+返回调用第一个工具的 tool_call，参数按工具的JSON Schema填充空值
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+_WORDS = (
+    "系统", "模块", "接口", "数据", "服务", "用户", "需求", "设计", "测试", "部署", "缓存", "队列",
+    "database", "service", "api", "deployment", "latency", "throughput", "schema", "pipeline"
+)
+
+
+class FakeCompletion:
+    """
+    可调用对象，签名与 litellm.completion 兼容
+
+    response_tokens 为每次响应的token数（按词近似），latency 为每次调用的模拟延迟（秒），
+    jitter 为延迟的相对抖动幅度（按提示哈希确定，可复现）
+    """
+
+    def __init__(self, response_tokens: int = 400, latency: float = 0.0, jitter: float = 0.0, sections: int = 4):
+        self.response_tokens = response_tokens
+        self.latency = latency
+        self.jitter = jitter
+        self.sections = sections
+        self.calls = 0
+        self.simulated_seconds = 0.0
+        self._lock = threading.Lock()
+        self._original = None
+
+    def _seed(self, messages: List[Dict[str, Any]]) -> int:
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        return int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'big')
+
+    def render(self, seed: int) -> str:
+        rng = random.Random(seed)
+        per_section = max(1, self.response_tokens // max(1, self.sections))
+        body = "\n\n".join(
+            f"## 第{index + 1}部分\n" + " ".join(rng.choice(_WORDS) for _ in range(per_section))
+            for index in range(self.sections)
+        )
+        return f"Thought: I now can give a great answer\nFinal Answer: {body}"
+
+    def _delay(self, seed: int) -> float:
+        if not self.latency:
+            return 0.0
+        spread = (seed % 2001 - 1000) / 1000 * self.jitter
+        return max(0.0, self.latency * (1 + spread))
+
+    @staticmethod
+    def _empty_value(schema: Dict[str, Any]) -> Any:
+        kind = schema.get("type")
+        if kind == "object" or "properties" in schema:
+            return {name: FakeCompletion._empty_value(prop) for name, prop in schema.get("properties", {}).items()}
+        return {"array": [], "string": "", "number": 0, "integer": 0, "boolean": False}.get(kind)
+
+    def _tool_call(self, tool: Dict[str, Any], seed: int) -> Any:
+        function = tool.get("function", tool)
+        arguments = json.dumps(self._empty_value(function.get("parameters", {})), ensure_ascii=False)
+        return SimpleNamespace(id=f"call-{seed:x}", type="function",
+                               function=SimpleNamespace(name=function.get("name", ""), arguments=arguments))
+
+    def __call__(self, model: str = "", messages: Optional[List[Dict[str, Any]]] = None, stream: bool = False,
+                 **kwargs: Any) -> Any:
+        messages = messages or []
+        seed = self._seed(messages)
+        delay = self._delay(seed)
+        with self._lock:
+            self.calls += 1
+            self.simulated_seconds += delay
+        if delay:
+            time.sleep(delay)
+        content = self.render(seed)
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+        if stream:
+            return self._stream(content)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=self.response_tokens,
+                                total_tokens=prompt_tokens + self.response_tokens)
+        tools = kwargs.get("tools")
+        if tools:
+            message = SimpleNamespace(content=None, role="assistant", tool_calls=[self._tool_call(tools[0], seed)],
+                                      function_call=None)
+        else:
+            message = SimpleNamespace(content=content, role="assistant", tool_calls=None, function_call=None)
+        choice = SimpleNamespace(message=message, finish_reason="tool_calls" if tools else "stop", index=0)
+        return SimpleNamespace(choices=[choice], usage=usage, model=model, id=f"fake-{seed:x}")
+
+    @staticmethod
+    def _stream(content: str, chunk_chars: int = 64) -> Iterator[Any]:
+        for offset in range(0, len(content), chunk_chars):
+            delta = SimpleNamespace(content=content[offset:offset + chunk_chars], role="assistant", tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None, index=0)])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=None),
+                                                       finish_reason="stop", index=0)])
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {"calls": self.calls, "simulated_seconds": self.simulated_seconds}
+
+    def install(self) -> 'FakeCompletion':
+        """
+        替换 litellm.completion，uninstall() 恢复
+        """
+        import litellm
+        self._original = litellm.completion
+        litellm.completion = self
+        return self
+
+    def uninstall(self) -> None:
+        import litellm
+        if self._original is not None:
+            litellm.completion = self._original
+            self._original = None
+
+    def __enter__(self) -> 'FakeCompletion':
+        return self.install()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.uninstall()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编排开销基准测试
+
+使用确定性的模拟LLM（benchmarks/fake_llm.py，响应长度和延迟可配置，不访问网络），测量：
+- 构造：工作流（含全部智能体）和各阶段Crew的创建耗时
+- 阶段开销：各阶段 run_phase 的墙钟耗时减去模拟的模型延迟，即 CrewAI 与本项目代码的编排开销
+- 内存：连续运行多次完整流程后每次运行的内存增长（tracemalloc）
+- 吞吐：1 到 N 个并发工作流时每秒完成的流程数和流程耗时 p95
+
+结果写入JSON；指定 --baseline 时与基线逐项比较，超出容差的指标标记为回归并以退出码1结束。
+运行期间工作目录切换到临时目录，产物、索引、追踪、日志和CrewAI记忆不会写入项目目录或用户数据目录
+
+用法:
+    python benchmarks/orchestration_bench.py --latency 0.05 --concurrency 1 2 4 8 --save-baseline bench_baseline.json
+    python benchmarks/orchestration_bench.py --latency 0.05 --concurrency 1 2 4 8 --baseline bench_baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# 离线运行：不上报遥测、不下载模型价格表；LiteLLMWrapper 需要非空的API密钥
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from benchmarks.fake_llm import FakeCompletion
+from config import Config
+from litellm_wrapper import LiteLLMWrapper
+from observability import get_tracer, setup_logging
+from storage import get_metrics_dataset
+from workflows import create_software_development_workflow
+
+PROJECT_DESCRIPTION = """
+开发一个在线图书管理系统：图书检索与借阅、读者管理、逾期提醒和统计报表，
+需要支持 1000 个并发用户，使用 PostgreSQL 和 Redis，部署到 Kubernetes
+"""
+
+# 阶段名 -> 根据前序阶段输出创建Crew
+PIPELINE: List[Tuple[str, Callable[[Any, Dict[str, str]], Any]]] = [
+    ("initiation", lambda workflow, outputs: workflow.create_project_initiation_crew(PROJECT_DESCRIPTION)),
+    ("requirements", lambda workflow, outputs: workflow.create_requirements_analysis_crew(PROJECT_DESCRIPTION)),
+    ("system_design", lambda workflow, outputs: workflow.create_system_design_crew(outputs["requirements"])),
+    ("development", lambda workflow, outputs: workflow.create_development_crew(outputs["system_design"])),
+    ("testing", lambda workflow, outputs: workflow.create_testing_crew(outputs["requirements"],
+                                                                      outputs["system_design"])),
+    ("deployment", lambda workflow, outputs: workflow.create_deployment_crew(outputs["system_design"])),
+]
+
+# 低于该绝对变化量的差异视为噪声，不判定为回归（按指标单位）
+NOISE_FLOOR = {"ms": 1.0, "KiB": 64.0}
+
+# 构造基准中代替前序阶段输出的文档
+PLACEHOLDER_OUTPUTS = {name: f"## {name}\n" + "占位内容 " * 200 for name, _ in PIPELINE}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def metric(value: float, unit: str, better: str = "lower") -> Dict[str, Any]:
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def run_pipeline(llm, fake: Optional[FakeCompletion] = None) -> Dict[str, Dict[str, float]]:
+    """
+    完整运行一次流程；提供 fake 时按阶段记录墙钟耗时、模拟延迟和调用数（仅在串行运行时准确）
+    """
+    workflow = create_software_development_workflow(llm)
+    workflow.start_run("bench", description=PROJECT_DESCRIPTION)
+    outputs: Dict[str, str] = {}
+    phases: Dict[str, Dict[str, float]] = {}
+    for name, build in PIPELINE:
+        before = fake.snapshot() if fake is not None else None
+        started = time.perf_counter()
+        outputs[name] = str(workflow.run_phase(name, build(workflow, outputs)))
+        seconds = time.perf_counter() - started
+        if before is not None:
+            after = fake.snapshot()
+            simulated = after["simulated_seconds"] - before["simulated_seconds"]
+            phases[name] = {"seconds": seconds, "simulated_seconds": simulated,
+                            "calls": after["calls"] - before["calls"]}
+        else:
+            phases[name] = {"seconds": seconds}
+    workflow.finish_run()
+    return phases
+
+
+def bench_construction(llm, iterations: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    samples = []
+    workflow = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        workflow = create_software_development_workflow(llm)
+        samples.append(time.perf_counter() - started)
+    results["construction.workflow_ms"] = metric(statistics.median(samples) * 1000, "ms")
+    print(f"\n🏗️  构造耗时（中位数，{iterations} 次）")
+    print(f"  {'工作流（6个智能体）':<24}{statistics.median(samples) * 1000:>10.2f} ms")
+    for name, build in PIPELINE:
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            build(workflow, PLACEHOLDER_OUTPUTS)
+            samples.append(time.perf_counter() - started)
+        results[f"construction.crew.{name}_ms"] = metric(statistics.median(samples) * 1000, "ms")
+        print(f"  {'Crew ' + name:<24}{statistics.median(samples) * 1000:>10.2f} ms")
+    return results
+
+
+def bench_phases(llm, fake: FakeCompletion, repeats: int) -> Dict[str, Dict[str, Any]]:
+    runs = [run_pipeline(llm, fake) for _ in range(repeats)]
+    results = {}
+    print(f"\n⏱️  阶段开销（{repeats} 次运行的中位数，开销 = 墙钟耗时 - 模拟模型延迟）")
+    print(f"  {'阶段':<16}{'调用':>6}{'墙钟(ms)':>12}{'模型(ms)':>12}{'开销(ms)':>12}")
+    total_overhead = 0.0
+    for name, _ in PIPELINE:
+        wall = statistics.median(run[name]["seconds"] for run in runs) * 1000
+        simulated = statistics.median(run[name]["simulated_seconds"] for run in runs) * 1000
+        calls = statistics.median(run[name]["calls"] for run in runs)
+        overhead = max(0.0, statistics.median(
+            (run[name]["seconds"] - run[name]["simulated_seconds"]) * 1000 for run in runs
+        ))
+        total_overhead += overhead
+        results[f"phase.{name}.overhead_ms"] = metric(overhead, "ms")
+        results[f"phase.{name}.llm_calls"] = metric(calls, "calls")
+        print(f"  {name:<16}{calls:>6.1f}{wall:>12.1f}{simulated:>12.1f}{overhead:>12.1f}")
+    results["pipeline.overhead_ms"] = metric(total_overhead, "ms")
+    print(f"  {'合计':<16}{'':>6}{'':>12}{'':>12}{total_overhead:>12.1f}")
+    return results
+
+
+def bench_memory(llm, runs: int) -> Dict[str, Dict[str, Any]]:
+    tracemalloc.start()
+    try:
+        run_pipeline(llm)  # 预热：导入、缓存和单例的一次性分配不计入增长
+        gc.collect()
+        tracemalloc.reset_peak()
+        start = tracemalloc.take_snapshot()
+        for _ in range(runs):
+            run_pipeline(llm)
+        gc.collect()
+        end = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    differences = end.compare_to(start, "filename")
+    growth = sum(difference.size_diff for difference in differences) / 1024 / runs
+    print(f"\n🧠 内存（预热后连续运行 {runs} 次）")
+    print(f"  每次运行增长: {growth:.1f} KiB，峰值: {peak / 1024:.1f} KiB")
+    for difference in differences[:5]:
+        print(f"    {difference.size_diff / 1024 / runs:+.1f} KiB/次  {difference.traceback[0].filename}")
+    return {
+        "memory.growth_kib_per_run": metric(growth, "KiB"),
+        "memory.peak_kib": metric(peak / 1024, "KiB")
+    }
+
+
+def bench_throughput(llm, levels: List[int], runs_per_worker: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    print(f"\n🚀 并发吞吐（每个并发度运行 并发数 x {runs_per_worker} 个完整流程）")
+    print(f"  {'并发':>6}{'流程/秒':>12}{'p50(ms)':>12}{'p95(ms)':>12}")
+    for level in levels:
+        def timed_pipeline(_: int) -> float:
+            started = time.perf_counter()
+            run_pipeline(llm)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            durations = list(executor.map(timed_pipeline, range(level * runs_per_worker)))
+        elapsed = time.perf_counter() - started
+        throughput = len(durations) / elapsed
+        results[f"throughput.c{level}.workflows_per_s"] = metric(throughput, "workflows/s", "higher")
+        results[f"throughput.c{level}.p95_ms"] = metric(percentile(durations, 0.95) * 1000, "ms")
+        print(f"  {level:>6}{throughput:>12.2f}{percentile(durations, 0.5) * 1000:>12.1f}"
+              f"{percentile(durations, 0.95) * 1000:>12.1f}")
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    逐项与基线比较：lower 指标超过基线 (1 + tolerance) 倍、higher 指标低于 (1 - tolerance) 倍时视为回归，
+    绝对变化小于 NOISE_FLOOR 的不计
+    """
+    rows = []
+    for name, entry in current["metrics"].items():
+        reference = baseline["metrics"].get(name)
+        if reference is None:
+            continue
+        base, value = reference["value"], entry["value"]
+        change = (value - base) / base if base else 0.0
+        if entry["better"] == "lower":
+            regressed = value > base * (1 + tolerance)
+        else:
+            regressed = value < base * (1 - tolerance)
+        regressed = regressed and abs(value - base) >= NOISE_FLOOR.get(entry["unit"], 0.0)
+        rows.append({"metric": name, "baseline": base, "current": value, "change": change,
+                     "unit": entry["unit"], "regressed": regressed})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], tolerance: float) -> None:
+    print(f"\n📊 与基线比较（容差 {tolerance:.0%}）")
+    print(f"  {'指标':<40}{'基线':>12}{'本次':>12}{'变化':>10}")
+    for row in rows:
+        flag = "  ⚠️ 回归" if row["regressed"] else ""
+        print(f"  {row['metric']:<40}{row['baseline']:>12.2f}{row['current']:>12.2f}{row['change']:>+10.1%}{flag}")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="编排开销基准测试（模拟LLM，离线运行）")
+    parser.add_argument("--model", default="gemini/gemini-1.5-flash", help="传给 LiteLLMWrapper 的模型名")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次模拟模型调用的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的相对抖动幅度，如 0.2 表示 ±20%%")
+    parser.add_argument("--response-tokens", type=int, default=400, help="每次模拟响应的token数")
+    parser.add_argument("--iterations", type=int, default=20, help="构造基准的重复次数")
+    parser.add_argument("--repeats", type=int, default=5, help="阶段开销基准的流程运行次数")
+    parser.add_argument("--memory-runs", type=int, default=5, help="内存基准的流程运行次数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="吞吐基准的并发度")
+    parser.add_argument("--runs-per-worker", type=int, default=2, help="吞吐基准中每个并发度的流程数 = 并发数 x 该值")
+    parser.add_argument("--no-memory", action="store_true", help="关闭Crew记忆（CREW_CONFIG['memory']）")
+    parser.add_argument("--output", help="结果JSON路径，默认 results/benchmarks/orchestration-<时间>.json")
+    parser.add_argument("--baseline", help="与该基线JSON比较，存在回归时退出码为1")
+    parser.add_argument("--save-baseline", metavar="PATH", help="把本次结果另存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="回归判定的相对容差")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    output = os.path.abspath(args.output or os.path.join(
+        project_root, "results", "benchmarks", f"orchestration-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    ))
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    save_baseline = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    if args.no_memory:
+        Config.CREW_CONFIG["memory"] = False
+
+    fake = FakeCompletion(response_tokens=args.response_tokens, latency=args.latency, jitter=args.jitter)
+    metrics: Dict[str, Dict[str, Any]] = {}
+    original_cwd = os.getcwd()
+    original_storage = os.environ.get("CREWAI_STORAGE_DIR")
+    with tempfile.TemporaryDirectory(prefix="orchestration-bench-") as workdir, fake:
+        os.chdir(workdir)
+        # CrewAI 的长期记忆SQLite位于用户数据目录下以该变量命名的子目录，绝对路径使其落在临时目录中，
+        # 否则每次运行都会留下一个目录，且历史记忆会进入提示、影响结果的可复现性
+        os.environ["CREWAI_STORAGE_DIR"] = os.path.join(workdir, "crewai")
+        try:
+            setup_logging()
+            llm = LiteLLMWrapper(model=args.model)
+            metrics.update(bench_construction(llm, args.iterations))
+            metrics.update(bench_phases(llm, fake, args.repeats))
+            latency = fake.latency
+            fake.latency = 0.0  # 内存增长与模型延迟无关，跳过等待
+            metrics.update(bench_memory(llm, args.memory_runs))
+            fake.latency = latency
+            metrics.update(bench_throughput(llm, args.concurrency, args.runs_per_worker))
+        finally:
+            # 在临时目录删除前写出缓冲的追踪和指标，避免进程退出时写入项目目录
+            get_tracer().flush()
+            dataset = get_metrics_dataset()
+            if dataset is not None:
+                dataset.flush()
+            os.chdir(original_cwd)
+            if original_storage is None:
+                os.environ.pop("CREWAI_STORAGE_DIR", None)
+            else:
+                os.environ["CREWAI_STORAGE_DIR"] = original_storage
+
+    try:
+        import crewai
+        crewai_version = getattr(crewai, "__version__", "")
+    except ImportError:
+        crewai_version = ""
+    results = {
+        "benchmark": "orchestration",
+        "created_at": datetime.now().isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "crewai": crewai_version},
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "save_baseline")},
+        "metrics": metrics
+    }
+    for path in filter(None, (output, save_baseline)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 结果已写入: {output}")
+
+    if baseline_path is None:
+        return 0
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("parameters") != results["parameters"]:
+        print("⚠️ 基线的运行参数与本次不同，比较结果仅供参考")
+    rows = compare(results, baseline, args.tolerance)
+    print_comparison(rows, args.tolerance)
+    regressions = [row["metric"] for row in rows if row["regressed"]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} 项指标回归: {', '.join(regressions)}")
+        return 1
+    print("\n✅ 未发现回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
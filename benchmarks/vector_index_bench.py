@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量索引基准测试
+
+生成带聚类结构的随机归一化向量，比较精确检索（VectorIndex）与IVF近似检索（IVFIndex）的
+批量查询吞吐（QPS）和近似检索的 recall@k（以精确检索结果为基准）
+
+用法: python benchmarks/vector_index_bench.py --size 100000 --queries 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from storage.vector_index import IVFIndex, VectorIndex
+from utils.embedding import NUMPY_AVAILABLE, np
+
+
+def make_dataset(size: int, dim: int, clusters: int, seed: int = 0):
+    """
+    生成围绕若干随机中心分布的归一化向量
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size)] + 1.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_search(index, queries, k: int, batch_size: int, **kwargs):
+    results = []
+    started = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        results.extend(index.search(queries[offset:offset + batch_size], k, **kwargs))
+    return results, time.perf_counter() - started
+
+
+def recall_at_k(approximate, exact) -> float:
+    hits = sum(len({vector_id for vector_id, _ in a} & {vector_id for vector_id, _ in e})
+               for a, e in zip(approximate, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引基准测试")
+    parser.add_argument("--size", type=int, default=100000, help="索引中的向量数")
+    parser.add_argument("--dim", type=int, default=256, help="向量维度")
+    parser.add_argument("--queries", type=int, default=1000, help="查询数")
+    parser.add_argument("--k", type=int, default=10, help="top-k")
+    parser.add_argument("--batch-size", type=int, default=64, help="每批查询数")
+    parser.add_argument("--n-lists", type=int, default=256, help="IVF簇数")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16, 32], help="IVF探测簇数")
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        print("❌ 基准测试需要安装 numpy: pip install numpy")
+        return 1
+
+    data = make_dataset(args.size + args.queries, args.dim, clusters=args.n_lists * 2)
+    vectors, queries = data[:args.size], data[args.size:]
+    ids = list(range(args.size))
+
+    started = time.perf_counter()
+    exact_index = VectorIndex(args.dim)
+    exact_index.add(ids, vectors)
+    print(f"精确索引构建: {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    ivf_index = IVFIndex(args.dim, n_lists=args.n_lists, train_size=args.size)
+    ivf_index.add(ids, vectors)
+    print(f"IVF索引构建（含训练）: {time.perf_counter() - started:.2f}s")
+
+    exact, seconds = timed_search(exact_index, queries, args.k, args.batch_size)
+    print(f"\n{'索引':<16}{'recall@' + str(args.k):>12}{'QPS':>12}")
+    print(f"{'exact':<16}{1.0:>12.3f}{len(queries) / seconds:>12.0f}")
+    for n_probe in args.n_probe:
+        approximate, seconds = timed_search(ivf_index, queries, args.k, args.batch_size, n_probe=n_probe)
+        print(f"{'ivf n_probe=' + str(n_probe):<16}{recall_at_k(approximate, exact):>12.3f}"
+              f"{len(queries) / seconds:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,9 +22,12 @@ class Config:
     DEFAULT_TEMPERATURE = 0.7
     MAX_TOKENS = 4096
     
+    # 全局verbose开关：控制Agent和Crew的控制台输出，可通过环境变量 CREWAI_VERBOSE=1 开启
+    VERBOSE = os.getenv("CREWAI_VERBOSE", "").lower() in ("1", "true", "yes")
+    
     # 智能体配置
     AGENT_CONFIG = {
-        "verbose": True,
+        "verbose": VERBOSE,
         "allow_delegation": False,
         "max_iter": 3,
         "memory": True
@@ -32,19 +35,129 @@ class Config:
     
     # 任务配置
     TASK_CONFIG = {
-        "verbose": True,
+        "verbose": VERBOSE,
         "async_execution": False
     }
     
     # Crew配置
     CREW_CONFIG = {
-        "verbose": True,
+        "verbose": VERBOSE,
         "memory": True,
         "cache": True,
         "max_rpm": 10,
         "share_crew": False
     }
     
+    # 智能体记忆配置：长时间运行时限制记忆规模，避免检索变慢
+    MEMORY_CONFIG = {
+        "backend": "bounded",  # bounded：有界内存存储；mmap：多进程共享的内存映射存储；crewai：CrewAI默认存储
+        "namespace": "default",  # 记忆命名空间，不同项目的记忆互相隔离
+        "max_items": 500,  # 每个命名空间每类记忆的最大条目数
+        "max_age_seconds": 6 * 3600,  # 条目存活时间，0表示不过期
+        "eviction": "lru",  # 淘汰策略：lru（最久未使用）或 importance（重要性最低）
+        "retrieval": "auto"  # 检索方式：vector（本地向量索引）、ngram（字符n-gram集合）或 auto（有numpy时用vector）
+    }
+    
+    # 本地向量索引配置
+    VECTOR_INDEX_CONFIG = {
+        "dim": 256,  # 哈希n-gram向量维度
+        "approximate": False,  # 是否使用IVF近似检索（需要numpy），适用于大规模存储
+        "n_lists": 256,  # IVF簇数
+        "n_probe": 8,  # 查询时扫描的簇数
+        "train_size": 20000  # 向量数达到该值时训练簇中心
+    }
+    
+    # 内存映射存储配置：多个工作进程共享同一份记忆与检索数据
+    MMAP_STORE_CONFIG = {
+        "base_dir": "results/mmap_store",
+        "segment_rows": 65536,  # 每个段的最大行数，写满后新建段
+        "compact_ratio": 0.3  # 已删除行占比超过该值时压缩
+    }
+    
+    # 产物存储配置：阶段输出按内容哈希压缩存储，运行只保存引用
+    ARTIFACT_STORE_CONFIG = {
+        "root": "results/artifacts",
+        "compression": "zstd",  # zstd（需要安装zstandard，否则退化为gzip）或 gzip
+        "compression_level": 9,
+        "max_bytes": 1024 * 1024 * 1024,  # 对象总大小配额，超出时删除最旧的运行
+        "keep_min_runs": 20,  # 配额回收时至少保留的最近运行数
+        "gc_grace_seconds": 3600  # 最近写入的未引用对象在该时间内不回收
+    }
+    
+    # 流式结果写入配置：阶段输出边生成边写入运行目录，完成时原子重命名
+    RESULT_WRITER_CONFIG = {
+        "enabled": True,
+        "output_dir": "results/runs",  # 输出写入 <output_dir>/<运行ID>/<阶段>.md
+        "fsync_bytes": 64 * 1024,  # 累计未同步字节数达到该值时fsync
+        "fsync_interval": 1.0  # 距上次fsync超过该秒数时fsync
+    }
+    
+    # 历史运行检索索引配置
+    RUN_INDEX_CONFIG = {
+        "enabled": True,
+        "db_path": "results/run_index.db",
+        "limit": 20,  # 默认返回的结果数
+        "snippet_tokens": 16  # 结果摘要的长度（词数）
+    }
+    
+    # 列式运行指标配置：每次LLM调用和阶段执行记录一行，按天分区写入
+    METRICS_DATASET_CONFIG = {
+        "enabled": True,
+        "root": "results/metrics",
+        "format": "parquet",  # parquet 或 arrow（Arrow IPC），需要pyarrow，未安装时退化为jsonl
+        "flush_rows": 500,  # 缓冲达到该行数时写出一个分片
+        "flush_seconds": 60  # 距上次写出超过该秒数时写出一个分片
+    }
+    
+    # 链路追踪配置：workflow / phase / task / llm 层级的span写入本地文件
+    TRACING_CONFIG = {
+        "enabled": True,
+        "exporter": "jsonl",  # jsonl（每行一个span）或 otlp（OTLP/JSON，每行一个导出请求）
+        "path": "logs/traces.jsonl",
+        "batch_size": 64,  # 累计结束的span数达到该值时写出；根span结束时立即写出
+        "service_name": "crewai-software-workflow"
+    }
+    
+    # 用量预算配置：单次运行的token和成本上限（None表示不限制）
+    BUDGET_CONFIG = {
+        "max_tokens_per_run": None,
+        "max_cost_per_run": None,  # 美元
+        "action": "downgrade",  # 超出预算后：abort 中止运行；downgrade 后续调用改用 downgrade_model
+        "downgrade_model": "gemini/gemini-1.5-flash-8b",
+        # 模型单价（美元/百万token）：(输入, 输出)
+        "prices": {
+            "gemini/gemini-1.5-pro": (1.25, 5.0),
+            "gemini/gemini-1.5-flash": (0.075, 0.3),
+            "gemini/gemini-1.5-flash-8b": (0.0375, 0.15),
+            "gemini-pro": (0.5, 1.5),
+            "gpt-4o": (2.5, 10.0),
+            "gpt-4o-mini": (0.15, 0.6),
+            "gpt-3.5-turbo": (0.5, 1.5)
+        }
+    }
+    
+    # 运行时指标配置：开启后在本机提供 Prometheus 文本格式的 /metrics 端点
+    METRICS_CONFIG = {
+        "enabled": os.getenv("CREWAI_METRICS_ENABLED", "").lower() in ("1", "true", "yes"),
+        "host": "127.0.0.1",
+        "port": int(os.getenv("CREWAI_METRICS_PORT", "9464")),
+        "namespace": "crewai",
+        # 耗时直方图的桶上限（秒）
+        "latency_buckets": (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+    }
+    
+    # 运行剖析配置：开启后每次运行的CPU剖析、内存快照和墙钟折叠栈写入 output_dir/<运行ID>/
+    PROFILING_CONFIG = {
+        "enabled": os.getenv("CREWAI_PROFILE", "").lower() in ("1", "true", "yes"),
+        "output_dir": "results/profiles",
+        "cpu": True,
+        "memory": True,
+        "wall": True,
+        "sample_interval": 0.005,  # 墙钟采样间隔（秒）
+        "tracemalloc_frames": 10,
+        "top_n": 30
+    }
+    
     # 项目配置
     PROJECT_CONFIG = {
         "default_language": "zh-CN",
@@ -56,18 +169,83 @@ class Config:
     # 工作流配置
     WORKFLOW_CONFIG = {
         "enable_parallel_execution": False,
+        "max_parallel_workers": 4,
         "auto_save_results": True,
         "result_format": "detailed",
         "enable_progress_tracking": True
     }
     
+    # 代码审查配置
+    CODE_REVIEW_CONFIG = {
+        "max_tokens_per_shard": 6000,  # 每个审查分片的token预算
+        "parallel": True,  # 是否并行审查各分片（不受 WORKFLOW_CONFIG["enable_parallel_execution"] 影响）
+        "group_by": "module"  # 分片方式：file（按文件）或 module（按目录）
+    }
+    
+    # 测试子工作流配置
+    TESTING_PIPELINE_CONFIG = {
+        "max_concurrency": 4  # 测试设计/执行任务的最大并发数
+    }
+    
+    # 回归测试配置
+    REGRESSION_CONFIG = {
+        "baseline_dir": "results/regression"  # 按组件索引的回归测试基线存放目录
+    }
+    
+    # 提前终止配置：必需章节全部完成后停止生成
+    EARLY_STOP_CONFIG = {
+        "closing_markers": ["---", "***", "___", "（完）", "全文完", "END"]  # 单独成行时视为文档结束的标记
+    }
+    
+    # 自适应max_tokens配置：按任务和模型的历史输出长度设置生成预算
+    ADAPTIVE_TOKENS_CONFIG = {
+        "history_path": "results/token_history.jsonl",
+        "window": 200,  # 每个任务/模型保留的最近样本数
+        "compact_every": 1000,  # 历史文件追加这么多条样本后压缩为快照
+        "min_samples": 5,  # 样本数不足时使用固定的max_tokens
+        "percentile": 0.95,
+        "safety_margin": 1.2,
+        "min_tokens": 256,
+        "max_tokens": 8192,
+        "max_continuations": 2  # 输出被截断时最多续写的次数
+    }
+    
+    # 本地质量预检配置：明显不合格的输出不再花费LLM评审调用
+    QUALITY_GATE_CONFIG = {
+        "min_coverage": 1.0,  # 必需章节的最低覆盖率
+        "min_tokens": 200,  # 整份文档的token下限
+        "max_tokens": 20000,  # 整份文档的token上限
+        "min_language_ratio": 0.3,  # 中文项目中中文字符在文字中的最低占比
+        "max_duplicate_ratio": 0.3,  # 重复段落占比上限
+        "log_path": "logs/quality_gate.jsonl"  # 预检结论日志，用于与LLM评审结论对照校准
+    }
+    
+    # 项目模板预热缓存配置
+    TEMPLATE_CACHE_CONFIG = {
+        "cache_dir": "results/template_cache"  # 按模板存放预先生成的系统设计、部署方案和测试计划基线
+    }
+    
+    # 历史项目检索配置：检索相似的历史项目作为需求分析的参考
+    PROJECT_INDEX_CONFIG = {
+        "db_path": "results/project_index.db",
+        "dim": 256,  # 哈希n-gram向量维度
+        "top_k": 3,  # 附加到提示中的参考项目数
+        "min_score": 0.3,  # 最低相似度，低于该值的项目不作为参考
+        "query_terms": 8,  # 召回时使用的低频三元组数量
+        "candidates": 200,  # 全文索引召回的候选数，再按向量相似度重排
+        "excerpt_tokens": 400  # 每个阶段输出保存的摘录长度
+    }
+    
     # 日志配置
     LOGGING_CONFIG = {
         "level": "INFO",
         "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         "file_path": "logs/crewai.log",
         "max_file_size": "10MB",
-        "backup_count": 5
+        "backup_count": 5,
+        "queue_size": 10000,  # 日志队列容量，写入线程跟不上时丢弃新日志而不阻塞调用方
+        "max_message_chars": 4000,  # 超过该长度的日志视为大段输出
+        "large_payload_sample_rate": 0.1  # 大段输出保留完整内容的比例，其余截断
     }
     
     @classmethod
@@ -17,6 +17,7 @@ except ImportError:
     except ImportError:
         pass  # 将在运行时处理
 from workflows import create_software_development_workflow
+from observability import render_usage_summary, setup_logging
 
 def main():
     """
@@ -50,6 +51,9 @@ def main():
         # 这里可以使用模拟LLM或退出
         return
     
+    # 执行过程写入日志文件，设置 CREWAI_VERBOSE=1 时同时输出到控制台
+    setup_logging()
+    
     # 创建工作流实例
     workflow = create_software_development_workflow(llm)
     
@@ -72,6 +76,8 @@ def main():
     - 响应式设计，支持移动端
     """
     
+    workflow.start_run("example", description=project_description)
+    
     print("=" * 80)
     print("CrewAI 软件开发全流程管理系统示例")
     print("=" * 80)
@@ -84,7 +90,7 @@ def main():
             project_description=project_description,
             stakeholder_info="产品经理、开发团队、测试团队、运维团队"
         )
-        initiation_result = initiation_crew.kickoff()
+        initiation_result = workflow.run_phase("initiation", initiation_crew)
         print(f"项目启动结果:\n{initiation_result}")
         
         # 阶段2: 需求分析
@@ -93,7 +99,7 @@ def main():
         requirements_crew = workflow.create_requirements_analysis_crew(
             project_description=project_description
         )
-        requirements_result = requirements_crew.kickoff()
+        requirements_result = workflow.run_phase("requirements", requirements_crew)
         print(f"需求分析结果:\n{requirements_result}")
         
         # 阶段3: 系统设计
@@ -102,7 +108,7 @@ def main():
         design_crew = workflow.create_system_design_crew(
             requirements_doc=str(requirements_result)
         )
-        design_result = design_crew.kickoff()
+        design_result = workflow.run_phase("system_design", design_crew)
         print(f"系统设计结果:\n{design_result}")
         
         # 阶段4: 开发规划
@@ -111,7 +117,7 @@ def main():
         development_crew = workflow.create_development_crew(
             technical_spec=str(design_result)
         )
-        development_result = development_crew.kickoff()
+        development_result = workflow.run_phase("development", development_crew)
         print(f"开发规划结果:\n{development_result}")
         
         # 阶段5: 测试规划
@@ -121,7 +127,7 @@ def main():
             requirements_doc=str(requirements_result),
             architecture_doc=str(design_result)
         )
-        testing_result = testing_crew.kickoff()
+        testing_result = workflow.run_phase("testing", testing_crew)
         print(f"测试规划结果:\n{testing_result}")
         
         # 阶段6: 部署规划
@@ -131,10 +137,14 @@ def main():
             architecture_doc=str(design_result),
             environment_requirements="云平台部署，支持自动扩缩容，高可用架构"
         )
-        deployment_result = deployment_crew.kickoff()
+        deployment_result = workflow.run_phase("deployment", deployment_crew)
         print(f"部署规划结果:\n{deployment_result}")
         
         print("\n✅ 软件开发全流程规划完成！")
+        print(render_usage_summary(workflow.finish_run()))
+        if workflow.run_id:
+            print(f"阶段输出已保存，运行ID: {workflow.run_id}")
+            print(f"输出目录: {os.path.dirname(workflow.phase_output_path('requirements'))}")
         print("=" * 80)
         
     except Exception as e:
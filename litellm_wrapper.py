@@ -7,8 +7,163 @@ CrewAI兼容的LiteLLM包装器
 """
 
 import os
+import threading
+import time
+import uuid
 import litellm
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import Config
+from utils import estimate_tokens
+from storage import record_metric
+from observability import current_span, get_metrics_registry, get_tracer, get_usage_tracker
+from observability.usage import call_cost
+
+# 输出因长度截断时用于续写的提示
+CONTINUE_PROMPT = "你的上一条回复因长度限制被截断。请从中断处继续输出，不要重复已经输出的内容，也不要添加任何说明。"
+
+_metrics = get_metrics_registry()
+LLM_CALLS = _metrics.counter("llm_calls_total", "LLM请求次数（续写的每次请求单独计数）", ("model", "status"))
+LLM_IN_FLIGHT = _metrics.gauge("llm_in_flight", "正在进行的LLM请求数", ("model",))
+LLM_RATE_LIMITED = _metrics.counter("llm_rate_limited_total", "被限流（HTTP 429）的LLM请求次数", ("model",))
+LLM_TOKENS = _metrics.counter("llm_tokens_total", "LLM请求的token数", ("model", "type"))
+LLM_LATENCY = _metrics.histogram("llm_latency_seconds", "LLM请求耗时（秒）", ("model",))
+
+try:
+    from litellm.integrations.custom_logger import CustomLogger as _CallbackBase
+    LITELLM_CALLBACKS_AVAILABLE = True
+except ImportError:
+    _CallbackBase = object
+    LITELLM_CALLBACKS_AVAILABLE = False
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    rate_limit_error = getattr(litellm, 'RateLimitError', None)
+    return (isinstance(rate_limit_error, type) and isinstance(error, rate_limit_error)) \
+        or getattr(error, 'status_code', None) == 429
+
+
+def _usage_value(usage: Any, key: str) -> int:
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return int(value or 0)
+
+
+class LLMCallHook(_CallbackBase):
+    """
+    litellm回调：把每次 litellm.completion 请求记入运行时指标、列式指标数据集和链路追踪
+
+    CrewAI的智能体和 LiteLLMWrapper 都经由 litellm.completion 调用模型，因此两条路径都会被记录。
+    litellm在线程池中执行成功回调，当前span和用量作用域在请求发出前（log_pre_api_call）记下，
+    按 litellm_call_id 与结束回调对应
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _call_id(kwargs: Dict[str, Any]) -> str:
+        return str(kwargs.get("litellm_call_id") or id(kwargs))
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        model = str(kwargs.get("model") or model)
+        metadata = (kwargs.get("litellm_params") or {}).get("metadata") or {}
+        LLM_IN_FLIGHT.labels(model).inc()
+        with self._lock:
+            self._calls[self._call_id(kwargs)] = {
+                "model": model,
+                "started": time.perf_counter(),
+                "start_ns": time.time_ns(),
+                "parent": current_span(),
+                "scope": get_usage_tracker().current_scope(),
+                "task_key": metadata.get("task_key"),
+                "continuation": metadata.get("continuation", 0),
+                "streamed": bool(kwargs.get("stream"))
+            }
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        usage = getattr(response_obj, 'usage', None) or {}
+        self.end_call(self._call_id(kwargs), "ok", _usage_value(usage, 'prompt_tokens'),
+                      _usage_value(usage, 'completion_tokens'))
+
+    def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        error = kwargs.get("exception")
+        self.end_call(self._call_id(kwargs), "error", error=error)
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_success_event(kwargs, response_obj, start_time, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+    def end_call(self, call_id: str, status: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                 error: Optional[BaseException] = None) -> None:
+        """
+        结束一次请求的记录；status 为 ok / error / stopped（调用方提前终止流式输出）
+        同一请求只记录一次，未经 log_pre_api_call 登记的请求忽略
+        """
+        with self._lock:
+            call = self._calls.pop(call_id, None)
+        if call is None:
+            return
+        model = call["model"]
+        latency = time.perf_counter() - call["started"]
+        LLM_IN_FLIGHT.labels(model).dec()
+        LLM_CALLS.labels(model, status).inc()
+        LLM_TOKENS.labels(model, "input").inc(prompt_tokens)
+        LLM_TOKENS.labels(model, "output").inc(completion_tokens)
+        LLM_LATENCY.labels(model).observe(latency)
+        if error is not None and _is_rate_limited(error):
+            LLM_RATE_LIMITED.labels(model).inc()
+        scope = call["scope"]
+        record_metric(
+            "llm_call", run_id=scope.get("run"), phase=scope.get("phase"), task_key=call["task_key"], model=model,
+            status=status,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens, latency_ms=latency * 1000,
+            continuations=call["continuation"], streamed=call["streamed"],
+            error=str(error) if error is not None else None
+        )
+        span = get_tracer().start_span(
+            "llm.completion", kind="llm", parent=call["parent"], start_ns=call["start_ns"],
+            attributes={
+                "gen_ai.request.model": model,
+                "llm.cost_usd": call_cost(model, prompt_tokens, completion_tokens),
+                "gen_ai.usage.input_tokens": prompt_tokens,
+                "gen_ai.usage.output_tokens": completion_tokens,
+                "llm.calls": 1,
+                "llm.retries": call["continuation"],
+                "llm.continuation": call["continuation"],
+                "llm.streamed": call["streamed"],
+                "task_key": call["task_key"] or ""
+            }
+        )
+        if status == "error":
+            span.set_status("ERROR", str(error or ""))
+        elif status == "stopped":
+            span.set_attribute("llm.stopped_early", True)
+        span.end(call["start_ns"] + int(latency * 1e9))
+
+
+_hook: Optional[LLMCallHook] = None
+_hook_lock = threading.Lock()
+
+
+def install_llm_hooks() -> Optional[LLMCallHook]:
+    """
+    向 litellm.callbacks 注册 LLMCallHook（重复调用只注册一次）；当前litellm版本不支持回调时返回None
+    """
+    global _hook
+    if not LITELLM_CALLBACKS_AVAILABLE:
+        return None
+    with _hook_lock:
+        if _hook is None:
+            _hook = LLMCallHook()
+        if _hook not in litellm.callbacks:
+            litellm.callbacks.append(_hook)
+        return _hook
+
 
 class LiteLLMWrapper:
     """LiteLLM包装器，兼容CrewAI的LLM接口"""
@@ -17,33 +172,129 @@ class LiteLLMWrapper:
         self.model = model
         self.temperature = kwargs.get('temperature', 0.1)
         self.max_tokens = kwargs.get('max_tokens', 1000)
+        # 自适应max_tokens：提供输出长度历史时按任务的历史输出长度设置预算
+        self.token_history = kwargs.get('token_history')
+        self.max_continuations = kwargs.get(
+            'max_continuations', Config.ADAPTIVE_TOKENS_CONFIG["max_continuations"]
+        )
         
         # 确保API密钥已设置
         if not os.getenv('GOOGLE_API_KEY'):
             raise ValueError("请设置GOOGLE_API_KEY环境变量")
+        install_llm_hooks()
+    
+    def resolve_max_tokens(self, task_key: Optional[str] = None) -> int:
+        """确定本次调用的max_tokens：有历史记录时使用自适应值，否则使用固定值"""
+        if self.token_history is not None and task_key:
+            return self.token_history.suggest_max_tokens(task_key, self.model, default=self.max_tokens)
+        return self.max_tokens
+    
+    @staticmethod
+    def _build_messages(prompt: str, partial: str = "") -> List[Dict[str, str]]:
+        messages = [{"role": "user", "content": prompt}]
+        if partial:
+            # 截断后续写：带上已生成的内容，请模型从中断处继续
+            messages.append({"role": "assistant", "content": partial})
+            messages.append({"role": "user", "content": CONTINUE_PROMPT})
+        return messages
+    
+    def _record_length(self, task_key: Optional[str], output_tokens: int) -> None:
+        if self.token_history is not None and task_key:
+            self.token_history.record(task_key, self.model, output_tokens)
     
-    def invoke(self, prompt: str) -> Any:
-        """兼容LangChain的invoke方法"""
+    def _record_call(self, model: str, started: float, prompt_tokens: int, completion_tokens: int) -> None:
+        """把一次调用（含续写）的token用量和成本记入用量核算；指标、数据集和追踪由 LLMCallHook 按请求记录"""
+        get_usage_tracker().record(model, prompt_tokens, completion_tokens, time.perf_counter() - started)
+    
+    def _completion(self, model: str, prompt: str, content: str, max_tokens: int, task_key: Optional[str],
+                    continuation: int, **kwargs: Any) -> Any:
+        return litellm.completion(
+            model=model,
+            messages=self._build_messages(prompt, content),
+            temperature=self.temperature,
+            max_tokens=max_tokens,
+            metadata={"task_key": task_key, "continuation": continuation},
+            **kwargs
+        )
+    
+    def invoke(self, prompt: str, task_key: Optional[str] = None) -> Any:
+        """兼容LangChain的invoke方法，输出被截断时自动续写"""
+        # 当前运行超出预算时降级模型或抛出 BudgetExceededError
+        model = get_usage_tracker().resolve_model(self.model)
+        started = time.perf_counter()
+        prompt_tokens = 0
+        output_tokens = 0
+        continuations = 0
         try:
-            response = litellm.completion(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
+            max_tokens = self.resolve_max_tokens(task_key)
+            content = ""
+            while True:
+                response = self._completion(model, prompt, content, max_tokens, task_key, continuations)
+                choice = response.choices[0]
+                piece = choice.message.content or ""
+                content += piece
+                usage = getattr(response, 'usage', None)
+                output_tokens += usage.completion_tokens if usage else estimate_tokens(piece)
+                prompt_tokens += usage.prompt_tokens if usage else estimate_tokens(prompt)
+                if choice.finish_reason != "length" or continuations >= self.max_continuations:
+                    break
+                continuations += 1
+            
+            self._record_length(task_key, output_tokens)
+            self._record_call(model, started, prompt_tokens, output_tokens)
             
             # 创建兼容的响应对象
             class Response:
-                def __init__(self, content):
+                def __init__(self, content, continuations):
                     self.content = content
+                    self.continuations = continuations
             
-            return Response(response.choices[0].message.content)
+            return Response(content, continuations)
             
         except Exception as e:
+            self._record_call(model, started, prompt_tokens, output_tokens)
             raise Exception(f"LiteLLM调用失败: {e}")
     
+    def stream(self, prompt: str, task_key: Optional[str] = None) -> Iterator[str]:
+        """流式调用，逐个产出文本片段，输出被截断时自动续写"""
+        model = get_usage_tracker().resolve_model(self.model)
+        started = time.perf_counter()
+        content = ""
+        continuations = 0
+        call_id = None
+        try:
+            max_tokens = self.resolve_max_tokens(task_key)
+            while True:
+                # 指定请求ID，调用方提前终止时据此结束 LLMCallHook 中的记录
+                call_id = uuid.uuid4().hex
+                response = self._completion(model, prompt, content, max_tokens, task_key, continuations,
+                                            stream=True, litellm_call_id=call_id)
+                finish_reason = None
+                for chunk in response:
+                    choice = chunk.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    if choice.delta.content:
+                        content += choice.delta.content
+                        yield choice.delta.content
+                if finish_reason != "length" or continuations >= self.max_continuations:
+                    break
+                continuations += 1
+            
+            self._record_length(task_key, estimate_tokens(content))
+            self._record_call(model, started, estimate_tokens(prompt) * (continuations + 1), estimate_tokens(content))
+            
+        except GeneratorExit:
+            # 调用方提前终止时，已生成的长度就是该任务实际需要的长度
+            self._record_length(task_key, estimate_tokens(content))
+            self._record_call(model, started, estimate_tokens(prompt) * (continuations + 1), estimate_tokens(content))
+            hook = install_llm_hooks()
+            if hook is not None and call_id is not None:
+                hook.end_call(call_id, "stopped", estimate_tokens(prompt), estimate_tokens(content))
+            raise
+        except Exception as e:
+            self._record_call(model, started, estimate_tokens(prompt) * (continuations + 1), estimate_tokens(content))
+            raise Exception(f"LiteLLM流式调用失败: {e}")
+    
     def __call__(self, prompt: str) -> str:
         """直接调用方法"""
         response = self.invoke(prompt)
@@ -9,9 +9,12 @@ CrewAI 软件开发全流程管理系统
 3. 自定义工作流
 """
 
+import argparse
 import os
 import sys
-from typing import Optional
+import time
+from contextlib import nullcontext
+from typing import List, Optional
 
 # 添加项目根目录到Python路径
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -36,8 +39,19 @@ except ImportError as e:
     print("请确保已安装所需依赖: pip install crewai")
     sys.exit(1)
 
-from config import Config
+from config import Config, PROJECT_TEMPLATES
 from workflows import create_software_development_workflow
+from storage import RunIndex, new_run_id
+from observability import (
+    maybe_start_metrics_server,
+    profiling_enabled,
+    render_profile_summary,
+    render_usage_summary,
+    set_profiling,
+    set_verbose,
+    setup_logging,
+    start_metrics_server
+)
 from examples.complete_workflow_example import run_complete_workflow_example, run_single_stage_example
 
 class MockLLM:
@@ -147,13 +161,19 @@ def run_demo_project():
         requirements_crew = workflow.create_requirements_analysis_crew(
             project_description=demo_project
         )
-        requirements_result = requirements_crew.kickoff()
+        workflow.start_run("demo", description=demo_project)
+        requirements_result = workflow.run_phase("requirements", requirements_crew)
         
         print("\n✅ 需求分析完成！")
         print("\n" + "="*60)
         print("需求分析结果:")
         print("="*60)
         print(requirements_result)
+        if Config.RESULT_WRITER_CONFIG["enabled"]:
+            print(f"\n📄 结果已写入: {workflow.phase_output_path('requirements')}")
+        print("\n" + render_usage_summary(workflow.finish_run()))
+        if workflow.last_profile is not None:
+            print(render_profile_summary(workflow.last_profile.summary, workflow.last_profile.files))
         
         return str(requirements_result)
         
@@ -256,14 +276,106 @@ def show_system_info():
     for agent in agents:
         print(f"  • {agent}")
 
-def main():
+def warm_template_cache(template_keys: Optional[List[str]] = None, force: bool = False):
+    """
+    预热项目模板缓存
+    """
+    print("\n🔥 预热项目模板缓存")
+    print("=" * 40)
+    
+    llm = create_llm()
+    workflow = create_software_development_workflow(llm)
+    
+    profiling = workflow.profile(new_run_id("warm-cache")) if profiling_enabled() else nullcontext()
+    try:
+        with profiling:
+            results = workflow.warm_template_cache(template_keys or None, force=force)
+    except Exception as e:
+        print(f"❌ 预热失败: {e}")
+        return None
+    finally:
+        if workflow.last_profile is not None:
+            print(render_profile_summary(workflow.last_profile.summary, workflow.last_profile.files))
+    
+    for template_key, path in results.items():
+        status = "已有缓存，跳过" if path == "cached" else f"已生成 {path}"
+        print(f"  • {PROJECT_TEMPLATES[template_key]['name']}: {status}")
+    return results
+
+def search_runs(query: str, template: Optional[str] = None, model: Optional[str] = None,
+                limit: Optional[int] = None, order: str = "recent"):
+    """
+    检索历史运行
+    """
+    index = RunIndex()
+    started = time.perf_counter()
+    results = index.search(query, template=template, model=model, limit=limit, order=order)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"\n🔍 共 {index.count()} 次运行，匹配 {len(results)} 条（{elapsed_ms:.1f} ms）")
+    for result in results:
+        meta = " | ".join(part for part in (result["template"], result["model"]) if part)
+        print(f"\n  • {result['run_id']}  {result['created_at'][:19]}  {meta}")
+        print(f"    tokens: {result['total_tokens']}  耗时: {result['total_seconds']}s")
+        if result["snippet"]:
+            print(f"    {result['snippet']}")
+    index.close()
+    return results
+
+def parse_args(argv: Optional[List[str]] = None):
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="CrewAI 软件开发全流程管理系统")
+    parser.add_argument(
+        "--warm-cache",
+        nargs="*",
+        choices=list(PROJECT_TEMPLATES),
+        metavar="TEMPLATE",
+        help=f"预先生成项目模板的系统设计、部署方案和测试计划基线（默认全部模板：{', '.join(PROJECT_TEMPLATES)}）"
+    )
+    parser.add_argument("--force", action="store_true", help="与 --warm-cache 一起使用，忽略已有缓存重新生成")
+    parser.add_argument("--verbose", action="store_true", help="在控制台输出智能体和Crew的执行过程（默认只写入日志文件）")
+    parser.add_argument("--search", metavar="QUERY", help="检索历史运行，空格分隔的检索词需全部出现，如 \"PostgreSQL Kubernetes\"")
+    parser.add_argument("--template", choices=list(PROJECT_TEMPLATES), help="与 --search 一起使用，按项目模板过滤")
+    parser.add_argument("--model", help="与 --search 一起使用，按模型过滤")
+    parser.add_argument("--limit", type=int, help="与 --search 一起使用，返回的结果数")
+    parser.add_argument("--relevance", action="store_true", help="与 --search 一起使用，按相关度而非时间排序")
+    parser.add_argument("--profile", action="store_true",
+                        help="剖析每次运行：CPU剖析、内存分配快照和墙钟火焰图数据写入 results/profiles/<运行ID>/")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="在 127.0.0.1:PORT 提供 Prometheus 格式的 /metrics 端点（也可通过 METRICS_CONFIG 开启）")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     """
     主程序入口
     """
+    args = parse_args(argv)
+    if args.verbose:
+        set_verbose(True)
+    if args.profile:
+        set_profiling(True)
+    setup_logging()
+    if args.metrics_port is not None:
+        server = start_metrics_server(args.metrics_port)
+        print(f"📈 指标端点: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    else:
+        maybe_start_metrics_server()
+    
+    # 检索本地历史运行，不需要API密钥
+    if args.search is not None:
+        search_runs(args.search, template=args.template, model=args.model, limit=args.limit,
+                    order="relevance" if args.relevance else "recent")
+        return
+    
     # 检查环境
     if not check_environment():
         return
     
+    if args.warm_cache is not None:
+        warm_template_cache(args.warm_cache, force=args.force)
+        return
+    
     while True:
         show_menu()
         choice = input("\n请选择操作 (1-4): ").strip()
@@ -0,0 +1,63 @@
+from .tracing import (
+    NOOP_SPAN,
+    Span,
+    Tracer,
+    current_span,
+    get_tracer,
+    load_spans,
+    span,
+    summarize_trace
+)
+from .logging_setup import is_verbose, parse_size, set_verbose, setup_logging
+from .usage import BudgetExceededError, UsageTracker, get_usage_tracker, render_usage_summary
+from .profiling import (
+    RunProfiler,
+    WallClockSampler,
+    classify_path,
+    profiling_enabled,
+    render_profile_summary,
+    set_profiling
+)
+from .metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    get_metrics_registry,
+    maybe_start_metrics_server,
+    start_metrics_server,
+    stop_metrics_server
+)
+
+__all__ = [
+    'NOOP_SPAN',
+    'Span',
+    'Tracer',
+    'current_span',
+    'get_tracer',
+    'load_spans',
+    'span',
+    'summarize_trace',
+    'is_verbose',
+    'parse_size',
+    'set_verbose',
+    'setup_logging',
+    'BudgetExceededError',
+    'UsageTracker',
+    'get_usage_tracker',
+    'render_usage_summary',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'MetricsRegistry',
+    'get_metrics_registry',
+    'maybe_start_metrics_server',
+    'start_metrics_server',
+    'stop_metrics_server',
+    'RunProfiler',
+    'WallClockSampler',
+    'classify_path',
+    'profiling_enabled',
+    'render_profile_summary',
+    'set_profiling'
+]
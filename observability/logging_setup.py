@@ -0,0 +1,138 @@
+"""
+日志系统
+
+按 Config.LOGGING_CONFIG 构建异步日志管线：调用方线程只把日志记录放入队列（QueueHandler），
+后台线程（QueueListener）负责格式化并写入按大小轮转的日志文件，大段输出不再阻塞工作线程。
+超过 max_message_chars 的日志按采样率保留完整内容，其余截断；
+全局 verbose 开关统一控制 Agent / Crew 的控制台输出，替代各处硬编码的 verbose=True
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+from typing import Any, Dict, Optional
+
+from config import Config
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def parse_size(size: Any) -> int:
+    """
+    解析 "10MB"、"512KB" 或整数形式的大小，返回字节数
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', str(size).upper())
+    if match is None:
+        raise ValueError(f"无法解析的大小: {size}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def is_verbose() -> bool:
+    """
+    全局verbose开关：开启时Agent和Crew向控制台输出执行过程
+    """
+    return Config.VERBOSE
+
+
+def set_verbose(verbose: bool) -> None:
+    """
+    修改全局verbose开关，对之后创建的Agent和Crew生效
+    """
+    Config.VERBOSE = verbose
+    for section in (Config.AGENT_CONFIG, Config.TASK_CONFIG, Config.CREW_CONFIG):
+        section["verbose"] = verbose
+
+
+class PayloadSampler(logging.Filter):
+    """
+    大段日志采样：超过 max_chars 的消息每 1/sample_rate 条保留一条完整内容，其余截断
+    """
+
+    def __init__(self, max_chars: int, sample_rate: float):
+        super().__init__()
+        self.max_chars = max_chars
+        self.every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self._large_count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if len(message) <= self.max_chars:
+            return True
+        with self._lock:
+            self._large_count += 1
+            keep_full = self.every > 0 and (self._large_count - 1) % self.every == 0
+        if not keep_full:
+            record.msg = f"{message[:self.max_chars]}...[已截断 {len(message) - self.max_chars} 字符]"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    队列已满时丢弃日志并计数，而不是阻塞或报错
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None, force: bool = False) -> logging.handlers.QueueListener:
+    """
+    初始化根日志器：QueueHandler + 后台线程写入轮转日志文件（verbose 开启时同时输出到控制台）
+    重复调用返回已有的管线；force 为真时重建
+    """
+    global _listener
+    config = {**Config.LOGGING_CONFIG, **(config or {})}
+    with _setup_lock:
+        if _listener is not None and not force:
+            return _listener
+        if _listener is not None:
+            _listener.stop()
+
+        formatter = logging.Formatter(config["format"])
+        directory = os.path.dirname(config["file_path"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            config["file_path"], maxBytes=parse_size(config["max_file_size"]),
+            backupCount=config["backup_count"], encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers = [file_handler]
+        if is_verbose():
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            handlers.append(console_handler)
+
+        log_queue: queue.Queue = queue.Queue(config["queue_size"])
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(PayloadSampler(config["max_message_chars"], config["large_payload_sample_rate"]))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(config["level"])
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
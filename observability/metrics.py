@@ -0,0 +1,354 @@
+"""
+运行时指标与 Prometheus 文本格式端点
+
+长时间运行的服务或批处理进程通过 /metrics 端点实时查看在途LLM调用、队列深度、缓存命中率、
+429限流次数和各阶段耗时分布。计数器和直方图按线程分片：每个线程只写自己的分片，
+热路径上不加锁，采集时再把各分片相加；直方图使用固定桶，观测一次只需一次二分查找和三次加法。
+
+端点默认关闭（Config.METRICS_CONFIG["enabled"]），只监听本机地址；指标本身始终记录，开销可忽略
+"""
+
+import bisect
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import Config
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels) + "}"
+
+
+class _Sharded:
+    """
+    按线程分片的累加器：线程首次写入时登记一个分片，之后只写自己的分片
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._register_lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = [0.0] * self._size
+            with self._register_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def totals(self) -> List[float]:
+        with self._register_lock:
+            shards = list(self._shards)
+        return [sum(shard[i] for shard in shards) for i in range(self._size)]
+
+
+class _Counter(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1) -> None:
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        self.shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self.totals()[0]
+
+
+class _Gauge(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+        self._base = 0.0
+        self._offset = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1) -> None:
+        self.shard()[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.shard()[0] -= amount
+
+    def set(self, value: float) -> None:
+        # 以当前分片合计为零点，之后的 inc/dec 在此基础上累加
+        self._offset = self.totals()[0]
+        self._base = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        采集时调用 function 取值（如队列长度），不再使用 set/inc/dec
+        """
+        self._function = function
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._base + self.totals()[0] - self._offset
+
+
+class _Histogram(_Sharded):
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # 各桶计数（最后一个为 +Inf）、总和、观测次数
+        super().__init__(len(self.buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        shard = self.shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """
+        返回 (累积桶计数, 总和, 次数)，桶顺序与 buckets 一致，最后一个为 +Inf
+        """
+        totals = self.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-2]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class Metric:
+    """
+    一个指标族：按标签值组合管理子指标；无标签时可直接调用 inc/set/observe
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # 以调用方传入的原始标签值为键的查找缓存，以及以字符串标签值为键的子指标
+        self._lookup: Dict[Tuple, object] = {}
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **labels: str):
+        """
+        取得标签值对应的子指标；首次出现时创建，之后的查找不加锁
+        """
+        key = tuple(labels[name] for name in self.labelnames) if labels else values
+        child = self._lookup.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签: {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(value) for value in key), self._new_child())
+                self._lookup[key] = child
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"指标 {self.name} 需要先通过 labels() 指定标签")
+        return self.labels()
+
+    def children(self) -> List[Tuple[Tuple[Tuple[str, str], ...], object]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(tuple(zip(self.labelnames, key)), child) for key, child in items]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self.children():
+            lines.extend(self._render_child(labels, child))
+        return lines
+
+    def _render_child(self, labels, child) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Counter()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Gauge()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._default().set_function(function)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _Histogram(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, labels, child) -> List[str]:
+        cumulative, total, count = child.snapshot()
+        lines = [
+            f"{self.name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {_format_value(value)}"
+            for bound, value in zip(self.buckets + (math.inf,), cumulative)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(count)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    指标注册表：同名指标只创建一次，render() 输出 Prometheus 文本格式
+    """
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs) -> Metric:
+        full_name = f"{self.namespace}_{name}" if self.namespace else name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {full_name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames,
+                              buckets=buckets or Config.METRICS_CONFIG["latency_buckets"])
+
+    def get(self, name: str) -> Optional[Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_default_registry: Optional[MetricsRegistry] = None
+_default_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    进程内共享的指标注册表
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = MetricsRegistry(Config.METRICS_CONFIG["namespace"])
+        return _default_registry
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None,
+                         registry: Optional[MetricsRegistry] = None) -> ThreadingHTTPServer:
+    """
+    在后台线程启动 /metrics 端点（默认只监听 127.0.0.1）；重复调用返回已启动的服务
+    port 为0时由系统分配端口，实际端口见返回值的 server_address
+    """
+    global _server
+    metrics_config = Config.METRICS_CONFIG
+    registry = registry or get_metrics_registry()
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _default_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(
+                (host or metrics_config["host"], metrics_config["port"] if port is None else port), MetricsHandler
+            )
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+def stop_metrics_server() -> None:
+    global _server
+    with _default_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def maybe_start_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """
+    METRICS_CONFIG 开启时启动端点，否则返回None
+    """
+    if not Config.METRICS_CONFIG["enabled"]:
+        return None
+    return start_metrics_server()
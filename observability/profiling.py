@@ -0,0 +1,279 @@
+"""
+运行剖析
+
+在一次工作流运行期间同时采集三类数据，写入 <output_dir>/<运行ID>/：
+- cpu.pstats：cProfile 的CPU剖析（可用 pstats 或 snakeviz 查看），只覆盖开启剖析的线程
+- memory.txt / memory.snapshot：tracemalloc 的分配快照，按分配位置列出运行期间新增的内存
+- wall.collapsed：定时采样所有工作线程调用栈得到的墙钟时间折叠栈（每行 "栈帧;栈帧;... 次数"），
+  可直接交给 flamegraph.pl、speedscope 或 inferno 生成火焰图；等待模型响应的时间也会计入
+
+summary.json 按代码来源（本项目、crewai、litellm 等第三方包、标准库、内置函数）汇总CPU自身耗时和墙钟采样，
+用于区分编排开销来自 crewai 还是本项目代码
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STDLIB_ROOT = os.path.abspath(sysconfig.get_paths()["stdlib"])
+_PACKAGE_DIRS = ('site-packages', 'dist-packages')
+
+
+def classify_path(filename: str) -> str:
+    """
+    代码来源：第三方包名、"project"（本项目）、"stdlib"（标准库）、"builtins"（C实现的内置函数，
+    如 time.sleep 和socket读写）或 "other"
+    """
+    if filename == '~' or filename.startswith('<'):
+        return "builtins"
+    parts = filename.replace('\\', '/').split('/')
+    for marker in _PACKAGE_DIRS:
+        if marker in parts:
+            index = parts.index(marker)
+            if index + 1 < len(parts):
+                return parts[index + 1].split('.')[0]
+    path = os.path.abspath(filename)
+    if path.startswith(PROJECT_ROOT + os.sep):
+        return "project"
+    if path.startswith(STDLIB_ROOT + os.sep):
+        return "stdlib"
+    return "other"
+
+
+def _short_path(filename: str) -> str:
+    parts = filename.replace('\\', '/').split('/')
+    for marker in _PACKAGE_DIRS:
+        if marker in parts:
+            return '/'.join(parts[parts.index(marker) + 1:])
+    if os.path.abspath(filename).startswith(PROJECT_ROOT + os.sep):
+        return os.path.relpath(filename, PROJECT_ROOT).replace('\\', '/')
+    return os.path.basename(filename)
+
+
+class WallClockSampler:
+    """
+    墙钟采样器：后台线程按固定间隔读取各线程的调用栈并累计折叠栈次数
+
+    只采样剖析开始后新建的线程和开始剖析的线程，日志、指标端点等已存在的后台线程不计入
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ignored = set()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = \
+                f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+        return label
+
+    def start(self) -> None:
+        owner = threading.get_ident()
+        self._ignored = {thread.ident for thread in threading.enumerate() if thread.ident != owner}
+        self._thread = threading.Thread(target=self._run, name="wall-clock-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own or thread_id in self._ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def self_time_by_source(self) -> Dict[str, int]:
+        """
+        按栈顶（正在执行的）函数的代码来源统计采样次数
+        """
+        by_code = {label: code for code, label in self._labels.items()}
+        totals: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaf = stack.rsplit(';', 1)[-1]
+            code = by_code.get(leaf)
+            totals[classify_path(code.co_filename) if code is not None else "other"] += count
+        return dict(totals.most_common())
+
+
+class RunProfiler:
+    """
+    运行剖析器：上下文管理器，退出时把剖析结果写入 output_dir
+
+    with RunProfiler("results/profiles/demo") as profiler:
+        crew.kickoff()
+    print(profiler.files)
+    """
+
+    def __init__(self, output_dir: str, cpu: Optional[bool] = None, memory: Optional[bool] = None,
+                 wall: Optional[bool] = None, interval: Optional[float] = None):
+        profiling_config = Config.PROFILING_CONFIG
+        self.output_dir = output_dir
+        self.cpu = profiling_config["cpu"] if cpu is None else cpu
+        self.memory = profiling_config["memory"] if memory is None else memory
+        self.wall = profiling_config["wall"] if wall is None else wall
+        self.interval = interval or profiling_config["sample_interval"]
+        self.files: Dict[str, str] = {}
+        self.summary: Dict[str, Any] = {}
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[WallClockSampler] = None
+        self._memory_start: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+        self._started = 0.0
+
+    def start(self) -> 'RunProfiler':
+        self._started = time.perf_counter()
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(Config.PROFILING_CONFIG["tracemalloc_frames"])
+                self._started_tracemalloc = True
+            self._memory_start = tracemalloc.take_snapshot()
+        if self.wall:
+            self._sampler = WallClockSampler(self.interval)
+            self._sampler.start()
+        if self.cpu:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError as e:
+                # 已有其他剖析器在运行
+                logger.warning("无法开启CPU剖析: %s", e)
+                self._profile = None
+        return self
+
+    def stop(self) -> Dict[str, str]:
+        """
+        停止采集并写出文件，返回 类型 -> 文件路径
+        """
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        elapsed = time.perf_counter() - self._started
+        # 先取内存快照，避免把写出剖析结果本身的分配计入
+        memory_end = tracemalloc.take_snapshot() if self._memory_start is not None else None
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.summary = {"seconds": round(elapsed, 3)}
+
+        if self._profile is not None:
+            self.files["cpu"] = os.path.join(self.output_dir, "cpu.pstats")
+            self._profile.dump_stats(self.files["cpu"])
+            self.summary["cpu_self_seconds_by_source"] = self._cpu_by_source(pstats.Stats(self._profile))
+            self._profile = None
+        if self._sampler is not None:
+            self.files["wall"] = os.path.join(self.output_dir, "wall.collapsed")
+            self._sampler.write_collapsed(self.files["wall"])
+            self.summary["wall_samples"] = self._sampler.samples
+            self.summary["wall_interval_seconds"] = self.interval
+            self.summary["wall_samples_by_source"] = self._sampler.self_time_by_source()
+            self._sampler = None
+        if memory_end is not None:
+            self._write_memory(memory_end)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            self._memory_start = None
+
+        self.files["summary"] = os.path.join(self.output_dir, "summary.json")
+        with open(self.files["summary"], 'w', encoding='utf-8') as f:
+            json.dump({**self.summary, "files": self.files}, f, ensure_ascii=False, indent=2)
+        return self.files
+
+    @staticmethod
+    def _cpu_by_source(stats: pstats.Stats) -> Dict[str, float]:
+        totals: Counter = Counter()
+        for (filename, _, _), (_, _, self_seconds, _, _) in stats.stats.items():
+            totals[classify_path(filename)] += self_seconds
+        return {source: round(seconds, 4) for source, seconds in totals.most_common()}
+
+    def _write_memory(self, snapshot: tracemalloc.Snapshot) -> None:
+        top_n = Config.PROFILING_CONFIG["top_n"]
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        snapshot = snapshot.filter_traces(ignore)
+        differences = snapshot.compare_to(self._memory_start.filter_traces(ignore), "traceback")
+        self.files["memory_snapshot"] = os.path.join(self.output_dir, "memory.snapshot")
+        snapshot.dump(self.files["memory_snapshot"])
+        self.files["memory"] = os.path.join(self.output_dir, "memory.txt")
+        with open(self.files["memory"], 'w', encoding='utf-8') as f:
+            f.write(f"运行期间新增分配 Top {top_n}（按分配位置）\n\n")
+            for difference in differences[:top_n]:
+                f.write(f"{difference.size_diff / 1024:+.1f} KiB, {difference.count_diff:+d} 个对象\n")
+                for line in difference.traceback.format(limit=Config.PROFILING_CONFIG["tracemalloc_frames"]):
+                    f.write(f"    {line}\n")
+        self.summary["memory_growth_kib"] = round(sum(d.size_diff for d in differences) / 1024, 1)
+        self.summary["memory_peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+
+    def __enter__(self) -> 'RunProfiler':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+
+def profiling_enabled() -> bool:
+    return Config.PROFILING_CONFIG["enabled"]
+
+
+def set_profiling(enabled: bool) -> None:
+    """
+    修改全局剖析开关，对之后开始的运行生效（python main.py --profile）
+    """
+    Config.PROFILING_CONFIG["enabled"] = enabled
+
+
+def render_profile_summary(summary: Dict[str, Any], files: Dict[str, str]) -> str:
+    """
+    把剖析摘要渲染为控制台文本
+    """
+    lines = [f"🔬 剖析结果（{summary.get('seconds', 0)}s）"]
+    if "cpu_self_seconds_by_source" in summary:
+        lines.append("  CPU自身耗时: " + ", ".join(
+            f"{source} {seconds:.3f}s" for source, seconds in summary["cpu_self_seconds_by_source"].items()
+        ))
+    if summary.get("wall_samples_by_source"):
+        total = sum(summary["wall_samples_by_source"].values())
+        lines.append("  墙钟采样: " + ", ".join(
+            f"{source} {count / total:.0%}" for source, count in summary["wall_samples_by_source"].items()
+        ))
+    if "memory_growth_kib" in summary:
+        lines.append(f"  内存: 新增 {summary['memory_growth_kib']} KiB, 峰值 {summary['memory_peak_kib']} KiB")
+    lines.extend(f"  {kind}: {path}" for kind, path in files.items())
+    return '\n'.join(lines)
@@ -0,0 +1,315 @@
+"""
+结构化链路追踪
+
+以 workflow -> phase(crew) -> task(agent) -> llm 的层级记录span，当前span通过 contextvars 传递，
+线程池中的作业需用 contextvars.copy_context() 执行以继承父span。
+每个span记录开始/结束时间（Unix纳秒）、状态和属性（模型、token数、缓存命中、重试次数等），
+token数、重试次数和缓存命中次数在span结束时累加到父span，便于查看一次运行的时间和用量花在哪里。
+
+结束的span批量写入本地文件：jsonl 为每行一个span，otlp 为每行一个 OTLP/JSON 的 ExportTraceServiceRequest，
+可直接被 OpenTelemetry Collector 的文件接收器或兼容工具读取。关闭追踪时 span() 返回空操作对象，开销可忽略
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import Config
+
+# span结束时累加到父span的计数属性
+ROLLUP_ATTRIBUTES = (
+    "gen_ai.usage.input_tokens",
+    "gen_ai.usage.output_tokens",
+    "llm.calls",
+    "llm.retries",
+    "cache.hits",
+    "cache.misses",
+)
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """
+    一个追踪片段；通过 Tracer.start_span 或 Tracer.span 创建
+    """
+
+    __slots__ = ('tracer', 'name', 'kind', 'trace_id', 'span_id', 'parent', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'status_message')
+
+    def __init__(self, tracer: 'Tracer', name: str, kind: str, parent: Optional['Span'],
+                 attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_message = ""
+
+    @property
+    def recording(self) -> bool:
+        return self.end_ns is None
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def increment(self, key: str, value: float = 1) -> None:
+        if value:
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def set_error(self, error: BaseException) -> None:
+        self.set_status("ERROR", f"{type(error).__name__}: {error}")
+
+    def set_status(self, status: str, message: str = "") -> None:
+        self.status = status
+        self.status_message = message
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        """
+        结束span：累加计数到父span并交给导出器；重复调用无效
+        """
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if self.status == "UNSET":
+            self.status = "OK"
+        if self.parent is not None:
+            # 并发的子span可能同时结束，累加时加锁
+            with self.tracer._lock:
+                for key in ROLLUP_ATTRIBUTES:
+                    if key in self.attributes:
+                        self.parent.increment(key, self.attributes[key])
+        self.tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent is not None else "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": self.duration_ms,
+            "status": self.status,
+            "statusMessage": self.status_message,
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """
+    关闭追踪时使用的空操作span
+    """
+
+    name = kind = trace_id = span_id = ""
+    parent = None
+    recording = False
+    duration_ms = None
+    attributes: Dict[str, Any] = {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def increment(self, key: str, value: float = 1) -> None:
+        pass
+
+    def set_error(self, error: BaseException) -> None:
+        pass
+
+    def set_status(self, status: str, message: str = "") -> None:
+        pass
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    kinds = {"llm": 3}  # SPAN_KIND_CLIENT；其余为 SPAN_KIND_INTERNAL
+    return {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "parentSpanId": span.parent.span_id if span.parent is not None else "",
+        "name": span.name,
+        "kind": kinds.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)}
+                       for key, value in {"span.kind": span.kind, **span.attributes}.items()],
+        "status": {"code": 2 if span.status == "ERROR" else 1, "message": span.status_message}
+    }
+
+
+class Tracer:
+    """
+    追踪器：创建span并把结束的span批量写入本地文件
+    """
+
+    def __init__(self, path: Optional[str] = None, exporter: Optional[str] = None,
+                 batch_size: Optional[int] = None, service_name: Optional[str] = None,
+                 enabled: Optional[bool] = None):
+        tracing_config = Config.TRACING_CONFIG
+        self.enabled = tracing_config["enabled"] if enabled is None else enabled
+        self.path = path or tracing_config["path"]
+        self.exporter = exporter or tracing_config["exporter"]
+        if self.exporter not in ("jsonl", "otlp"):
+            raise ValueError(f"不支持的追踪导出格式: {self.exporter}")
+        self.batch_size = batch_size or tracing_config["batch_size"]
+        self.service_name = service_name or tracing_config["service_name"]
+        self._lock = threading.Lock()
+        self._pending: List[Span] = []
+
+    def start_span(self, name: str, kind: str = "internal", parent: Optional[Span] = None,
+                   attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None):
+        """
+        创建并开始一个span（不设为当前span）；parent 默认为当前span
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        if parent is None:
+            parent = _current_span.get()
+        if parent is NOOP_SPAN:
+            parent = None
+        return Span(self, name, kind, parent, attributes, start_ns)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", parent: Optional[Span] = None,
+             **attributes: Any) -> Iterator[Span]:
+        """
+        在上下文中执行并记录一个span，期间它是当前span；异常会记录到span状态后继续抛出
+        """
+        span = self.start_span(name, kind, parent, attributes)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def record_span(self, name: str, start_ns: int, end_ns: int, kind: str = "internal",
+                    parent: Optional[Span] = None, **attributes: Any):
+        """
+        记录一个已经结束的span（用于事后才知道开始和结束时间的任务或调用）
+        """
+        span = self.start_span(name, kind, parent, attributes, start_ns=start_ns)
+        span.end(end_ns)
+        return span
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._pending.append(span)
+            # 根span结束时立即写出，保证一次运行的追踪完整落盘
+            due = len(self._pending) >= self.batch_size or span.parent is None
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        把已结束的span写入文件，返回写出的数量
+        """
+        with self._lock:
+            spans, self._pending = self._pending, []
+            if not spans:
+                return 0
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if self.exporter == "jsonl":
+                    for span in spans:
+                        f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n')
+                else:
+                    request = {"resourceSpans": [{
+                        "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(self.service_name)}]},
+                        "scopeSpans": [{"scope": {"name": "crewai-workflow"}, "spans": [_otlp_span(s) for s in spans]}]
+                    }]}
+                    f.write(json.dumps(request, ensure_ascii=False, default=str) + '\n')
+        return len(spans)
+
+
+_default_tracer: Optional[Tracer] = None
+_default_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    进程内共享的追踪器，进程退出时自动写出未导出的span
+    """
+    global _default_tracer
+    with _default_lock:
+        if _default_tracer is None:
+            _default_tracer = Tracer()
+            atexit.register(_default_tracer.flush)
+        return _default_tracer
+
+
+def current_span():
+    """
+    当前上下文中的span，没有时返回空操作span
+    """
+    return _current_span.get() or NOOP_SPAN
+
+
+def span(name: str, kind: str = "internal", **attributes: Any):
+    """
+    get_tracer().span 的简写
+    """
+    return get_tracer().span(name, kind, **attributes)
+
+
+def load_spans(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    读取 jsonl 格式的追踪文件
+    """
+    with open(path or Config.TRACING_CONFIG["path"], 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize_trace(spans: List[Dict[str, Any]], trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    按 span 名称汇总耗时（jsonl 格式），按总耗时降序，用于查看一次运行的时间花在哪里
+    """
+    totals: Dict[str, Dict[str, Any]] = {}
+    for record in spans:
+        if trace_id and record["traceId"] != trace_id:
+            continue
+        entry = totals.setdefault(record["name"], {"name": record["name"], "kind": record["kind"],
+                                                   "count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] += record["durationMs"] or 0.0
+    return sorted(totals.values(), key=lambda entry: entry["total_ms"], reverse=True)
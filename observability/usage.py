@@ -0,0 +1,247 @@
+"""
+token用量与成本核算
+
+每次LLM调用的token数、延迟和成本记入当前作用域（运行、项目、阶段），作用域通过 contextvars 传递。
+Crew中的智能体通过CrewAI自带的LLM调用模型，其用量由任务完成回调按智能体LLM的token计数增量记录，
+同时归属到任务及其智能体。汇总维度为 项目 / 运行 / 阶段 / 智能体 / 任务。
+
+Config.BUDGET_CONFIG 为每次运行设置token和成本上限，超出后按 action 中止（抛出 BudgetExceededError）
+或把后续调用降级到更便宜的模型
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+_usage_scope: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar('usage_scope', default={})
+
+USAGE_LEVELS = ("project", "run", "phase", "agent", "task")
+
+
+class BudgetExceededError(RuntimeError):
+    """
+    运行的token或成本超出预算且预算动作为 abort
+    """
+
+
+def model_price(model: str) -> Tuple[float, float]:
+    """
+    模型的 (输入, 输出) 单价（美元/百万token）；先精确匹配，再去掉提供商前缀匹配，未知模型为0
+    """
+    prices = Config.BUDGET_CONFIG["prices"]
+    if model in prices:
+        return tuple(prices[model])
+    short_name = model.split('/', 1)[-1]
+    for name, price in prices.items():
+        if name.split('/', 1)[-1] == short_name:
+            return tuple(price)
+    return 0.0, 0.0
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = model_price(model)
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class _Usage:
+    __slots__ = ('calls', 'prompt_tokens', 'completion_tokens', 'cost', 'latency')
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latency = 0.0
+
+    def add(self, other: '_Usage') -> None:
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+        self.latency += other.latency
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": round(self.cost, 6),
+            "latency_seconds": round(self.latency, 3)
+        }
+
+
+class UsageTracker:
+    """
+    按 项目 / 运行 / 阶段 / 智能体 / 任务 汇总LLM用量，并执行运行级预算
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, _Usage]] = {level: {} for level in USAGE_LEVELS}
+        self._downgraded: Dict[str, str] = {}
+
+    @contextmanager
+    def scope(self, **labels: Optional[str]) -> Iterator[Dict[str, str]]:
+        """
+        在上下文中设置用量归属（run / project / phase），未指定的维度继承外层作用域
+        """
+        merged = {**_usage_scope.get(), **{key: value for key, value in labels.items() if value}}
+        token = _usage_scope.set(merged)
+        try:
+            yield merged
+        finally:
+            _usage_scope.reset(token)
+
+    @staticmethod
+    def current_scope() -> Dict[str, str]:
+        return dict(_usage_scope.get())
+
+    def _add(self, level: str, key: Optional[str], usage: _Usage) -> None:
+        if key:
+            self._totals[level].setdefault(key, _Usage()).add(usage)
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, latency: float = 0.0,
+               agent: Optional[str] = None, task: Optional[str] = None, calls: int = 1) -> Dict[str, Any]:
+        """
+        记录调用用量，返回 {"cost": 成本, **当前作用域}
+        提供 agent / task 时同时归属到该智能体和任务（按运行区分）；calls 为这些用量对应的调用次数
+        """
+        usage = _Usage()
+        usage.calls = calls
+        usage.prompt_tokens = int(prompt_tokens or 0)
+        usage.completion_tokens = int(completion_tokens or 0)
+        usage.cost = call_cost(model, usage.prompt_tokens, usage.completion_tokens)
+        usage.latency = latency
+        scope = _usage_scope.get()
+        run, phase = scope.get("run"), scope.get("phase")
+        prefix = f"{run}/" if run else ""
+        with self._lock:
+            self._add("project", scope.get("project"), usage)
+            self._add("run", run, usage)
+            self._add("phase", f"{run}/{phase}" if run and phase else phase, usage)
+            if agent:
+                self._add("agent", f"{prefix}{agent}", usage)
+            if task:
+                self._add("task", f"{prefix}{phase or ''}/{task}", usage)
+        return {"cost": usage.cost, **scope}
+
+    def totals(self, level: str) -> Dict[str, Dict[str, Any]]:
+        """
+        某一维度的汇总：键 -> 用量（调用数、token、成本、延迟）
+        """
+        with self._lock:
+            return {key: usage.to_dict() for key, usage in self._totals[level].items()}
+
+    def check_budget(self, run: Optional[str] = None) -> Optional[str]:
+        """
+        检查运行（默认为当前作用域的运行）的预算：未超出时返回None，超出时返回应降级到的模型；
+        预算动作为 abort 或未配置降级模型时抛出 BudgetExceededError
+        """
+        run = run or _usage_scope.get().get("run")
+        if not run:
+            return None
+        budget = Config.BUDGET_CONFIG
+        with self._lock:
+            exceeded = self._exceeded(self._totals["run"].get(run), budget)
+        if not exceeded:
+            return None
+        if budget["action"] == "abort" or not budget["downgrade_model"]:
+            raise BudgetExceededError(f"运行 {run} 超出预算: {exceeded}")
+        return budget["downgrade_model"]
+
+    def mark_downgraded(self, model: str, run: Optional[str] = None) -> None:
+        """
+        记录运行的后续调用已实际改用 model，run_summary 据此报告降级
+        """
+        run = run or _usage_scope.get().get("run")
+        if run:
+            with self._lock:
+                self._downgraded.setdefault(run, model)
+
+    def resolve_model(self, model: str, run: Optional[str] = None) -> str:
+        """
+        返回本次调用应使用的模型：预算未超出时为原模型，超出时为降级模型（并记录降级），
+        供直接按返回值调用模型的调用方使用
+        """
+        downgrade_model = self.check_budget(run)
+        if downgrade_model is None or downgrade_model == model:
+            return model
+        self.mark_downgraded(downgrade_model, run)
+        return downgrade_model
+
+    @staticmethod
+    def _exceeded(usage: Optional[_Usage], budget: Dict[str, Any]) -> Optional[str]:
+        if usage is None:
+            return None
+        if budget["max_tokens_per_run"] and usage.total_tokens >= budget["max_tokens_per_run"]:
+            return f"token {usage.total_tokens} >= {budget['max_tokens_per_run']}"
+        if budget["max_cost_per_run"] and usage.cost >= budget["max_cost_per_run"]:
+            return f"成本 ${usage.cost:.4f} >= ${budget['max_cost_per_run']}"
+        return None
+
+    def run_summary(self, run: str, project: Optional[str] = None) -> Dict[str, Any]:
+        """
+        运行的用量汇总：总计、各阶段、各智能体，以及所属项目的累计
+        """
+        prefix = f"{run}/"
+        with self._lock:
+            run_usage = self._totals["run"].get(run, _Usage()).to_dict()
+            phases = {key[len(prefix):]: usage.to_dict() for key, usage in self._totals["phase"].items()
+                      if key.startswith(prefix)}
+            agents = {key[len(prefix):]: usage.to_dict() for key, usage in self._totals["agent"].items()
+                      if key.startswith(prefix)}
+            project_usage = self._totals["project"].get(project).to_dict() \
+                if project and project in self._totals["project"] else None
+        return {
+            "run": run,
+            "total": run_usage,
+            "phases": phases,
+            "agents": agents,
+            "project": project_usage,
+            "downgraded_to": self._downgraded.get(run)
+        }
+
+
+def render_usage_summary(summary: Dict[str, Any]) -> str:
+    """
+    把运行用量汇总渲染为控制台表格
+    """
+    def row(name: str, usage: Dict[str, Any]) -> str:
+        return (f"  {name:<24} {usage['calls']:>6} {usage['prompt_tokens']:>10} {usage['completion_tokens']:>10} "
+                f"{usage['cost']:>10.4f} {usage['latency_seconds']:>9.1f}")
+
+    lines: List[str] = [
+        f"💰 用量汇总 - 运行 {summary['run']}",
+        f"  {'':<24} {'调用':>6} {'输入token':>10} {'输出token':>10} {'成本($)':>10} {'耗时(s)':>9}"
+    ]
+    lines.extend(row(f"阶段 {name}", usage) for name, usage in summary["phases"].items())
+    lines.extend(row(f"智能体 {name}", usage) for name, usage in summary["agents"].items())
+    lines.append(row("运行合计", summary["total"]))
+    if summary["project"]:
+        lines.append(row("项目累计", summary["project"]))
+    if summary["downgraded_to"]:
+        lines.append(f"  ⚠️ 超出预算，后续调用已降级到 {summary['downgraded_to']}")
+    return '\n'.join(lines)
+
+
+_default_tracker: Optional[UsageTracker] = None
+_default_lock = threading.Lock()
+
+
+def get_usage_tracker() -> UsageTracker:
+    """
+    进程内共享的用量追踪器
+    """
+    global _default_tracker
+    with _default_lock:
+        if _default_tracker is None:
+            _default_tracker = UsageTracker()
+        return _default_tracker
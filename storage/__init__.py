@@ -0,0 +1,29 @@
+from .project_index import ProjectIndex, condense_output, render_reference_projects
+from .memory_store import BoundedMemoryStorage, MemoryMetrics, MmapMemoryStorage, build_crew_memory
+from .mmap_store import MmapVectorStore
+from .artifact_store import ArtifactStore, new_run_id
+from .result_writer import StreamingResultWriter
+from .run_index import RunIndex
+from .metrics_dataset import MetricsDataset, get_metrics_dataset, record_metric
+from .vector_index import IVFIndex, VectorIndex, create_vector_index
+
+__all__ = [
+    'ProjectIndex',
+    'condense_output',
+    'render_reference_projects',
+    'BoundedMemoryStorage',
+    'MemoryMetrics',
+    'MmapMemoryStorage',
+    'MmapVectorStore',
+    'ArtifactStore',
+    'new_run_id',
+    'StreamingResultWriter',
+    'RunIndex',
+    'MetricsDataset',
+    'get_metrics_dataset',
+    'record_metric',
+    'build_crew_memory',
+    'VectorIndex',
+    'IVFIndex',
+    'create_vector_index'
+]
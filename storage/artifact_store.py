@@ -0,0 +1,303 @@
+"""
+内容寻址的产物存储
+
+阶段输出按内容的sha256哈希保存为压缩对象（安装了 zstandard 时使用zstd，否则使用gzip），
+相同内容只存一份；每次运行只保存一个引用这些对象的清单。
+gc 删除不再被任何运行引用的对象，配额超出时按时间从旧到新删除运行，
+使成千上万次运行的存储开销保持有界
+
+目录结构：
+- objects/ab/cdef....zst|.gz：压缩后的对象
+- runs/<运行ID>.json：运行清单（创建时间、元数据、阶段 -> 对象哈希及该阶段的 tokens / seconds）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from config import Config
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+_CODEC_SUFFIXES = ('.zst', '.gz')
+
+
+def new_run_id(project: Optional[str] = None) -> str:
+    """
+    生成运行ID：时间戳 + 随机后缀，可带项目前缀
+    """
+    run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    return f"{project}-{run_id}" if project else run_id
+
+
+class ArtifactStore:
+    """
+    内容寻址、压缩存储的阶段产物仓库
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        store_config = Config.ARTIFACT_STORE_CONFIG
+        self.root = root or store_config["root"]
+        self.max_bytes = max_bytes if max_bytes is not None else store_config["max_bytes"]
+        self.codec = 'zst' if ZSTD_AVAILABLE and store_config["compression"] == 'zstd' else 'gz'
+        self.level = store_config["compression_level"]
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        # 配额回收未能满足配额时，在有对象过了宽限期之前 save_phase 不再重复回收
+        self._quota_retry_at = 0.0
+        os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(self.root, 'runs'), exist_ok=True)
+
+    # ---- 对象 ----
+
+    def _object_base(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+    def _find_object(self, digest: str) -> Optional[str]:
+        base = self._object_base(digest)
+        for suffix in _CODEC_SUFFIXES:
+            if os.path.exists(base + suffix):
+                return base + suffix
+        return None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'zst':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=min(self.level, 9))
+
+    @staticmethod
+    def _decompress(path: str, data: bytes) -> bytes:
+        if path.endswith('.zst'):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError(f"读取 {path} 需要安装 zstandard: pip install zstandard")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def put(self, content: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        保存内容，返回 {"digest", "size", "stored_size"}；内容已存在时不重复写入
+        """
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self._find_object(digest)
+        if existing:
+            try:
+                # 刷新修改时间，避免被正在进行的gc当作过期对象删除
+                os.utime(existing)
+                return {"digest": digest, "size": len(data), "stored_size": os.path.getsize(existing)}
+            except FileNotFoundError:
+                pass  # 对象刚被并发的gc删除，重新写入
+
+        path = f"{self._object_base(digest)}.{self.codec}"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = self._compress(data)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(compressed)
+        return {"digest": digest, "size": len(data), "stored_size": len(compressed)}
+
+    def get(self, digest: str) -> str:
+        path = self._find_object(digest)
+        if path is None:
+            raise KeyError(f"产物不存在: {digest}")
+        with open(path, 'rb') as f:
+            return self._decompress(path, f.read()).decode('utf-8')
+
+    def _iter_objects(self):
+        objects_dir = os.path.join(self.root, 'objects')
+        for prefix in os.listdir(objects_dir):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name.endswith(_CODEC_SUFFIXES):
+                    yield prefix + name.rsplit('.', 1)[0], os.path.join(prefix_dir, name)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(os.path.getsize(path) for _, path in self._iter_objects())
+            return self._total_bytes
+
+    # ---- 运行清单 ----
+
+    def _run_path(self, run_id: str) -> str:
+        return os.path.join(self.root, 'runs', f"{run_id}.json")
+
+    def load_manifest(self, run_id: str) -> Dict[str, Any]:
+        with open(self._run_path(run_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        path = self._run_path(manifest["run_id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def save_phase(self, run_id: str, phase: str, content: Union[str, bytes],
+                   metadata: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        保存一个阶段的输出并记录到运行清单，返回对象哈希
+        metadata 合并到运行的元数据，stats（如 tokens、seconds）与对象哈希一起记录在该阶段下
+        """
+        artifact = self.put(content)
+        with self._lock:
+            try:
+                manifest = self.load_manifest(run_id)
+            except FileNotFoundError:
+                manifest = {"run_id": run_id, "created_at": time.time(), "metadata": {}, "phases": {}}
+            manifest["metadata"].update(metadata or {})
+            manifest["phases"][phase] = {**artifact, **(stats or {})}
+            manifest["updated_at"] = time.time()
+            self._write_manifest(manifest)
+        if self.max_bytes and self.total_bytes() > self.max_bytes and time.time() >= self._quota_retry_at:
+            self.enforce_quota(protect=[run_id])
+        return artifact["digest"]
+
+    def load_run(self, run_id: str) -> Dict[str, str]:
+        """
+        读取一次运行的全部阶段输出，返回 阶段 -> 内容
+        """
+        manifest = self.load_manifest(run_id)
+        return {phase: self.get(artifact["digest"]) for phase, artifact in manifest["phases"].items()}
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        """
+        所有运行清单，按创建时间从旧到新排序
+        """
+        runs = []
+        runs_dir = os.path.join(self.root, 'runs')
+        for name in os.listdir(runs_dir):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(runs_dir, name), 'r', encoding='utf-8') as f:
+                        runs.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(runs, key=lambda run: run["created_at"])
+
+    def delete_run(self, run_id: str) -> None:
+        """
+        删除运行清单；其引用的对象在下一次gc时回收
+        """
+        try:
+            os.remove(self._run_path(run_id))
+        except FileNotFoundError:
+            pass
+        self._quota_retry_at = 0.0
+
+    # ---- 回收 ----
+
+    def gc(self, grace_seconds: Optional[float] = None) -> Dict[str, int]:
+        """
+        删除不再被任何运行引用的对象
+
+        最近 grace_seconds 秒内写入或复用过的对象不删除，避免误删尚未写入清单的产物
+        """
+        grace_seconds = Config.ARTIFACT_STORE_CONFIG["gc_grace_seconds"] if grace_seconds is None else grace_seconds
+        referenced = {artifact["digest"] for run in self.list_runs() for artifact in run["phases"].values()}
+        now = time.time()
+        removed = freed = 0
+        for digest, path in list(self._iter_objects()):
+            if digest in referenced:
+                continue
+            try:
+                if now - os.path.getmtime(path) < grace_seconds:
+                    continue
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += size
+        with self._lock:
+            self._total_bytes = None
+        return {"removed_objects": removed, "freed_bytes": freed}
+
+    def enforce_quota(self, max_bytes: Optional[int] = None, protect: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        对象总大小超出配额时，从最旧的运行开始删除清单，直到删除后可回收的对象足以满足配额，
+        最后执行一次gc（遵守 gc_grace_seconds，宽限期内的对象不计入可回收的大小）
+        protect 中的运行和最近 keep_min_runs 次运行不会被删除；
+        回收后仍超出配额时，save_phase 等到最早的宽限期内对象过期后才再次回收
+        """
+        max_bytes = max_bytes or self.max_bytes
+        protected = set(protect or [])
+        runs = self.list_runs()
+        keep_min_runs = Config.ARTIFACT_STORE_CONFIG["keep_min_runs"]
+        candidates = [run for run in runs[:max(0, len(runs) - keep_min_runs)] if run["run_id"] not in protected]
+        projected = self.total_bytes()
+        if projected <= max_bytes or not candidates:
+            return {"deleted_runs": 0, "freed_bytes": 0}
+
+        grace_seconds = Config.ARTIFACT_STORE_CONFIG["gc_grace_seconds"]
+        now = time.time()
+        collectable: Dict[str, int] = {}
+        expires_at = now + grace_seconds
+        for digest, path in self._iter_objects():
+            try:
+                mtime = os.path.getmtime(path)
+                if now - mtime >= grace_seconds:
+                    collectable[digest] = os.path.getsize(path)
+                else:
+                    expires_at = min(expires_at, mtime + grace_seconds)
+            except FileNotFoundError:
+                continue
+        references: Dict[str, int] = {}
+        for run in runs:
+            for digest in {artifact["digest"] for artifact in run["phases"].values()}:
+                references[digest] = references.get(digest, 0) + 1
+
+        deleted_runs = 0
+        for run in candidates:
+            if projected <= max_bytes:
+                break
+            digests = {artifact["digest"] for artifact in run["phases"].values()}
+            released = [digest for digest in digests if references[digest] == 1]
+            freed = sum(collectable.get(digest, 0) for digest in released)
+            if not freed:
+                # 删除该运行腾不出空间（对象仍被引用或在宽限期内），保留它
+                continue
+            self.delete_run(run["run_id"])
+            deleted_runs += 1
+            for digest in digests:
+                references[digest] -= 1
+            projected -= freed
+        self._quota_retry_at = expires_at if projected > max_bytes else 0.0
+        if not deleted_runs and not any(digest not in references for digest in collectable):
+            # 没有可回收的对象，跳过gc的全量扫描
+            return {"deleted_runs": 0, "freed_bytes": 0}
+        return {"deleted_runs": deleted_runs, "freed_bytes": self.gc()["freed_bytes"]}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        存储统计：运行数、对象数、原始总大小（按运行引用计）与实际占用
+        """
+        runs = self.list_runs()
+        logical = sum(artifact["size"] for run in runs for artifact in run["phases"].values())
+        objects = sum(1 for _ in self._iter_objects())
+        stored = self.total_bytes()
+        return {
+            "runs": len(runs),
+            "objects": objects,
+            "logical_bytes": logical,
+            "stored_bytes": stored,
+            "codec": self.codec,
+            "savings_ratio": round(1 - stored / logical, 3) if logical else 0.0
+        }
@@ -0,0 +1,361 @@
+"""
+有界的智能体记忆存储
+
+CrewAI默认的短期记忆和实体记忆会随运行时间无限增长，长时间运行的批处理进程中检索越来越慢。
+BoundedMemoryStorage 实现CrewAI的记忆存储接口（save / search / reset），
+按项目命名空间隔离，限制条目数和存活时间，超出时按LRU或重要性淘汰，
+并记录记忆规模和检索延迟指标。检索使用本地哈希n-gram向量索引（安装了 numpy 时）
+或字符n-gram集合相似度，不依赖网络嵌入服务。
+
+MmapMemoryStorage 把记忆保存在内存映射的只追加段文件中（见 storage.mmap_store），
+同一主机上的多个工作进程共享同一份数据
+"""
+
+import itertools
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from utils.embedding import NUMPY_AVAILABLE, HashedNgramEmbedder
+from utils.text import char_ngrams
+from .mmap_store import MmapVectorStore
+from .vector_index import create_vector_index
+
+try:
+    from crewai.memory.storage.interface import Storage as _StorageBase
+except ImportError:
+    _StorageBase = object
+
+try:
+    from crewai.memory import EntityMemory, ShortTermMemory
+    CREWAI_MEMORY_AVAILABLE = True
+except ImportError:
+    CREWAI_MEMORY_AVAILABLE = False
+
+EVICTION_POLICIES = ('lru', 'importance')
+RETRIEVAL_MODES = ('auto', 'vector', 'ngram')
+
+
+class MemoryMetrics:
+    """
+    记忆存储指标：规模、写入、淘汰、过期和检索延迟
+    """
+
+    def __init__(self, latency_window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.saves = 0
+        self.searches = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.size = 0
+
+    def record_search(self, seconds: float) -> None:
+        with self._lock:
+            self.searches += 1
+            self._latencies.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        summary = {
+            "size": self.size,
+            "saves": self.saves,
+            "searches": self.searches,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "search_latency_avg_ms": None,
+            "search_latency_p95_ms": None
+        }
+        if latencies:
+            summary["search_latency_avg_ms"] = round(sum(latencies) / len(latencies) * 1000, 3)
+            summary["search_latency_p95_ms"] = round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3)
+        return summary
+
+
+class BoundedMemoryStorage(_StorageBase):
+    """
+    按命名空间隔离、有容量和存活时间上限的记忆存储
+
+    同一命名空间、同一记忆类型的实例共享数据（见 for_namespace），不同项目之间互不可见
+    """
+
+    _registry: Dict[tuple, 'BoundedMemoryStorage'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, namespace: str = "default", max_items: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, eviction: Optional[str] = None,
+                 retrieval: Optional[str] = None, kind: str = "short_term"):
+        memory_config = Config.MEMORY_CONFIG
+        self.namespace = namespace
+        self.kind = kind
+        self.max_items = max_items or memory_config["max_items"]
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else memory_config["max_age_seconds"]
+        self.eviction = eviction or memory_config["eviction"]
+        if self.eviction not in EVICTION_POLICIES:
+            raise ValueError(f"不支持的淘汰策略: {self.eviction}")
+        retrieval = retrieval or memory_config["retrieval"]
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"不支持的检索方式: {retrieval}")
+        # auto：安装了 numpy 时使用向量索引，否则集合相似度更快
+        self.retrieval = ('vector' if NUMPY_AVAILABLE else 'ngram') if retrieval == 'auto' else retrieval
+        if self.retrieval == 'vector':
+            dim = Config.VECTOR_INDEX_CONFIG["dim"]
+            self._embedder = HashedNgramEmbedder(dim=dim)
+            self._index = create_vector_index(dim, capacity=self.max_items + 1)
+        self.metrics = MemoryMetrics()
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def for_namespace(cls, namespace: str, kind: str = "short_term", **kwargs) -> 'BoundedMemoryStorage':
+        """
+        获取命名空间下某类记忆的共享存储实例，不存在时创建
+        """
+        with cls._registry_lock:
+            key = (cls.__name__, namespace, kind)
+            if key not in cls._registry:
+                cls._registry[key] = cls(namespace=namespace, kind=kind, **kwargs)
+            return cls._registry[key]
+
+    @classmethod
+    def registry_metrics(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        所有共享存储实例的指标，键为 "命名空间/记忆类型"
+        """
+        with cls._registry_lock:
+            storages = dict(cls._registry)
+        return {
+            f"{namespace}/{kind}": storage.metrics.summary() for (_, namespace, kind), storage in storages.items()
+        }
+
+    def save(self, value: Any, metadata: Optional[Dict[str, Any]] = None, agent: Optional[str] = None) -> None:
+        metadata = dict(metadata or {})
+        if agent:
+            metadata.setdefault("agent", agent)
+        now = time.time()
+        entry = {
+            "value": value,
+            "metadata": metadata,
+            "created_at": now,
+            "grams": frozenset(char_ngrams(str(value))) if self.retrieval == 'ngram' else None,
+            "hits": 0,
+            # CrewAI的任务评估会给出质量分，作为重要性的初始值
+            "importance": float(metadata.get("importance", metadata.get("quality", 0)) or 0)
+        }
+        vector = self._embedder.embed(str(value)) if self.retrieval == 'vector' else None
+        with self._lock:
+            self._expire(now)
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            if vector is not None:
+                self._index.add([entry_id], [vector])
+            while len(self._entries) > self.max_items:
+                self._evict_one()
+            self.metrics.saves += 1
+            self.metrics.size = len(self._entries)
+
+    def search(self, query: str, limit: int = 3, score_threshold: float = 0.35,
+               filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        按字符n-gram相似度检索记忆，返回与CrewAI RAG存储相同格式的结果
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._expire(time.time())
+            scored = [
+                (score, entry_id) for score, entry_id in self._score(str(query), limit, filter)
+                if score >= score_threshold and self._matches(self._entries[entry_id], filter)
+            ]
+            scored.sort(reverse=True)
+            results = []
+            for score, entry_id in scored[:limit]:
+                entry = self._entries[entry_id]
+                entry["hits"] += 1
+                self._entries.move_to_end(entry_id)
+                results.append({
+                    "id": entry_id,
+                    "context": entry["value"],
+                    "metadata": entry["metadata"],
+                    "score": round(score, 4)
+                })
+        self.metrics.record_search(time.perf_counter() - started)
+        return results
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self.retrieval == 'vector':
+                self._index = create_vector_index(self._index.dim, capacity=self.max_items + 1)
+            self.metrics.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        # CrewAI 以 `storage if storage else RAGStorage(...)` 选择存储，空存储也必须为真，
+        # 否则会被替换为默认的RAG存储（需要嵌入服务的API密钥）
+        return True
+
+    @staticmethod
+    def _matches(entry: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+        return not filter or all(entry["metadata"].get(key) == value for key, value in filter.items())
+
+    def _score(self, query: str, limit: int, filter: Optional[Dict[str, Any]]) -> List[tuple]:
+        if self.retrieval == 'vector':
+            # 有过滤条件时多取一些候选，过滤后仍能凑够 limit 条
+            k = len(self._entries) if filter else limit
+            hits = self._index.search([self._embedder.embed(query)], k)[0]
+            return [(score, entry_id) for entry_id, score in hits]
+
+        query_grams = frozenset(char_ngrams(query))
+        if not query_grams:
+            return []
+        scored = []
+        for entry_id, entry in self._entries.items():
+            grams = entry["grams"]
+            if grams:
+                # 集合余弦相似度：查询与记忆长度差异较大时比Dice系数更稳定
+                scored.append((len(query_grams & grams) / math.sqrt(len(query_grams) * len(grams)), entry_id))
+        return scored
+
+    def _drop(self, entry_id: int) -> None:
+        del self._entries[entry_id]
+        if self.retrieval == 'vector':
+            self._index.remove([entry_id])
+
+    def _expire(self, now: float) -> None:
+        if not self.max_age_seconds:
+            return
+        # 条目按写入顺序插入，但检索会把命中的条目移到末尾，因此需要完整扫描
+        expired = [entry_id for entry_id, entry in self._entries.items()
+                   if now - entry["created_at"] > self.max_age_seconds]
+        for entry_id in expired:
+            self._drop(entry_id)
+        self.metrics.expirations += len(expired)
+        self.metrics.size = len(self._entries)
+
+    def _evict_one(self) -> None:
+        if self.eviction == 'lru':
+            self._drop(next(iter(self._entries)))
+        else:
+            # 重要性 = 初始重要性 + 被检索命中的次数；相同时淘汰最久未使用的
+            victim = min(
+                enumerate(self._entries.items()),
+                key=lambda pair: (pair[1][1]["importance"] + pair[1][1]["hits"], pair[0])
+            )[1][0]
+            self._drop(victim)
+        self.metrics.evictions += 1
+
+
+class MmapMemoryStorage(BoundedMemoryStorage):
+    """
+    内存映射的共享记忆存储
+
+    数据保存在 MMAP_STORE_CONFIG["base_dir"]/命名空间/记忆类型 下，多个工作进程映射同一组段文件。
+    写入只追加；条目数超过上限、条目过期或已删除行过多时压缩，
+    保留最新（eviction 为 importance 时保留重要性最高）的 max_items 条
+    """
+
+    def __init__(self, namespace: str = "default", max_items: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, eviction: Optional[str] = None,
+                 retrieval: Optional[str] = None, kind: str = "short_term", directory: Optional[str] = None):
+        # 检索由内存映射存储完成，父类无需建立进程内的向量索引
+        super().__init__(namespace=namespace, max_items=max_items, max_age_seconds=max_age_seconds,
+                         eviction=eviction, retrieval='ngram', kind=kind)
+        dim = Config.VECTOR_INDEX_CONFIG["dim"]
+        self.retrieval = 'vector'
+        self._embedder = HashedNgramEmbedder(dim=dim)
+        self.directory = directory or os.path.join(Config.MMAP_STORE_CONFIG["base_dir"], namespace, kind)
+        self._store = MmapVectorStore(self.directory, dim=dim)
+        self.metrics.size = len(self._store)
+
+    def save(self, value: Any, metadata: Optional[Dict[str, Any]] = None, agent: Optional[str] = None) -> None:
+        metadata = dict(metadata or {})
+        if agent:
+            metadata.setdefault("agent", agent)
+        payload = {
+            "value": value,
+            "metadata": metadata,
+            "created_at": time.time(),
+            "importance": float(metadata.get("importance", metadata.get("quality", 0)) or 0)
+        }
+        self._store.add([uuid.uuid4().hex], [self._embedder.embed(str(value))], [payload], replace=False)
+        self.metrics.saves += 1
+        self._enforce_limits()
+
+    def search(self, query: str, limit: int = 3, score_threshold: float = 0.35,
+               filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        now = time.time()
+
+        def visible(record: Dict[str, Any]) -> bool:
+            payload = record["payload"]
+            if self.max_age_seconds and now - payload["created_at"] > self.max_age_seconds:
+                return False
+            return self._matches(payload, filter)
+
+        hits = self._store.search([self._embedder.embed(str(query))], limit, where=visible)[0]
+        results = [
+            {"id": entry_id, "context": payload["value"], "metadata": payload["metadata"], "score": round(score, 4)}
+            for entry_id, score, payload in hits if score >= score_threshold
+        ]
+        self.metrics.record_search(time.perf_counter() - started)
+        return results
+
+    def reset(self) -> None:
+        self._store.compact(keep=lambda record: False)
+        self.metrics.size = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _enforce_limits(self) -> None:
+        size = len(self._store)
+        self.metrics.size = size
+        compact_ratio = Config.MMAP_STORE_CONFIG["compact_ratio"]
+        # 允许超出上限一定比例后再压缩，避免每次写入都重写段文件
+        if size <= self.max_items * (1 + compact_ratio) and self._store.deleted_ratio() <= compact_ratio:
+            return
+
+        now = time.time()
+        records = [record for record in self._store.records()
+                   if not self.max_age_seconds or now - record["payload"]["created_at"] <= self.max_age_seconds]
+        if self.eviction == 'importance':
+            records.sort(key=lambda record: (record["payload"]["importance"], record["payload"]["created_at"]))
+        else:
+            records.sort(key=lambda record: record["payload"]["created_at"])
+        keep_ids = {record["id"] for record in records[-self.max_items:]}
+        result = self._store.compact(keep=lambda record: record["id"] in keep_ids)
+        self.metrics.expirations += size - len(records)
+        self.metrics.evictions += max(0, len(records) - len(keep_ids))
+        self.metrics.size = result["kept"]
+
+
+def build_crew_memory(namespace: str) -> Dict[str, Any]:
+    """
+    构造传给Crew的记忆参数
+
+    CREW_CONFIG 关闭记忆时返回 {"memory": False}；backend 为 bounded 或 mmap 时为短期记忆和实体记忆
+    挂载当前命名空间的 BoundedMemoryStorage 或 MmapMemoryStorage；backend 为 crewai 时使用CrewAI默认存储
+    """
+    if not Config.CREW_CONFIG["memory"]:
+        return {"memory": False}
+    backend = Config.MEMORY_CONFIG["backend"]
+    if backend not in ("bounded", "mmap"):
+        return {"memory": True}
+    if not CREWAI_MEMORY_AVAILABLE:
+        # 当前CrewAI版本不支持自定义记忆存储，保持Crew的默认设置
+        return {}
+    storage_class = MmapMemoryStorage if backend == "mmap" else BoundedMemoryStorage
+    return {
+        "memory": True,
+        "short_term_memory": ShortTermMemory(storage=storage_class.for_namespace(namespace, "short_term")),
+        "entity_memory": EntityMemory(storage=storage_class.for_namespace(namespace, "entity"))
+    }
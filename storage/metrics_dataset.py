@@ -0,0 +1,198 @@
+"""
+列式运行指标数据集
+
+每次LLM调用和阶段执行记录为一行，缓冲到一定行数或时间后写成一个新的分片文件，
+按天分区：<root>/date=YYYY-MM-DD/part-<时间戳>-<随机后缀>.parquet。
+分片只追加不修改，写入时先写临时文件再重命名，读取方不会看到写了一半的文件；
+pandas、DuckDB 可按 hive 分区裁剪日期并只读取所需的列，例如：
+
+    SELECT model, phase, avg(latency_ms) FROM read_parquet('results/metrics/*/*.parquet', hive_partitioning=1)
+    GROUP BY model, phase
+
+安装了 pyarrow 时写入 Parquet（或 Arrow IPC），否则退化为按同样方式分区的 JSONL
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pyarrow = None
+    PYARROW_AVAILABLE = False
+
+# 列名 -> 类型；所有分片使用同一套列，缺失的值写为空
+METRICS_SCHEMA = {
+    "timestamp": "timestamp",
+    "kind": "string",  # llm_call 或 phase
+    "run_id": "string",
+    "phase": "string",
+    "task_key": "string",
+    "model": "string",
+    "template": "string",
+    "status": "string",  # ok / error / stopped
+    "prompt_tokens": "int64",
+    "completion_tokens": "int64",
+    "total_tokens": "int64",
+    "latency_ms": "float64",
+    "continuations": "int64",
+    "streamed": "bool",
+    "error": "string",
+}
+
+_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "jsonl": ".jsonl"}
+# pyarrow.dataset 中对应的格式名
+_DATASET_FORMATS = {"parquet": "parquet", "arrow": "ipc", "jsonl": "json"}
+
+
+def _arrow_schema():
+    types = {
+        "timestamp": pyarrow.timestamp("ms"),
+        "string": pyarrow.string(),
+        "int64": pyarrow.int64(),
+        "float64": pyarrow.float64(),
+        "bool": pyarrow.bool_(),
+    }
+    return pyarrow.schema([(name, types[kind]) for name, kind in METRICS_SCHEMA.items()])
+
+
+class MetricsDataset:
+    """
+    按天分区、只追加的列式指标数据集
+    """
+
+    def __init__(self, root: Optional[str] = None, file_format: Optional[str] = None,
+                 flush_rows: Optional[int] = None, flush_seconds: Optional[float] = None):
+        dataset_config = Config.METRICS_DATASET_CONFIG
+        self.root = root or dataset_config["root"]
+        file_format = file_format or dataset_config["format"]
+        if file_format not in _SUFFIXES:
+            raise ValueError(f"不支持的指标文件格式: {file_format}")
+        self.format = file_format if PYARROW_AVAILABLE else "jsonl"
+        self.flush_rows = flush_rows or dataset_config["flush_rows"]
+        self.flush_seconds = dataset_config["flush_seconds"] if flush_seconds is None else flush_seconds
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+
+    def record(self, kind: str, **fields: Any) -> None:
+        """
+        记录一行指标；未知字段会被忽略，达到行数或时间阈值时写出一个分片
+        """
+        row = {name: fields.get(name) for name in METRICS_SCHEMA}
+        row["kind"] = kind
+        row["timestamp"] = fields.get("timestamp") or datetime.now()
+        with self._lock:
+            self._buffer.append(row)
+            due = (len(self._buffer) >= self.flush_rows
+                   or time.monotonic() - self._last_flush >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def flush(self) -> List[str]:
+        """
+        把缓冲的行按日期写成新的分片，返回写出的文件路径
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        by_date: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_date.setdefault(row["timestamp"].strftime('%Y-%m-%d'), []).append(row)
+        return [self._write_part(date, date_rows) for date, date_rows in by_date.items()]
+
+    def _write_part(self, date: str, rows: List[Dict[str, Any]]) -> str:
+        directory = os.path.join(self.root, f"date={date}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{datetime.now().strftime('%H%M%S%f')}-{uuid.uuid4().hex[:8]}{_SUFFIXES[self.format]}"
+        path = os.path.join(directory, name)
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        if self.format == "jsonl":
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps({**row, "timestamp": row["timestamp"].isoformat()}, ensure_ascii=False) + '\n')
+        else:
+            self._write_table(pyarrow.Table.from_pylist(rows, schema=_arrow_schema()), tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def _write_table(self, table, path: str) -> None:
+        if self.format == "parquet":
+            pyarrow.parquet.write_table(table, path, compression='zstd')
+        else:
+            with pyarrow.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+
+    def part_files(self, date: Optional[str] = None) -> List[str]:
+        pattern = os.path.join(self.root, f"date={date or '*'}", f"part-*{_SUFFIXES[self.format]}")
+        return sorted(glob.glob(pattern))
+
+    def compact(self, date: str) -> Optional[str]:
+        """
+        把某一天的多个分片合并为一个，减少长期运行积累的小文件；仅支持 Parquet/Arrow
+        """
+        parts = self.part_files(date)
+        if self.format == "jsonl" or len(parts) < 2:
+            return None
+        read = pyarrow.parquet.read_table if self.format == "parquet" else \
+            (lambda part: pyarrow.ipc.open_file(part).read_all())
+        table = pyarrow.concat_tables([read(part) for part in parts])
+        path = os.path.join(self.root, f"date={date}", f"part-{date}-compacted-{uuid.uuid4().hex[:8]}"
+                                                         f"{_SUFFIXES[self.format]}")
+        tmp_path = os.path.join(self.root, f"date={date}", f".compact-{uuid.uuid4().hex[:8]}.tmp")
+        self._write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        for part in parts:
+            os.remove(part)
+        return path
+
+    def dataset(self):
+        """
+        以 pyarrow.dataset 打开全部分片（按 date 分区），便于只读取需要的列和日期
+        JSONL 分片以 pyarrow 的 json 格式读取（换行分隔的JSON）
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("读取列式数据集需要安装 pyarrow: pip install pyarrow")
+        import pyarrow.dataset
+        return pyarrow.dataset.dataset(
+            self.root, format=_DATASET_FORMATS[self.format], partitioning="hive", exclude_invalid_files=True
+        )
+
+
+_default_dataset: Optional[MetricsDataset] = None
+_default_lock = threading.Lock()
+
+
+def get_metrics_dataset() -> Optional[MetricsDataset]:
+    """
+    进程内共享的指标数据集，未开启时返回None；进程退出时自动写出缓冲的行
+    """
+    global _default_dataset
+    if not Config.METRICS_DATASET_CONFIG["enabled"]:
+        return None
+    with _default_lock:
+        if _default_dataset is None:
+            _default_dataset = MetricsDataset()
+            atexit.register(_default_dataset.flush)
+        return _default_dataset
+
+
+def record_metric(kind: str, **fields: Any) -> None:
+    """
+    向共享数据集记录一行指标；未开启时什么也不做
+    """
+    dataset = get_metrics_dataset()
+    if dataset is not None:
+        dataset.record(kind, **fields)
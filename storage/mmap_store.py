@@ -0,0 +1,521 @@
+"""
+内存映射的向量与数据存储
+
+多个工作进程各自加载一份记忆和检索数据会成倍占用内存。MmapVectorStore 把数据保存为只追加的段文件，
+读取时直接内存映射而不解析，同一主机上的多个进程共享只读页面，冷启动只需映射文件。
+
+目录结构：
+- manifest.json：维度、版本号、代数（generation）、各段名称及已提交行数、当前墓碑文件
+- seg-XXXXXXXX.vec：float32向量，每行 dim 个
+- seg-XXXXXXXX.keys：每行16字节的ID摘要，用于按ID删除
+- seg-XXXXXXXX.off：每行 (偏移, 长度) 两个uint64，指向 .dat 中的数据
+- seg-XXXXXXXX.dat：UTF-8 JSON数据（ID与附加数据）
+- tombstones-N.bin：已删除行的 (段序号, 行号) 记录，每条两个uint32
+
+写入由文件锁串行化：先追加段文件并刷盘，再原子替换 manifest 提交行数，读者只读取已提交的行。
+压缩（compact）把存活的行重写到新段并提升代数，旧段文件在替换 manifest 后删除，
+已映射旧段的读者不受影响，刷新时切换到新段
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from contextlib import contextmanager
+from operator import mul
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from config import Config
+from utils.embedding import NUMPY_AVAILABLE, np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MANIFEST_NAME = 'manifest.json'
+KEY_SIZE = 16
+_OFFSET_FORMAT = '<QQ'
+_TOMBSTONE_FORMAT = '<II'
+
+
+def key_digest(vector_id: Hashable) -> bytes:
+    return hashlib.blake2b(str(vector_id).encode('utf-8'), digest_size=KEY_SIZE).digest()
+
+
+class _Segment:
+    """
+    单个段的只读映射
+    """
+
+    def __init__(self, directory: str, name: str, seq: int, rows: int, dim: int):
+        self.name = name
+        self.seq = seq
+        self.rows = rows
+        self.dim = dim
+        self._base = os.path.join(directory, name)
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._vectors = None
+
+    def open(self) -> None:
+        """
+        映射已提交行所需的全部文件；映射之后这些文件被压缩删除也不影响读取
+        """
+        if not self.rows:
+            return
+        for suffix in ('.vec', '.keys', '.off', '.dat'):
+            if self._map(suffix) is None:
+                raise FileNotFoundError(f"段文件缺失: {self._base}{suffix}")
+
+    def _map(self, suffix: str) -> Optional[mmap.mmap]:
+        if suffix not in self._maps:
+            path = f"{self._base}{suffix}"
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                return None
+            with open(path, 'rb') as f:
+                self._maps[suffix] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[suffix]
+
+    def vectors(self):
+        """
+        已提交行的向量：numpy 可用时为 (rows, dim) 的只读矩阵，否则为 float 的 memoryview
+        """
+        if self._vectors is None and self.rows:
+            buffer = memoryview(self._map('.vec'))[:self.rows * self.dim * 4]
+            self._vectors = np.frombuffer(buffer, dtype=np.float32).reshape(self.rows, self.dim) \
+                if NUMPY_AVAILABLE else buffer.cast('f')
+        return self._vectors
+
+    def payload(self, row: int) -> Dict[str, Any]:
+        offset, length = struct.unpack_from(_OFFSET_FORMAT, self._map('.off'), row * 16)
+        return json.loads(self._map('.dat')[offset:offset + length].decode('utf-8'))
+
+    def rows_for_key(self, digest: bytes) -> List[int]:
+        keys = self._map('.keys')
+        if keys is None:
+            return []
+        end = self.rows * KEY_SIZE
+        rows = []
+        start = keys.find(digest, 0, end)
+        while start != -1:
+            if start % KEY_SIZE == 0:
+                rows.append(start // KEY_SIZE)
+            start = keys.find(digest, start + 1, end)
+        return rows
+
+    def close(self) -> None:
+        self._vectors = None
+        for mapped in self._maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                # 仍有numpy视图引用该映射，交给垃圾回收释放
+                pass
+        self._maps.clear()
+
+
+class MmapVectorStore:
+    """
+    内存映射、只追加的向量存储
+
+    add 追加 (ID, 向量, 附加数据)；同一ID再次写入时旧行被标记删除。
+    search 对所有段的已提交行做批量top-k，返回 (ID, 得分, 附加数据)
+    """
+
+    def __init__(self, directory: str, dim: Optional[int] = None, segment_rows: Optional[int] = None):
+        store_config = Config.MMAP_STORE_CONFIG
+        self.directory = directory
+        self.segment_rows = segment_rows or store_config["segment_rows"]
+        self._lock = threading.RLock()
+        self._version = None
+        # 上次读取的 manifest 文件 (inode, 修改时间, 大小)，未变化时刷新不再读取
+        self._manifest_stat: Optional[Tuple[int, int, int]] = None
+        # 当前线程持有写锁时，刷新无需再加共享锁
+        self._exclusive = False
+        self._segments: List[_Segment] = []
+        self._deleted: Dict[int, set] = {}
+        self._tombstone_name = None
+        self._tombstone_offset = 0
+        os.makedirs(directory, exist_ok=True)
+
+        with self._file_lock():
+            manifest = self._read_manifest()
+            if manifest is None:
+                if not dim:
+                    raise ValueError(f"{directory} 中没有已有的存储，需要指定向量维度")
+                manifest = {"dim": dim, "version": 0, "generation": 0, "next_seq": 1, "segments": [],
+                            "tombstones": "tombstones-0.bin"}
+                self._write_manifest(manifest)
+        if dim and manifest["dim"] != dim:
+            raise ValueError(f"存储的向量维度为 {manifest['dim']}，与指定的 {dim} 不一致")
+        self.dim = manifest["dim"]
+        self.refresh()
+
+    # ---- manifest 与锁 ----
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self._manifest_path):
+            return None
+        with open(self._manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest["version"] = manifest.get("version", 0) + 1
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path)
+
+    def _manifest_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self._manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False) -> Iterator[None]:
+        """
+        跨进程的文件锁：默认为写锁，shared 为真时为读锁（不支持 fcntl 的平台上只在进程内加锁）
+        """
+        with self._lock:
+            if fcntl is None or (shared and self._exclusive):
+                yield
+                return
+            with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                exclusive, self._exclusive = self._exclusive, self._exclusive or not shared
+                try:
+                    yield
+                finally:
+                    self._exclusive = exclusive
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self) -> None:
+        """
+        重新读取 manifest，映射新提交的行和段；manifest 文件未变化时只需一次 stat
+
+        读取 manifest 和映射段文件期间持有读锁，压缩无法在两者之间删除将要映射的段文件
+        """
+        with self._lock:
+            if self._manifest_signature() == self._manifest_stat:
+                self._load_tombstones()
+                return
+            with self._file_lock(shared=True):
+                signature = self._manifest_signature()
+                manifest = self._read_manifest()
+                if manifest is None:
+                    return
+                self._manifest_stat = signature
+                if manifest["version"] != self._version:
+                    self._load_manifest(manifest)
+
+    def _load_manifest(self, manifest: Dict[str, Any]) -> None:
+        current = {segment.name: segment for segment in self._segments}
+        segments = []
+        for info in manifest["segments"]:
+            segment = current.pop(info["name"], None)
+            if segment is None or segment.rows != info["rows"]:
+                if segment is not None:
+                    segment.close()
+                segment = _Segment(self.directory, info["name"], info["seq"], info["rows"], self.dim)
+                segment.open()
+            segments.append(segment)
+        for segment in current.values():
+            segment.close()
+        if manifest["tombstones"] != self._tombstone_name:
+            self._tombstone_name = manifest["tombstones"]
+            self._deleted = {}
+            self._tombstone_offset = 0
+        self._segments = segments
+        self._load_tombstones()
+        self._version = manifest["version"]
+
+    def _load_tombstones(self) -> None:
+        """
+        读入墓碑文件中新增的删除记录；其他进程的 delete 只追加墓碑而不修改 manifest
+        """
+        if self._tombstone_name is None:
+            return
+        path = os.path.join(self.directory, self._tombstone_name)
+        try:
+            if os.path.getsize(path) - self._tombstone_offset < 8:
+                return
+        except FileNotFoundError:
+            return
+        with open(path, 'rb') as f:
+            f.seek(self._tombstone_offset)
+            data = f.read()
+        usable = len(data) - len(data) % 8
+        for seq, row in struct.iter_unpack(_TOMBSTONE_FORMAT, data[:usable]):
+            self._deleted.setdefault(seq, set()).add(row)
+        self._tombstone_offset += usable
+
+    # ---- 写入 ----
+
+    def add(self, ids: Sequence[Hashable], vectors, payloads: Optional[Sequence[Any]] = None,
+            replace: bool = True) -> None:
+        """
+        追加向量；payloads 为与ID一起保存的附加数据（需可JSON序列化）
+        replace 为真时先标记删除同ID的旧行；确定ID不重复时传 False 可省去按ID扫描
+        """
+        ids = list(ids)
+        payloads = list(payloads) if payloads is not None else [None] * len(ids)
+        rows = [self._vector_bytes(vector) for vector in vectors]
+        if not (len(ids) == len(rows) == len(payloads)):
+            raise ValueError("ID、向量和附加数据的数量不一致")
+
+        with self._file_lock():
+            self.refresh()
+            if replace:
+                self._tombstone([key_digest(vector_id) for vector_id in ids])
+            manifest = self._read_manifest()
+            start = 0
+            while start < len(ids):
+                if not manifest["segments"] or manifest["segments"][-1]["rows"] >= self.segment_rows:
+                    seq = manifest["next_seq"]
+                    manifest["next_seq"] += 1
+                    manifest["segments"].append({"name": f"seg-{seq:08d}", "seq": seq, "rows": 0})
+                active = manifest["segments"][-1]
+                count = min(len(ids) - start, self.segment_rows - active["rows"])
+                self._append(active, ids[start:start + count], rows[start:start + count],
+                             payloads[start:start + count])
+                active["rows"] += count
+                start += count
+            self._write_manifest(manifest)
+            self.refresh()
+
+    def _vector_bytes(self, vector) -> bytes:
+        if isinstance(vector, array):
+            data = vector.tobytes()
+        elif NUMPY_AVAILABLE:
+            data = np.asarray(vector, dtype=np.float32).tobytes()
+        else:
+            data = array('f', vector).tobytes()
+        if len(data) != self.dim * 4:
+            raise ValueError(f"向量维度应为 {self.dim}")
+        return data
+
+    def _append(self, segment: Dict[str, Any], ids: List[Hashable], rows: List[bytes],
+                payloads: List[Any]) -> None:
+        base = os.path.join(self.directory, segment["name"])
+        # 未提交的残留数据（上次写入中途失败）按 manifest 的行数截断后再追加
+        self._truncate(f"{base}.vec", segment["rows"] * self.dim * 4)
+        self._truncate(f"{base}.keys", segment["rows"] * KEY_SIZE)
+        self._truncate(f"{base}.off", segment["rows"] * 16)
+        data_path = f"{base}.dat"
+        data_size = self._committed_data_size(base, segment["rows"])
+        self._truncate(data_path, data_size)
+
+        encoded = [json.dumps({"id": vector_id, "payload": payload}, ensure_ascii=False).encode('utf-8')
+                   for vector_id, payload in zip(ids, payloads)]
+        offsets = []
+        position = data_size
+        for blob in encoded:
+            offsets.append(struct.pack(_OFFSET_FORMAT, position, len(blob)))
+            position += len(blob)
+        for suffix, chunks in (('.dat', encoded), ('.vec', rows), ('.keys', [key_digest(i) for i in ids]),
+                               ('.off', offsets)):
+            with open(f"{base}{suffix}", 'ab') as f:
+                f.write(b''.join(chunks))
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _truncate(path: str, size: int) -> None:
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+
+    @staticmethod
+    def _committed_data_size(base: str, rows: int) -> int:
+        if not rows:
+            return 0
+        with open(f"{base}.off", 'rb') as f:
+            f.seek((rows - 1) * 16)
+            offset, length = struct.unpack(_OFFSET_FORMAT, f.read(16))
+        return offset + length
+
+    def delete(self, ids: Sequence[Hashable]) -> int:
+        """
+        按ID标记删除，返回删除的行数；空间在 compact 时回收
+        """
+        with self._file_lock():
+            self.refresh()
+            return self._tombstone([key_digest(vector_id) for vector_id in ids])
+
+    def _tombstone(self, digests: List[bytes]) -> int:
+        records = []
+        for segment in self._segments:
+            deleted = self._deleted.get(segment.seq, set())
+            for digest in digests:
+                records.extend((segment.seq, row) for row in segment.rows_for_key(digest) if row not in deleted)
+        if records:
+            with open(os.path.join(self.directory, self._tombstone_name), 'ab') as f:
+                f.write(b''.join(struct.pack(_TOMBSTONE_FORMAT, seq, row) for seq, row in records))
+                f.flush()
+                os.fsync(f.fileno())
+            self._load_tombstones()
+        return len(records)
+
+    def compact(self, keep: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, int]:
+        """
+        压缩：把存活的行重写到新段，清空墓碑并删除旧段文件
+
+        keep(记录) 返回假时该行也被丢弃（记录包含 id 和 payload），可用于按存活时间或容量淘汰
+        """
+        with self._file_lock():
+            self.refresh()
+            old_manifest = self._read_manifest()
+            manifest = {"dim": self.dim, "version": old_manifest["version"],
+                        "generation": old_manifest["generation"] + 1,
+                        "next_seq": old_manifest["next_seq"], "segments": [],
+                        "tombstones": f"tombstones-{old_manifest['generation'] + 1}.bin"}
+            kept = dropped = 0
+            batch: Tuple[List[Hashable], List[bytes], List[Any]] = ([], [], [])
+            for segment, row in self._live_rows():
+                record = segment.payload(row)
+                if keep is not None and not keep(record):
+                    dropped += 1
+                    continue
+                vectors = segment.vectors()
+                vector = vectors[row].tobytes() if NUMPY_AVAILABLE else \
+                    vectors[row * self.dim:(row + 1) * self.dim].tobytes()
+                batch[0].append(record["id"])
+                batch[1].append(vector)
+                batch[2].append(record["payload"])
+                kept += 1
+                if len(batch[0]) >= self.segment_rows:
+                    self._write_compacted(manifest, *batch)
+                    batch = ([], [], [])
+            if batch[0]:
+                self._write_compacted(manifest, *batch)
+            dropped += sum(len(rows) for rows in self._deleted.values())
+
+            self._write_manifest(manifest)
+            old_files = [f"{segment['name']}{suffix}" for segment in old_manifest["segments"]
+                         for suffix in ('.vec', '.keys', '.off', '.dat')]
+            old_files.append(old_manifest["tombstones"])
+            self.refresh()
+            for name in old_files:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            return {"kept": kept, "dropped": dropped, "segments": len(manifest["segments"])}
+
+    def _write_compacted(self, manifest: Dict[str, Any], ids: List[Hashable], rows: List[bytes],
+                         payloads: List[Any]) -> None:
+        seq = manifest["next_seq"]
+        manifest["next_seq"] += 1
+        segment = {"name": f"seg-{seq:08d}", "seq": seq, "rows": 0}
+        self._append(segment, ids, rows, payloads)
+        segment["rows"] = len(ids)
+        manifest["segments"].append(segment)
+
+    # ---- 读取 ----
+
+    def _live_rows(self) -> Iterator[Tuple[_Segment, int]]:
+        for segment in self._segments:
+            deleted = self._deleted.get(segment.seq, set())
+            for row in range(segment.rows):
+                if row not in deleted:
+                    yield segment, row
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """
+        遍历所有存活行的数据记录（包含 id 和 payload）
+        """
+        self.refresh()
+        with self._lock:
+            live = list(self._live_rows())
+        for segment, row in live:
+            yield segment.payload(row)
+
+    def deleted_ratio(self) -> float:
+        """
+        已标记删除的行在全部行中的占比，用于决定何时压缩
+        """
+        with self._lock:
+            total = sum(segment.rows for segment in self._segments)
+            deleted = sum(len(rows) for rows in self._deleted.values())
+        return deleted / total if total else 0.0
+
+    def __len__(self) -> int:
+        self.refresh()
+        with self._lock:
+            return sum(segment.rows - len(self._deleted.get(segment.seq, ())) for segment in self._segments)
+
+    def search(self, queries, k: int = 10,
+               where: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[List[Tuple[Hashable, float, Any]]]:
+        """
+        批量查询，每个查询返回按相似度降序的 [(ID, 得分, 附加数据), ...]
+
+        where(记录) 用于按附加数据过滤（在取出候选后判断，过滤较多时返回结果可能少于k）
+        """
+        self.refresh()
+        with self._lock:
+            segments = list(self._segments)
+            deleted = {seq: set(rows) for seq, rows in self._deleted.items()}
+        candidates: List[List[Tuple[float, _Segment, int]]] = [[] for _ in range(len(queries))]
+        fetch = k * 4 if where else k
+        for segment in segments:
+            if not segment.rows:
+                continue
+            removed = deleted.get(segment.seq, set())
+            for query_index, hits in enumerate(self._search_segment(segment, queries, fetch + len(removed))):
+                candidates[query_index].extend(
+                    (score, segment, row) for row, score in hits if row not in removed
+                )
+
+        results = []
+        for hits in candidates:
+            hits.sort(key=lambda hit: hit[0], reverse=True)
+            matched = []
+            for score, segment, row in hits:
+                record = segment.payload(row)
+                if where is not None and not where(record):
+                    continue
+                matched.append((record["id"], score, record["payload"]))
+                if len(matched) >= k:
+                    break
+            results.append(matched)
+        return results
+
+    def _search_segment(self, segment: _Segment, queries, k: int) -> List[List[Tuple[int, float]]]:
+        vectors = segment.vectors()
+        if NUMPY_AVAILABLE:
+            query_matrix = np.vstack([
+                np.frombuffer(query.tobytes(), dtype=np.float32) if isinstance(query, array)
+                else np.asarray(query, dtype=np.float32) for query in queries
+            ])
+            scores = query_matrix @ vectors.T
+            k = min(k, segment.rows)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < segment.rows else \
+                np.tile(np.arange(segment.rows), (len(queries), 1))
+            return [[(int(row), float(scores[index, row])) for row in top[index]] for index in range(len(queries))]
+
+        results = []
+        for query in queries:
+            scores = [(row, sum(map(mul, query, vectors[row * self.dim:(row + 1) * self.dim])))
+                      for row in range(segment.rows)]
+            scores.sort(key=lambda hit: hit[1], reverse=True)
+            results.append(scores[:k])
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+            self._version = None
+            self._manifest_stat = None
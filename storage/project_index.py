@@ -0,0 +1,209 @@
+"""
+历史项目索引
+
+把已完成项目的描述和各阶段输出的精简摘录存入本地SQLite：
+项目描述建立FTS5三元组全文索引，同时保存哈希n-gram向量。
+检索时先按查询中文档频率最低的若干三元组从全文索引召回候选，再按向量余弦相似度重排，
+在十万级项目规模下单次检索保持在数十毫秒以内
+"""
+
+import json
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from utils import estimate_tokens, extract_items, split_sections
+from utils.embedding import HashedNgramEmbedder, cosine_scores, vector_from_bytes, vector_to_bytes
+from .sqlite_utils import connect, fts5_trigram_available, fts_match_expression, trigrams
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    project_id TEXT UNIQUE NOT NULL,
+    description TEXT NOT NULL,
+    excerpts TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    reference_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigram_df (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def condense_output(text: str, max_tokens: int = 400, items_per_section: int = 2) -> str:
+    """
+    把阶段输出压缩为摘录：保留各章节标题及其前几个条目，总长度不超过 max_tokens
+    """
+    lines: List[str] = []
+    used = 0
+    for heading, body in split_sections(text):
+        entries = ([f"{heading}："] if heading else []) + [
+            f"- {' '.join(item.split())}" for item in extract_items(body)[:items_per_section]
+        ]
+        for entry in entries:
+            cost = estimate_tokens(entry)
+            if used + cost > max_tokens:
+                return '\n'.join(lines)
+            lines.append(entry)
+            used += cost
+    return '\n'.join(lines)
+
+
+class ProjectIndex:
+    """
+    历史项目的本地检索索引
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: Optional[int] = None):
+        index_config = Config.PROJECT_INDEX_CONFIG
+        self.path = path or index_config["db_path"]
+        self.embedder = HashedNgramEmbedder(dim=dim or index_config["dim"])
+        self.config = index_config
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self.fts_enabled = fts5_trigram_available(self._conn)
+        if self.fts_enabled:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(description, tokenize='trigram')"
+            )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def add(self, project_id: str, description: str, phase_outputs: Optional[Dict[str, str]] = None,
+            reference_count: int = 0) -> None:
+        """
+        索引一个项目；同一 project_id 再次写入时覆盖旧记录
+
+        phase_outputs 为 阶段名 -> 输出，只保存精简摘录；reference_count 为生成时使用的参考项目数，
+        与输出长度一起用于评估检索带来的收益
+        """
+        phase_outputs = phase_outputs or {}
+        excerpts = {
+            phase: condense_output(str(output), self.config["excerpt_tokens"])
+            for phase, output in phase_outputs.items()
+        }
+        output_tokens = sum(estimate_tokens(str(output)) for output in phase_outputs.values())
+        vector = self.embedder.embed(description)
+        with self._lock, self._conn:
+            self._delete(project_id)
+            cursor = self._conn.execute(
+                "INSERT INTO projects (project_id, description, excerpts, vector, output_tokens, reference_count, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (project_id, description, json.dumps(excerpts, ensure_ascii=False), vector_to_bytes(vector),
+                 output_tokens, reference_count, datetime.now().isoformat())
+            )
+            if self.fts_enabled:
+                self._conn.execute(
+                    "INSERT INTO projects_fts (rowid, description) VALUES (?, ?)", (cursor.lastrowid, description)
+                )
+                self._conn.executemany(
+                    "INSERT INTO trigram_df (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    ((term,) for term in trigrams(description))
+                )
+
+    def _delete(self, project_id: str) -> None:
+        row = self._conn.execute(
+            "SELECT id, description FROM projects WHERE project_id = ?", (project_id,)
+        ).fetchone()
+        if row is None:
+            return
+        rowid, description = row
+        self._conn.execute("DELETE FROM projects WHERE id = ?", (rowid,))
+        if self.fts_enabled:
+            self._conn.execute("DELETE FROM projects_fts WHERE rowid = ?", (rowid,))
+            self._conn.executemany(
+                "UPDATE trigram_df SET df = df - 1 WHERE term = ?", ((term,) for term in trigrams(description))
+            )
+
+    def search(self, description: str, top_k: Optional[int] = None,
+               min_score: Optional[float] = None, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        检索与项目描述最相似的历史项目
+
+        返回按相似度降序的列表，每项包含 project_id、score、description 和 excerpts（阶段名 -> 摘录）
+        """
+        top_k = top_k or self.config["top_k"]
+        min_score = self.config["min_score"] if min_score is None else min_score
+        with self._lock:
+            rows = self._candidates(description)
+        if not rows:
+            return []
+
+        scores = cosine_scores(self.embedder.embed(description), [vector_from_bytes(row[4]) for row in rows])
+        ranked = sorted(zip(scores, rows), key=lambda pair: pair[0], reverse=True)
+        results = []
+        for score, (_, project_id, project_description, excerpts, _) in ranked:
+            if score < min_score or project_id == exclude:
+                continue
+            results.append({
+                "project_id": project_id,
+                "score": round(score, 4),
+                "description": project_description,
+                "excerpts": json.loads(excerpts)
+            })
+            if len(results) >= top_k:
+                break
+        return results
+
+    def _candidates(self, description: str) -> List[tuple]:
+        columns = "p.id, p.project_id, p.description, p.excerpts, p.vector"
+        if not self.fts_enabled:
+            return self._conn.execute(f"SELECT {columns} FROM projects p").fetchall()
+
+        terms = trigrams(description)
+        if not terms:
+            return []
+        # 只用文档频率最低的若干三元组召回：常见三元组的倒排表很长，参与召回会显著拖慢检索
+        placeholders = ','.join('?' * len(terms))
+        df = dict(self._conn.execute(
+            f"SELECT term, df FROM trigram_df WHERE term IN ({placeholders}) AND df > 0", terms
+        ).fetchall())
+        rare_terms = sorted(df, key=df.get)[:self.config["query_terms"]]
+        if not rare_terms:
+            return []
+        # 先在全文索引内完成排序和截断，再按rowid取项目记录
+        return self._conn.execute(
+            f"SELECT {columns} FROM projects p WHERE p.id IN ("
+            f"SELECT rowid FROM projects_fts WHERE projects_fts MATCH ? ORDER BY bm25(projects_fts) LIMIT ?)",
+            (fts_match_expression(rare_terms), self.config["candidates"])
+        ).fetchall()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        对比使用参考项目与未使用参考项目时的平均输出长度
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT reference_count > 0, COUNT(*), AVG(output_tokens) FROM projects GROUP BY reference_count > 0"
+            ).fetchall()
+        summary = {"projects": 0, "avg_output_tokens_seeded": None, "avg_output_tokens_cold": None}
+        for seeded, count, average in rows:
+            summary["projects"] += count
+            summary["avg_output_tokens_seeded" if seeded else "avg_output_tokens_cold"] = round(average or 0, 1)
+        return summary
+
+
+def render_reference_projects(references: List[Dict[str, Any]]) -> str:
+    """
+    把检索到的相似项目渲染为提示中的参考材料
+    """
+    blocks = []
+    for index, reference in enumerate(references, 1):
+        lines = [f"参考项目{index}（相似度 {reference['score']:.2f}）：{' '.join(reference['description'].split())}"]
+        for phase, excerpt in reference["excerpts"].items():
+            if excerpt:
+                lines.append(f"[{phase}]\n{excerpt}")
+        blocks.append('\n'.join(lines))
+    return '\n\n'.join(blocks)
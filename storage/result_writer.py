@@ -0,0 +1,124 @@
+"""
+流式结果写入
+
+阶段输出边生成边写入运行目录下的 <文件名>.partial，按字节数和时间间隔批量fsync，
+完成时原子重命名为正式文件。进程中途崩溃时 .partial 中保留已生成的内容；
+写入后不在内存中保留文本，超长文档的内存占用保持平稳
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from config import Config
+
+
+def _fsync_directory(directory: str) -> None:
+    """
+    fsync目录，使重命名在断电后依然有效；不支持目录fsync的平台上忽略
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StreamingResultWriter:
+    """
+    流式结果写入器，可作为上下文管理器使用：正常退出时提交，异常退出时保留 .partial
+    """
+
+    def __init__(self, path: str, fsync_bytes: Optional[int] = None, fsync_interval: Optional[float] = None):
+        writer_config = Config.RESULT_WRITER_CONFIG
+        self.path = path
+        self.partial_path = f"{path}.partial"
+        self.fsync_bytes = fsync_bytes or writer_config["fsync_bytes"]
+        self.fsync_interval = writer_config["fsync_interval"] if fsync_interval is None else fsync_interval
+        self.bytes_written = 0
+        self.chunks_written = 0
+        self.fsync_count = 0
+        self.closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(self.partial_path, 'w', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def __enter__(self) -> 'StreamingResultWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def write(self, chunk: str) -> None:
+        """
+        追加一个输出片段；累计未同步字节数或距上次同步的时间达到阈值时fsync
+        """
+        if not chunk:
+            return
+        self._file.write(chunk)
+        size = len(chunk.encode('utf-8'))
+        self.bytes_written += size
+        self.chunks_written += 1
+        self._unsynced += size
+        if self._unsynced >= self.fsync_bytes or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.checkpoint()
+
+    def consume(self, chunks: Iterable[str]) -> int:
+        """
+        写入整个片段流（如 stream_completion 的输出），返回写入的字节数
+        """
+        for chunk in chunks:
+            self.write(chunk)
+        return self.bytes_written
+
+    def checkpoint(self) -> None:
+        """
+        立即把已写入的内容持久化到磁盘
+        """
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.fsync_count += 1
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def commit(self) -> str:
+        """
+        完成写入：同步并原子重命名为正式文件，返回文件路径
+        """
+        if self.closed:
+            return self.path
+        self.checkpoint()
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        self.closed = True
+        return self.path
+
+    def abort(self) -> str:
+        """
+        中止写入：同步已生成的内容并保留 .partial 文件，返回其路径
+        """
+        if self.closed:
+            return self.partial_path
+        self.checkpoint()
+        self._file.close()
+        self.closed = True
+        return self.partial_path
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path if self.closed and not os.path.exists(self.partial_path) else self.partial_path,
+            "bytes": self.bytes_written,
+            "chunks": self.chunks_written,
+            "fsyncs": self.fsync_count
+        }
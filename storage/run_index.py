@@ -0,0 +1,263 @@
+"""
+历史运行检索索引
+
+每次运行在本地SQLite中对应一条记录：项目描述、模板类型、使用的模型、token数和耗时等元数据，
+以及全部阶段输出组成的FTS5全文索引文档。阶段完成时增量更新，
+支持"哪些项目选择了 PostgreSQL 和 Kubernetes"这类跨阶段的组合查询，并可按元数据过滤。
+
+全文索引使用 unicode61 分词，写入和查询前在中日韩字符之间插入空格，使中文按单字、英文按单词建立索引；
+多字中文词按短语匹配。相比三元组分词，英文技术词的倒排表短得多，十万次运行规模下查询保持在毫秒级
+"""
+
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from utils.text import estimate_tokens
+from .sqlite_utils import connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT UNIQUE NOT NULL,
+    project TEXT NOT NULL DEFAULT '',
+    template TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    total_seconds REAL NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_template ON runs (template, id);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, id);
+CREATE INDEX IF NOT EXISTS runs_project ON runs (project, id);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    model TEXT NOT NULL DEFAULT '',
+    digest TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, phase)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(description, outputs, tokenize='unicode61');
+"""
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_CJK_CHAR = re.compile(f'([{_CJK}])')
+_CJK_WIDE = _CJK + '\u3000-\u303f\uff00-\uffef'
+# 摘要中的高亮标记先用控制字符表示，去除空格时视为透明
+_HIGHLIGHT_OPEN, _HIGHLIGHT_CLOSE = '\x02', '\x03'
+_CJK_GAP = re.compile(f'(?<=[{_CJK_WIDE}])([\x02\x03]?) ([\x02\x03]?)(?=[{_CJK_WIDE}])')
+# 合并文档中各阶段输出之间的分隔符（控制字符，分词器视为分隔而不建立索引）
+_PHASE_SEPARATOR = '\x1e'
+
+
+def segment(text: str) -> str:
+    """
+    在中日韩字符两侧插入空格，使 unicode61 分词器按单字切分
+    """
+    return _CJK_CHAR.sub(r' \1 ', text or '')
+
+
+def unsegment(text: str) -> str:
+    """
+    去掉 segment 在相邻中日韩字符（含全角标点）之间插入的空格（用于展示摘要）
+    """
+    return _CJK_GAP.sub(r'\1\2', ' '.join(text.split()))
+
+
+def build_match_query(query: str) -> str:
+    """
+    把检索语句转换为FTS5查询：按空白切分为检索词，每个词作为短语，全部词都需出现（AND）
+    """
+    phrases = []
+    for term in query.split():
+        tokens = segment(term).split()
+        if tokens:
+            phrases.append('"{}"'.format(' '.join(tokens).replace('"', '""')))
+    return ' AND '.join(phrases)
+
+
+def _splice_phase(outputs: str, position: int, text: str) -> str:
+    """
+    替换合并文档中第 position 个阶段的内容
+    """
+    sections = outputs.split(_PHASE_SEPARATOR) if outputs else []
+    sections.extend([''] * (position + 1 - len(sections)))
+    sections[position] = text
+    return _PHASE_SEPARATOR.join(sections)
+
+
+class RunIndex:
+    """
+    历史运行的全文与元数据检索索引
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.config = Config.RUN_INDEX_CONFIG
+        self.path = path or self.config["db_path"]
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _ensure_run(self, run_id: str) -> int:
+        row = self._conn.execute("SELECT id FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is not None:
+            return row[0]
+        now = datetime.now().isoformat()
+        rowid = self._conn.execute(
+            "INSERT INTO runs (run_id, created_at, updated_at) VALUES (?, ?, ?)", (run_id, now, now)
+        ).lastrowid
+        self._conn.execute("INSERT INTO runs_fts (rowid, description, outputs) VALUES (?, '', '')", (rowid,))
+        return rowid
+
+    def index_run(self, run_id: str, project: str = "", description: str = "", template: str = "",
+                  model: str = "") -> None:
+        """
+        写入或更新运行的元数据和项目描述；空值不覆盖已有内容
+        """
+        with self._lock, self._conn:
+            rowid = self._ensure_run(run_id)
+            for column, value in (("project", project), ("template", template), ("model", model)):
+                if value:
+                    self._conn.execute(f"UPDATE runs SET {column} = ? WHERE id = ?", (value, rowid))
+            if description:
+                self._conn.execute(
+                    "UPDATE runs_fts SET description = ? WHERE rowid = ?", (segment(description), rowid)
+                )
+
+    def add_phase(self, run_id: str, phase: str, output: str, tokens: int = 0, seconds: float = 0.0,
+                  model: str = "", digest: str = "") -> None:
+        """
+        阶段完成时增量更新：记录阶段元数据，累加运行的token数和耗时，并把输出写入全文索引
+        同一运行的同一阶段再次写入时覆盖旧内容
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            rowid = self._ensure_run(run_id)
+            previous = self._conn.execute(
+                "SELECT position, tokens, seconds FROM phases WHERE run_id = ? AND phase = ?", (run_id, phase)
+            ).fetchone()
+            if previous is None:
+                position = self._conn.execute("SELECT COUNT(*) FROM phases WHERE run_id = ?", (run_id,)).fetchone()[0]
+                previous = (position, 0, 0.0)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO phases (run_id, phase, position, tokens, seconds, model, digest, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, phase, previous[0], tokens, seconds, model, digest, now)
+            )
+            self._conn.execute(
+                "UPDATE runs SET total_tokens = total_tokens + ?, total_seconds = total_seconds + ?, "
+                "model = CASE WHEN model = '' THEN ? ELSE model END, updated_at = ? WHERE id = ?",
+                (tokens - previous[1], seconds - previous[2], model, now, rowid)
+            )
+            outputs = self._conn.execute("SELECT outputs FROM runs_fts WHERE rowid = ?", (rowid,)).fetchone()[0]
+            self._conn.execute(
+                "UPDATE runs_fts SET outputs = ? WHERE rowid = ?",
+                (_splice_phase(outputs, previous[0], segment(output)), rowid)
+            )
+
+    def search(self, query: str = "", template: Optional[str] = None, model: Optional[str] = None,
+               project: Optional[str] = None, since: Optional[str] = None, limit: Optional[int] = None,
+               order: str = "recent") -> List[Dict[str, Any]]:
+        """
+        检索历史运行
+
+        query 中以空白分隔的检索词需全部出现在项目描述或任一阶段输出中；
+        template/model/project 精确匹配，since 为ISO格式的起始时间。
+        order 为 "recent"（新运行在前，可在取够结果后立即停止）或 "relevance"（按bm25排序）
+        """
+        limit = limit or self.config["limit"]
+        filters, params = [], []
+        for column, value in (("template", template), ("model", model), ("project", project)):
+            if value:
+                filters.append(f"r.{column} = ?")
+                params.append(value)
+        if since:
+            filters.append("r.created_at >= ?")
+            params.append(since)
+
+        match = build_match_query(query)
+        columns = ("r.run_id, r.project, r.template, r.model, r.total_tokens, r.total_seconds, "
+                   "r.created_at")
+        if match:
+            snippet_tokens = self.config["snippet_tokens"]
+            sql = (f"SELECT {columns}, snippet(runs_fts, -1, '{_HIGHLIGHT_OPEN}', '{_HIGHLIGHT_CLOSE}', '…', "
+                   f"{snippet_tokens}) "
+                   "FROM runs_fts JOIN runs r ON r.id = runs_fts.rowid WHERE runs_fts MATCH ?")
+            params.insert(0, match)
+            order_by = "bm25(runs_fts)" if order == "relevance" else "runs_fts.rowid DESC"
+        else:
+            sql = f"SELECT {columns}, '' FROM runs r WHERE 1"
+            order_by = "r.id DESC"
+        sql += ''.join(f" AND {condition}" for condition in filters) + f" ORDER BY {order_by} LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "run_id": run_id,
+                "project": project_name,
+                "template": template_key,
+                "model": model_name,
+                "total_tokens": total_tokens,
+                "total_seconds": round(total_seconds, 2),
+                "created_at": created_at,
+                "snippet": unsegment(snippet.replace(_PHASE_SEPARATOR, ' | '))
+                .replace(_HIGHLIGHT_OPEN, '[').replace(_HIGHLIGHT_CLOSE, ']')
+            }
+            for run_id, project_name, template_key, model_name, total_tokens, total_seconds, created_at, snippet
+            in rows
+        ]
+
+    def phases(self, run_id: str) -> List[Dict[str, Any]]:
+        """
+        运行中各阶段的元数据
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phase, tokens, seconds, model, digest, created_at FROM phases WHERE run_id = ? "
+                "ORDER BY position", (run_id,)
+            ).fetchall()
+        return [
+            dict(zip(("phase", "tokens", "seconds", "model", "digest", "created_at"), row)) for row in rows
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def import_artifact_store(self, store) -> int:
+        """
+        从产物存储导入尚未建立索引的历史运行，返回导入的运行数
+        阶段的 tokens / seconds 取自清单；早期清单没有记录时按输出长度估算token数，耗时记为0
+        """
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT run_id FROM runs")}
+        imported = 0
+        for manifest in store.list_runs():
+            if manifest["run_id"] in known:
+                continue
+            metadata = manifest.get("metadata", {})
+            self.index_run(manifest["run_id"], project=metadata.get("project", ""),
+                           description=metadata.get("description", ""), template=metadata.get("template", ""),
+                           model=metadata.get("model", ""))
+            for phase, artifact in manifest["phases"].items():
+                output = store.get(artifact["digest"])
+                tokens = artifact.get("tokens")
+                self.add_phase(manifest["run_id"], phase, output,
+                               tokens=estimate_tokens(output) if tokens is None else tokens,
+                               seconds=artifact.get("seconds") or 0.0,
+                               model=metadata.get("model", ""), digest=artifact["digest"])
+            imported += 1
+        return imported
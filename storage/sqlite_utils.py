@@ -0,0 +1,50 @@
+"""
+SQLite辅助函数
+
+统一本地索引的连接参数，并提供FTS5三元组（trigram）检索所需的工具函数
+"""
+
+import os
+import sqlite3
+from typing import List
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    打开SQLite数据库（不存在时创建），启用WAL以便读写并发
+    """
+    if path != ':memory:':
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def fts5_trigram_available(conn: sqlite3.Connection) -> bool:
+    """
+    检查SQLite是否支持FTS5及trigram分词器（SQLite 3.34+）
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def trigrams(text: str) -> List[str]:
+    """
+    按FTS5 trigram分词器的规则切分文本（不区分大小写），去重并保持顺序
+    """
+    text = (text or '').lower()
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def fts_match_expression(terms: List[str]) -> str:
+    """
+    把检索词组合为FTS5的 OR 查询表达式，每个词按短语引用
+    """
+    return ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
@@ -0,0 +1,259 @@
+"""
+本地向量索引
+
+向量保存在连续的float32矩阵中，批量查询通过一次矩阵乘法加 argpartition 完成top-k，
+不依赖网络嵌入服务或独立的向量数据库。向量应已L2归一化，内积即余弦相似度。
+
+VectorIndex 为精确检索；IVFIndex 为倒排文件近似检索（球面k-means聚类，查询时只扫描最近的若干个簇），
+适用于大规模存储。未安装 numpy 时 VectorIndex 退化为标准库实现，IVFIndex 不可用
+"""
+
+import heapq
+from array import array
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from config import Config
+from utils.embedding import NUMPY_AVAILABLE, cosine_scores, np
+
+SearchResult = List[Tuple[Hashable, float]]
+
+
+def _as_matrix(vectors, dim: int):
+    """
+    把向量列表（array('f')、列表或numpy数组）转换为 (n, dim) 的float32矩阵
+    """
+    if isinstance(vectors, np.ndarray):
+        return np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, dim)
+    rows = [np.frombuffer(vector.tobytes(), dtype=np.float32) if isinstance(vector, array)
+            else np.asarray(vector, dtype=np.float32) for vector in vectors]
+    if not rows:
+        return np.empty((0, dim), dtype=np.float32)
+    return np.vstack(rows).reshape(-1, dim)
+
+
+def _top_k(scores, k: int):
+    """
+    返回每行得分最高的k个列下标（按得分降序）
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class VectorIndex:
+    """
+    精确向量索引：连续float32矩阵，容量不足时倍增，删除时用最后一行填补空位
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self._ids: List[Hashable] = []
+        self._positions: Dict[Hashable, int] = {}
+        if NUMPY_AVAILABLE:
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        else:
+            self._rows: List[array] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, vector_id: Hashable) -> bool:
+        return vector_id in self._positions
+
+    def add(self, ids: Sequence[Hashable], vectors) -> None:
+        """
+        批量添加向量；已存在的ID会被覆盖
+        """
+        ids = list(ids)
+        self.remove([vector_id for vector_id in ids if vector_id in self._positions])
+        if not NUMPY_AVAILABLE:
+            for vector_id, vector in zip(ids, vectors):
+                self._positions[vector_id] = len(self._ids)
+                self._ids.append(vector_id)
+                self._rows.append(vector if isinstance(vector, array) else array('f', vector))
+            return
+
+        matrix = _as_matrix(vectors, self.dim)
+        if len(matrix) != len(ids):
+            raise ValueError("ID数量与向量数量不一致")
+        size = len(self._ids)
+        required = size + len(ids)
+        if required > len(self._matrix):
+            capacity = max(required, 2 * len(self._matrix))
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        self._matrix[size:required] = matrix
+        for offset, vector_id in enumerate(ids):
+            self._positions[vector_id] = size + offset
+        self._ids.extend(ids)
+
+    def remove(self, ids: Sequence[Hashable]) -> None:
+        for vector_id in ids:
+            position = self._positions.pop(vector_id, None)
+            if position is None:
+                continue
+            last = len(self._ids) - 1
+            if position != last:
+                moved = self._ids[last]
+                self._ids[position] = moved
+                self._positions[moved] = position
+                if NUMPY_AVAILABLE:
+                    self._matrix[position] = self._matrix[last]
+                else:
+                    self._rows[position] = self._rows[last]
+            self._ids.pop()
+            if not NUMPY_AVAILABLE:
+                self._rows.pop()
+
+    def vectors(self):
+        """
+        当前所有向量组成的矩阵视图（需要 numpy）
+        """
+        return self._matrix[:len(self._ids)]
+
+    def ids(self) -> List[Hashable]:
+        return list(self._ids)
+
+    def search(self, queries, k: int = 10) -> List[SearchResult]:
+        """
+        批量查询，每个查询返回按相似度降序的 [(ID, 得分), ...]
+        """
+        if not self._ids:
+            return [[] for _ in range(len(queries))]
+        if not NUMPY_AVAILABLE:
+            results = []
+            for query in queries:
+                scores = cosine_scores(query if isinstance(query, array) else array('f', query), self._rows)
+                best = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+                results.append([(self._ids[index], scores[index]) for index in best])
+            return results
+
+        query_matrix = _as_matrix(queries, self.dim)
+        scores = query_matrix @ self.vectors().T
+        top = _top_k(scores, k)
+        return [
+            [(self._ids[column], float(scores[row, column])) for column in top[row]]
+            for row in range(len(query_matrix))
+        ]
+
+
+class IVFIndex:
+    """
+    倒排文件（IVF）近似向量索引
+
+    向量数达到 train_size 时用球面k-means训练 n_lists 个簇中心，此后每个向量归入最近的簇；
+    查询时只扫描与查询最接近的 n_probe 个簇。训练之前退化为精确检索
+    """
+
+    def __init__(self, dim: int, n_lists: Optional[int] = None, n_probe: Optional[int] = None,
+                 train_size: Optional[int] = None, seed: int = 0):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("IVFIndex 需要安装 numpy: pip install numpy")
+        index_config = Config.VECTOR_INDEX_CONFIG
+        self.dim = dim
+        self.n_lists = n_lists or index_config["n_lists"]
+        self.n_probe = n_probe or index_config["n_probe"]
+        self.train_size = train_size or index_config["train_size"]
+        self._rng = np.random.default_rng(seed)
+        self._centroids = None
+        self._lists: List[VectorIndex] = []
+        self._list_of: Dict[Hashable, int] = {}
+        self._pending = VectorIndex(dim)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._pending) if not self.trained else len(self._list_of)
+
+    def train(self, vectors, iterations: int = 10) -> None:
+        """
+        用给定样本训练簇中心（球面k-means）
+        """
+        sample = _as_matrix(vectors, self.dim)
+        n_lists = min(self.n_lists, len(sample))
+        centroids = sample[self._rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # 空簇重新随机选取样本作为中心
+            sums[empty] = sample[self._rng.choice(len(sample), int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [VectorIndex(self.dim, capacity=max(16, 2 * len(sample) // n_lists)) for _ in range(n_lists)]
+
+    def add(self, ids: Sequence[Hashable], vectors) -> None:
+        ids = list(ids)
+        matrix = _as_matrix(vectors, self.dim)
+        if not self.trained:
+            self._pending.add(ids, matrix)
+            if len(self._pending) >= self.train_size:
+                pending_ids, pending_vectors = self._pending.ids(), self._pending.vectors().copy()
+                self._pending = VectorIndex(self.dim)
+                self.train(pending_vectors)
+                self.add(pending_ids, pending_vectors)
+            return
+
+        self.remove([vector_id for vector_id in ids if vector_id in self._list_of])
+        assignment = np.argmax(matrix @ self._centroids.T, axis=1)
+        for list_no in np.unique(assignment):
+            rows = np.nonzero(assignment == list_no)[0]
+            list_ids = [ids[row] for row in rows]
+            self._lists[list_no].add(list_ids, matrix[rows])
+            for vector_id in list_ids:
+                self._list_of[vector_id] = int(list_no)
+
+    def remove(self, ids: Sequence[Hashable]) -> None:
+        if not self.trained:
+            self._pending.remove(ids)
+            return
+        for vector_id in ids:
+            list_no = self._list_of.pop(vector_id, None)
+            if list_no is not None:
+                self._lists[list_no].remove([vector_id])
+
+    def search(self, queries, k: int = 10, n_probe: Optional[int] = None) -> List[SearchResult]:
+        """
+        批量近似查询：按簇分组，每个簇对探测到它的全部查询做一次矩阵乘法
+        """
+        if not self.trained:
+            return self._pending.search(queries, k)
+        query_matrix = _as_matrix(queries, self.dim)
+        probes = _top_k(query_matrix @ self._centroids.T, n_probe or self.n_probe)
+
+        candidates: List[List[Tuple[float, Hashable]]] = [[] for _ in range(len(query_matrix))]
+        for list_no in np.unique(probes):
+            inverted = self._lists[list_no]
+            if not len(inverted):
+                continue
+            query_rows = np.nonzero((probes == list_no).any(axis=1))[0]
+            for query_row, hits in zip(query_rows, inverted.search(query_matrix[query_rows], k)):
+                candidates[query_row].extend((score, vector_id) for vector_id, score in hits)
+        return [
+            [(vector_id, score) for score, vector_id in heapq.nlargest(k, hits, key=lambda hit: hit[0])]
+            for hits in candidates
+        ]
+
+
+def create_vector_index(dim: int, approximate: Optional[bool] = None, capacity: int = 1024):
+    """
+    按配置创建向量索引：approximate 为真且安装了 numpy 时使用 IVFIndex，否则使用精确检索，
+    capacity 为精确索引预分配的行数
+    """
+    if approximate is None:
+        approximate = Config.VECTOR_INDEX_CONFIG["approximate"]
+    if approximate and NUMPY_AVAILABLE:
+        return IVFIndex(dim)
+    return VectorIndex(dim, capacity=capacity)
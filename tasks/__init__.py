@@ -37,6 +37,11 @@ from .project_management import (
     create_stakeholder_communication_task,
     create_project_closure_task
 )
+from .structured import (
+    STRUCTURED_SCHEMAS,
+    get_structured_schema,
+    create_structured_task
+)
 
 __all__ = [
     # Requirements Analysis
@@ -76,5 +81,10 @@ __all__ = [
     'create_risk_management_task',
     'create_quality_assurance_task',
     'create_stakeholder_communication_task',
-    'create_project_closure_task'
+    'create_project_closure_task',
+    
+    # Structured Output
+    'STRUCTURED_SCHEMAS',
+    'get_structured_schema',
+    'create_structured_task'
 ]
\ No newline at end of file
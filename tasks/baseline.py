@@ -0,0 +1,23 @@
+"""
+基于模板基线的增量生成
+
+同类项目的系统设计、部署方案和测试计划大部分内容相同。
+提供预先生成的模板基线时，任务只要求模型输出需要针对本项目调整的章节，
+未输出的章节沿用基线内容（见 workflows.template_cache.merge_with_baseline）
+"""
+
+
+def render_baseline_instructions(baseline: str) -> str:
+    """
+    生成附加在任务描述末尾的基线说明，baseline 为空时返回空字符串
+    """
+    if not baseline:
+        return ""
+    return f'''
+        
+        参考基线（同类项目预先生成的通用方案）：
+        {baseline}
+        
+        请以上述基线为起点，只输出需要针对本项目修改或补充的章节，
+        章节标题与基线保持一致（## 序号. 标题），每个输出的章节需给出完整内容；
+        未输出的章节将直接沿用基线内容'''
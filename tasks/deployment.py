@@ -1,5 +1,6 @@
 from crewai import Task
 from agents import create_devops_engineer
+from .baseline import render_baseline_instructions
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -9,9 +10,11 @@ except ImportError:
     except ImportError:
         pass  # 将在运行时处理
 
-def create_deployment_planning_task(agent, architecture_doc: str, environment_requirements: str) -> Task:
+def create_deployment_planning_task(agent, architecture_doc: str, environment_requirements: str,
+                                    baseline: str = "") -> Task:
     """
     创建部署规划任务
+    提供 baseline（模板基线）时只要求输出需要调整的章节
     """
     return Task(
         description=f'''
@@ -32,7 +35,7 @@ def create_deployment_planning_task(agent, architecture_doc: str, environment_re
         输出要求：
         - 提供详细的部署架构图
         - 考虑高可用和扩展性
-        - 制定合理的资源配置
+        - 制定合理的资源配置{render_baseline_instructions(baseline)}
         ''',
         agent=agent,
         expected_output='''
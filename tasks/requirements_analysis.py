@@ -15,10 +15,18 @@ except ImportError:
     except ImportError:
         pass  # 将在运行时处理
 
-def create_requirements_analysis_task(agent, project_description: str) -> Task:
+def create_requirements_analysis_task(agent, project_description: str, reference_projects: str = "") -> Task:
     """
     创建需求分析任务
+    提供 reference_projects（相似历史项目的摘录）时作为参考材料附加到任务描述中
     """
+    reference_requirement = ""
+    if reference_projects:
+        reference_requirement = f"""
+        
+        以下是相似历史项目的需求分析摘录，可借鉴其结构和通用需求，
+        与本项目相同的通用内容请简明列出，重点描述本项目特有的需求：
+        {reference_projects}"""
     return Task(
         description=f'''
         基于以下项目描述进行深入的需求分析：
@@ -36,7 +44,7 @@ def create_requirements_analysis_task(agent, project_description: str) -> Task:
         输出要求：
         - 需求规格说明书应包含功能需求、非功能需求、用户故事等
         - 使用清晰的结构和专业的语言
-        - 确保需求的可测试性和可实现性
+        - 确保需求的可测试性和可实现性{reference_requirement}
         ''',
         agent=agent,
         expected_output='''
@@ -75,5 +83,6 @@ def create_requirements_review_task(agent, requirements_doc: str) -> Task:
         2. 发现的问题和风险
         3. 改进建议
         4. 优化后的需求文档
+        5. 评审结论（通过 / 需要重大修改）
         '''
     )
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+任务工厂的结构化输出模式
+
+为部分任务工厂定义按章节组织的输出schema（WBS条目、风险、测试用例、部署组件等）。
+create_structured_task 调用原有任务工厂后，把 expected_output 改写为按schema输出JSON，
+再由 utils.structured_output.StructuredOutputRunner 流式解析并按章节校验、重试
+"""
+
+from typing import Any, Callable, Dict
+
+from crewai import Task
+
+from utils.structured_output import render_schema_instructions
+
+# 任务工厂名 -> 输出schema
+STRUCTURED_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "create_development_planning_task": {
+        "title": "开发计划",
+        "sections": {
+            "wbs": {
+                "description": "任务分解结构（WBS）",
+                "fields": {
+                    "id": "string",
+                    "name": "string",
+                    "module": "string",
+                    "estimate_days": "number",
+                    "dependencies": "array"
+                },
+                "required": ["id", "name", "estimate_days"]
+            },
+            "milestones": {
+                "description": "开发里程碑",
+                "fields": {"name": "string", "week": "integer", "deliverables": "array"},
+                "required": ["name", "week"]
+            },
+            "risks": {
+                "description": "技术风险评估",
+                "fields": {"risk": "string", "impact": "string", "mitigation": "string"}
+            }
+        }
+    },
+    "create_risk_management_task": {
+        "title": "风险管理报告",
+        "sections": {
+            "risks": {
+                "description": "风险识别和评估",
+                "fields": {
+                    "id": "string",
+                    "description": "string",
+                    "probability": "string",
+                    "impact": "string",
+                    "priority": "integer",
+                    "response_strategy": "string",
+                    "owner": "string"
+                },
+                "required": ["id", "description", "probability", "impact", "response_strategy"]
+            },
+            "monitoring_plan": {
+                "description": "风险监控计划",
+                "fields": {"risk_id": "string", "trigger": "string", "action": "string"}
+            }
+        }
+    },
+    "create_test_case_design_task": {
+        "title": "测试用例文档",
+        "sections": {
+            "test_cases": {
+                "description": "测试用例",
+                "fields": {
+                    "id": "string",
+                    "title": "string",
+                    "type": "string",
+                    "priority": "string",
+                    "preconditions": "array",
+                    "steps": "array",
+                    "expected_result": "string"
+                },
+                "required": ["id", "title", "type", "steps", "expected_result"]
+            },
+            "test_data": {
+                "description": "测试数据准备",
+                "fields": {"name": "string", "description": "string"}
+            }
+        }
+    },
+    "create_deployment_planning_task": {
+        "title": "部署方案",
+        "sections": {
+            "components": {
+                "description": "部署组件",
+                "fields": {
+                    "name": "string",
+                    "type": "string",
+                    "runtime": "string",
+                    "replicas": "integer",
+                    "depends_on": "array",
+                    "resources": "string"
+                },
+                "required": ["name", "type", "runtime"]
+            },
+            "environments": {
+                "description": "环境配置规范",
+                "fields": {"name": "string", "purpose": "string", "config": "string"}
+            },
+            "pipeline_stages": {
+                "description": "CI/CD流水线阶段",
+                "fields": {"name": "string", "steps": "array"}
+            }
+        }
+    }
+}
+
+
+def get_structured_schema(factory_name: str) -> Dict[str, Any]:
+    """
+    获取任务工厂对应的输出schema
+    """
+    if factory_name not in STRUCTURED_SCHEMAS:
+        supported = ', '.join(STRUCTURED_SCHEMAS)
+        raise ValueError(f"任务工厂 {factory_name} 不支持结构化输出模式，支持的工厂: {supported}")
+    return STRUCTURED_SCHEMAS[factory_name]
+
+
+def create_structured_task(factory: Callable[..., Task], *args, **kwargs) -> Task:
+    """
+    以结构化输出模式创建任务
+    任务描述保持不变，expected_output 改为按schema输出的JSON对象
+    """
+    schema = get_structured_schema(factory.__name__)
+    task = factory(*args, **kwargs)
+    task.expected_output = f'''
+        {schema["title"]}（JSON格式）
+        {render_schema_instructions(schema)}
+        '''
+    return task
@@ -1,5 +1,6 @@
 from crewai import Task
 from agents import create_system_architect
+from .baseline import render_baseline_instructions
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -9,9 +10,10 @@ except ImportError:
     except ImportError:
         pass  # 将在运行时处理
 
-def create_system_design_task(agent, requirements_doc: str) -> Task:
+def create_system_design_task(agent, requirements_doc: str, baseline: str = "") -> Task:
     """
     创建系统架构设计任务
+    提供 baseline（模板基线）时只要求输出需要调整的章节
     """
     return Task(
         description=f'''
@@ -31,7 +33,7 @@ def create_system_design_task(agent, requirements_doc: str) -> Task:
         输出要求：
         - 提供清晰的架构图和设计文档
         - 说明技术选型的理由
-        - 考虑系统的非功能性需求
+        - 考虑系统的非功能性需求{render_baseline_instructions(baseline)}
         ''',
         agent=agent,
         expected_output='''
@@ -73,6 +75,7 @@ def create_architecture_review_task(agent, architecture_doc: str) -> Task:
         3. 风险识别和缓解方案
         4. 性能和扩展性评估
         5. 改进建议和最佳实践
+        6. 评审结论（通过 / 需要重大修改）
         '''
     )
 
@@ -1,5 +1,6 @@
 from crewai import Task
 from agents import create_test_engineer
+from .baseline import render_baseline_instructions
 # 兼容不同的LLM提供商
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
@@ -9,9 +10,10 @@ except ImportError:
     except ImportError:
         pass  # 将在运行时处理
 
-def create_test_planning_task(agent, requirements_doc: str, architecture_doc: str) -> Task:
+def create_test_planning_task(agent, requirements_doc: str, architecture_doc: str, baseline: str = "") -> Task:
     """
     创建测试计划任务
+    提供 baseline（模板基线）时只要求输出需要调整的章节
     """
     return Task(
         description=f'''
@@ -32,7 +34,7 @@ def create_test_planning_task(agent, requirements_doc: str, architecture_doc: st
         输出要求：
         - 覆盖所有功能和非功能需求
         - 考虑各种异常场景和边界条件
-        - 制定合理的测试优先级
+        - 制定合理的测试优先级{render_baseline_instructions(baseline)}
         ''',
         agent=agent,
         expected_output='''
@@ -123,10 +125,15 @@ def create_test_execution_task(agent, test_cases: str, code_version: str) -> Tas
         '''
     )
 
-def create_regression_testing_task(agent, previous_results: str, new_changes: str) -> Task:
+def create_regression_testing_task(agent, previous_results: str, new_changes: str, components: list = None) -> Task:
     """
     创建回归测试任务
+    提供 components 时要求按组件分节输出，便于把结果合并回按组件索引的测试基线
     """
+    component_requirement = ""
+    if components:
+        component_requirement = f"""
+        - 按以下组件分节输出回归结果，每个组件使用二级标题（## 组件名）：{'、'.join(components)}"""
     return Task(
         description=f'''
         对系统变更进行回归测试：
@@ -145,7 +152,7 @@ def create_regression_testing_task(agent, previous_results: str, new_changes: st
         回归测试要求：
         - 重点关注变更相关功能
         - 验证核心功能未受影响
-        - 确保修复的缺陷不再出现
+        - 确保修复的缺陷不再出现{component_requirement}
         ''',
         agent=agent,
         expected_output='''
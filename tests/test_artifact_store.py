@@ -0,0 +1,72 @@
+"""
+产物存储配额回收测试
+"""
+
+import os
+import time
+
+import pytest
+
+from config import Config
+from storage.artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setitem(Config.ARTIFACT_STORE_CONFIG, "keep_min_runs", 1)
+    monkeypatch.setitem(Config.ARTIFACT_STORE_CONFIG, "gc_grace_seconds", 3600)
+    store = ArtifactStore(root=str(tmp_path), max_bytes=10 ** 9)
+    gc_calls = []
+    gc = store.gc
+    monkeypatch.setattr(store, "gc", lambda *args, **kwargs: gc_calls.append(kwargs) or gc(*args, **kwargs))
+    store.gc_calls = gc_calls
+    return store
+
+
+def _save_runs(store, count, age):
+    for index in range(count):
+        store.save_phase(f"run-{index}", "design", os.urandom(2048).hex())
+        time.sleep(0.01)
+    old = time.time() - age
+    for _, path in store._iter_objects():
+        os.utime(path, (old, old))
+
+
+def test_enforce_quota_deletes_oldest_runs_with_one_gc(store):
+    _save_runs(store, 5, age=7200)
+    per_run = store.total_bytes() // 5
+    result = store.enforce_quota(max_bytes=per_run * 3 + per_run // 2)
+    assert result["deleted_runs"] == 2
+    assert result["freed_bytes"] > 0
+    assert [run["run_id"] for run in store.list_runs()] == ["run-2", "run-3", "run-4"]
+    assert store.gc_calls == [{}]
+
+
+def test_enforce_quota_respects_grace_period(store):
+    _save_runs(store, 3, age=0)
+    result = store.enforce_quota(max_bytes=1)
+    assert result == {"deleted_runs": 0, "freed_bytes": 0}
+    assert len(store.list_runs()) == 3
+
+
+def test_save_phase_skips_quota_pass_until_grace_expires(store, monkeypatch):
+    passes = []
+    enforce = store.enforce_quota
+    monkeypatch.setattr(store, "enforce_quota", lambda **kwargs: passes.append(kwargs) or enforce(**kwargs))
+    store.max_bytes = 1
+    _save_runs(store, 4, age=0)
+    # 第1次保存时只有一个运行，之后第一次真正扫描发现对象都在宽限期内，后续保存不再扫描
+    assert len(passes) == 2
+    assert store.gc_calls == []
+    store.delete_run("run-0")
+    store.save_phase("run-5", "design", "新内容")
+    assert len(passes) == 3
+
+
+def test_put_rewrites_object_removed_by_concurrent_gc(store, monkeypatch):
+    digest = store.put("并发回收的内容")["digest"]
+    path = store._find_object(digest)
+    monkeypatch.setattr(store, "_find_object", lambda digest: path)
+    os.remove(path)
+    assert store.put("并发回收的内容")["digest"] == digest
+    assert os.path.exists(path)
@@ -0,0 +1,35 @@
+"""
+分片代码审查合并测试
+"""
+
+from workflows.code_review import ShardedCodeReview
+
+SECTIONS = ["代码质量", "安全问题"]
+SHARD_OUTPUT = "## 1. 代码质量\n- 变量命名不清晰\n## 2. 安全问题\n"
+
+
+def test_consolidate_without_failures():
+    report, duplicates = ShardedCodeReview(None).consolidate([({"index": 1}, SHARD_OUTPUT)] * 2, SECTIONS)
+    assert duplicates == 1
+    assert "变量命名不清晰 _(分片 1)_" in report
+    assert "未发现相关问题。" in report
+    assert "未完成" not in report
+
+
+def test_consolidate_reports_failed_shards():
+    failed = [{"index": 2, "files": ["api/users.py", "api/orders.py"], "error": "timeout"}]
+    report, _ = ShardedCodeReview(None).consolidate([({"index": 1}, SHARD_OUTPUT)], SECTIONS, failed)
+    assert "api/users.py, api/orders.py" in report
+    assert "未发现相关问题" not in report
+    assert report.count("未完成：分片 2") == len(SECTIONS)
+    assert "## 1. 代码质量" in report
+
+
+def test_review_parallelism_is_independent_of_workflow_switch():
+    from config import Config
+    from workflows.parallel import get_max_workers
+
+    assert Config.WORKFLOW_CONFIG["enable_parallel_execution"] is False
+    assert get_max_workers(4) == 1
+    assert get_max_workers(4, enabled=ShardedCodeReview(None).parallel) == 4
+    assert get_max_workers(4, enabled=ShardedCodeReview(None, parallel=False).parallel) == 1
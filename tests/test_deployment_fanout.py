@@ -0,0 +1,37 @@
+"""
+部署扇出阶段测试：与其他阶段一样经由 run_phase 执行
+"""
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("litellm")
+
+from benchmarks.fake_llm import FakeCompletion  # noqa: E402
+from config import Config  # noqa: E402
+from litellm_wrapper import LiteLLMWrapper  # noqa: E402
+from observability import get_tracer, get_usage_tracker  # noqa: E402
+from storage import get_metrics_dataset  # noqa: E402
+from workflows import create_software_development_workflow  # noqa: E402
+
+
+def test_fanout_runs_as_a_phase(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OTEL_SDK_DISABLED", "true")
+    monkeypatch.setenv("GOOGLE_API_KEY", "offline-test")
+    monkeypatch.setenv("CREWAI_STORAGE_DIR", str(tmp_path / "crewai"))
+    monkeypatch.setitem(Config.CREW_CONFIG, "memory", False)
+    monkeypatch.setitem(Config.ARTIFACT_STORE_CONFIG, "root", str(tmp_path / "artifacts"))
+    try:
+        with FakeCompletion(response_tokens=40):
+            workflow = create_software_development_workflow(LiteLLMWrapper(model="gemini/gemini-1.5-flash"))
+            run_id = workflow.start_run("fanout-test")
+            result = workflow.run_deployment_fanout("部署方案：Kubernetes + PostgreSQL")
+    finally:
+        # 缓冲的追踪和指标在离开临时目录前写出
+        get_tracer().flush()
+        if get_metrics_dataset() is not None:
+            get_metrics_dataset().flush()
+    assert result["critical_path"][-1] == "production"
+    assert "deployment_fanout" in workflow.artifact_store.load_run(run_id)
+    assert "deployment_fanout" in get_usage_tracker().run_summary(run_id)["phases"]
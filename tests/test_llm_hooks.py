@@ -0,0 +1,70 @@
+"""
+litellm请求回调测试
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("litellm")
+
+import litellm_wrapper
+from litellm_wrapper import LLM_CALLS, LLM_IN_FLIGHT, LLM_RATE_LIMITED, LLM_TOKENS, LLMCallHook
+from observability import Tracer, load_spans
+
+
+@pytest.fixture
+def rows(monkeypatch, tmp_path):
+    rows = []
+    tracer = Tracer(path=str(tmp_path / "traces.jsonl"), enabled=True)
+    monkeypatch.setattr(litellm_wrapper, "record_metric", lambda kind, **fields: rows.append({"kind": kind, **fields}))
+    monkeypatch.setattr(litellm_wrapper, "get_tracer", lambda: tracer)
+    return rows
+
+
+def _kwargs(call_id, model="test/hook-model", **extra):
+    return {"litellm_call_id": call_id, "model": model,
+            "litellm_params": {"metadata": {"task_key": "design", "continuation": 0}}, **extra}
+
+
+def test_success_records_instruments_once(rows, tmp_path):
+    hook = LLMCallHook()
+    calls = LLM_CALLS.labels("test/hook-model", "ok").value
+    output_tokens = LLM_TOKENS.labels("test/hook-model", "output").value
+    hook.log_pre_api_call("hook-model", [], _kwargs("call-1"))
+    assert LLM_IN_FLIGHT.labels("test/hook-model").value == 1
+    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=12, completion_tokens=34))
+    hook.log_success_event(_kwargs("call-1"), response, None, None)
+    hook.log_success_event(_kwargs("call-1"), response, None, None)
+    assert LLM_IN_FLIGHT.labels("test/hook-model").value == 0
+    assert LLM_CALLS.labels("test/hook-model", "ok").value == calls + 1
+    assert LLM_TOKENS.labels("test/hook-model", "output").value == output_tokens + 34
+    assert [(row["kind"], row["task_key"], row["total_tokens"]) for row in rows] == [("llm_call", "design", 46)]
+    spans = load_spans(str(tmp_path / "traces.jsonl"))
+    assert [span["name"] for span in spans] == ["llm.completion"]
+    assert spans[0]["attributes"]["llm.calls"] == 1
+    assert spans[0]["attributes"]["llm.retries"] == 0
+
+
+def test_failure_counts_rate_limits(rows):
+    hook = LLMCallHook()
+    limited = LLM_RATE_LIMITED.labels("test/limited").value
+    error = Exception("rate limited")
+    error.status_code = 429
+    hook.log_pre_api_call("limited", [], _kwargs("call-2", model="test/limited"))
+    hook.log_failure_event(_kwargs("call-2", model="test/limited", exception=error), None, None, None)
+    assert LLM_CALLS.labels("test/limited", "error").value == 1
+    assert LLM_RATE_LIMITED.labels("test/limited").value == limited + 1
+    assert LLM_IN_FLIGHT.labels("test/limited").value == 0
+    assert rows[0]["status"] == "error"
+
+
+def test_continuation_rolls_up_as_retry(rows, tmp_path):
+    hook = LLMCallHook()
+    kwargs = _kwargs("call-3")
+    kwargs["litellm_params"]["metadata"]["continuation"] = 2
+    hook.log_pre_api_call("hook-model", [], kwargs)
+    response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1))
+    hook.log_success_event(kwargs, response, None, None)
+    attributes = load_spans(str(tmp_path / "traces.jsonl"))[0]["attributes"]
+    assert (attributes["llm.calls"], attributes["llm.retries"]) == (1, 2)
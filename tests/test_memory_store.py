@@ -0,0 +1,53 @@
+"""
+有界记忆存储测试
+"""
+
+import pytest
+
+from config import Config
+from storage.memory_store import BoundedMemoryStorage, MmapMemoryStorage, build_crew_memory
+
+
+def test_empty_storage_is_truthy(tmp_path):
+    bounded = BoundedMemoryStorage(namespace="test-empty")
+    mmap = MmapMemoryStorage(namespace="test-empty", directory=str(tmp_path / "mmap"))
+    assert len(bounded) == 0 and bool(bounded)
+    assert len(mmap) == 0 and bool(mmap)
+
+
+def test_save_and_search_within_namespace():
+    storage = BoundedMemoryStorage(namespace="test-search", retrieval="ngram")
+    storage.save("用户服务使用PostgreSQL存储订单数据", {"importance": 1})
+    results = storage.search("订单数据存储在哪里", score_threshold=0.0)
+    assert results and "PostgreSQL" in results[0]["context"]
+    assert BoundedMemoryStorage(namespace="test-other", retrieval="ngram").search("订单数据", score_threshold=0.0) == []
+
+
+@pytest.mark.parametrize("backend, storage_class", [("bounded", BoundedMemoryStorage), ("mmap", MmapMemoryStorage)])
+def test_build_crew_memory_keeps_namespaced_storage(monkeypatch, tmp_path, backend, storage_class):
+    pytest.importorskip("crewai.memory")
+    monkeypatch.setitem(Config.CREW_CONFIG, "memory", True)
+    monkeypatch.setitem(Config.MEMORY_CONFIG, "backend", backend)
+    monkeypatch.setitem(Config.MMAP_STORE_CONFIG, "base_dir", str(tmp_path))
+    kw = build_crew_memory(f"test-crew-{backend}")
+    assert type(kw["short_term_memory"].storage) is storage_class
+    assert type(kw["entity_memory"].storage) is storage_class
+
+
+def test_approximate_index_is_used_for_vector_retrieval(monkeypatch):
+    pytest.importorskip("numpy")
+    from storage.vector_index import IVFIndex
+    monkeypatch.setitem(Config.VECTOR_INDEX_CONFIG, "approximate", True)
+    monkeypatch.setitem(Config.VECTOR_INDEX_CONFIG, "train_size", 8)
+    monkeypatch.setitem(Config.VECTOR_INDEX_CONFIG, "n_lists", 2)
+    monkeypatch.setitem(Config.VECTOR_INDEX_CONFIG, "n_probe", 2)
+    storage = BoundedMemoryStorage(namespace="test-ivf", retrieval="vector")
+    assert isinstance(storage._index, IVFIndex)
+    for index in range(12):
+        storage.save(f"第{index}号服务的部署说明：使用Kubernetes滚动发布", {})
+    storage.save("订单数据存储在PostgreSQL中", {})
+    assert storage._index.trained
+    results = storage.search("订单数据存储在哪里", score_threshold=0.0)
+    assert "PostgreSQL" in results[0]["context"]
+    storage.reset()
+    assert isinstance(storage._index, IVFIndex) and len(storage._index) == 0
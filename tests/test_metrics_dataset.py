@@ -0,0 +1,24 @@
+"""
+列式指标数据集测试
+"""
+
+import pytest
+
+from storage.metrics_dataset import MetricsDataset
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow", "jsonl"])
+def test_dataset_opens_every_format(tmp_path, file_format):
+    pytest.importorskip("pyarrow")
+    metrics = MetricsDataset(root=str(tmp_path), file_format=file_format, flush_rows=1000, flush_seconds=3600)
+    metrics.record("llm_call", run_id="r1", phase="design", total_tokens=120)
+    metrics.record("phase", run_id="r1", phase="design", latency_ms=35.0)
+    metrics.flush()
+    metrics.record("llm_call", run_id="r2", phase="testing", total_tokens=80)
+    metrics.flush()
+    table = metrics.dataset().to_table(columns=["kind", "run_id", "total_tokens", "date"])
+    assert table.num_rows == 3
+    rows = sorted(table.to_pylist(), key=lambda row: (row["run_id"], row["kind"]))
+    assert [(row["run_id"], row["kind"], row["total_tokens"]) for row in rows] == [
+        ("r1", "llm_call", 120), ("r1", "phase", None), ("r2", "llm_call", 80)
+    ]
@@ -0,0 +1,55 @@
+"""
+内存映射向量存储测试
+"""
+
+import os
+
+import pytest
+
+from storage.mmap_store import MmapVectorStore
+
+
+def _vector(index, dim=4):
+    return [1.0 if i == index % dim else 0.0 for i in range(dim)]
+
+
+def test_search_after_segment_files_removed(tmp_path):
+    writer = MmapVectorStore(str(tmp_path), dim=4)
+    reader = MmapVectorStore(str(tmp_path))
+    writer.add(["a", "b"], [_vector(0), _vector(1)], [{"n": 1}, {"n": 2}])
+    reader.refresh()
+    # 压缩在读者读取 manifest 之后删除了旧段文件：已映射的段仍可读取
+    for name in os.listdir(tmp_path):
+        if name.startswith("seg-"):
+            os.remove(tmp_path / name)
+    hits = reader.search([_vector(1)], k=1)[0]
+    assert [(vector_id, payload) for vector_id, _, payload in hits] == [("b", {"n": 2})]
+
+
+def test_reader_follows_compaction(tmp_path):
+    writer = MmapVectorStore(str(tmp_path), dim=4)
+    reader = MmapVectorStore(str(tmp_path))
+    writer.add([str(i) for i in range(6)], [_vector(i) for i in range(6)])
+    assert len(reader) == 6
+    writer.delete(["0"])
+    assert len(reader) == 5
+    writer.compact(keep=lambda record: record["id"] != "1")
+    assert len(reader) == 4
+    assert {record["id"] for record in reader.records()} == {"2", "3", "4", "5"}
+
+
+def test_unchanged_manifest_is_not_reread(tmp_path, monkeypatch):
+    store = MmapVectorStore(str(tmp_path), dim=4)
+    store.add(["a"], [_vector(0)])
+    reads = []
+    read_manifest = store._read_manifest
+    monkeypatch.setattr(store, "_read_manifest", lambda: reads.append(1) or read_manifest())
+    for _ in range(3):
+        assert len(store) == 1
+        store.search([_vector(0)], k=1)
+    assert reads == []
+
+
+def test_missing_dimension_for_new_store(tmp_path):
+    with pytest.raises(ValueError):
+        MmapVectorStore(str(tmp_path))
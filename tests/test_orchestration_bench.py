@@ -0,0 +1,54 @@
+"""
+编排开销基准的冒烟测试：用最小参数完整运行一次，保存基线后再与基线比较
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("litellm")
+
+from benchmarks import orchestration_bench  # noqa: E402
+from benchmarks.fake_llm import FakeCompletion  # noqa: E402
+
+TINY = ["--latency", "0", "--iterations", "1", "--repeats", "1", "--memory-runs", "1",
+        "--concurrency", "1", "--runs-per-worker", "1"]
+
+
+def test_compare_respects_tolerance_and_noise_floor():
+    metric = orchestration_bench.metric
+    baseline = {"metrics": {"a_ms": metric(100.0, "ms"), "b_ms": metric(0.2, "ms"),
+                            "rate": metric(10.0, "workflows/s", "higher")}}
+    current = {"metrics": {"a_ms": metric(130.0, "ms"), "b_ms": metric(0.9, "ms"),
+                           "rate": metric(8.0, "workflows/s", "higher"), "new_ms": metric(1.0, "ms")}}
+    rows = {row["metric"]: row for row in orchestration_bench.compare(current, baseline, 0.15)}
+    assert rows["a_ms"]["regressed"] and rows["rate"]["regressed"]
+    assert not rows["b_ms"]["regressed"]  # 低于噪声下限
+    assert "new_ms" not in rows
+
+
+def test_fake_completion_answers_tool_calls():
+    tool = {"type": "function", "function": {"name": "TaskEvaluation", "parameters": {
+        "type": "object", "properties": {"suggestions": {"type": "array"}, "quality": {"type": "number"}}}}}
+    response = FakeCompletion()(model="m", messages=[{"role": "user", "content": "评估"}], tools=[tool])
+    call = response.choices[0].message.tool_calls[0]
+    assert call.function.name == "TaskEvaluation"
+    assert json.loads(call.function.arguments) == {"suggestions": [], "quality": 0}
+
+
+def test_default_config_runs_and_compares_with_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert orchestration_bench.main(TINY + ["--output", str(tmp_path / "first.json"),
+                                            "--save-baseline", str(baseline)]) == 0
+    saved = json.loads(baseline.read_text(encoding="utf-8"))
+    assert saved["metrics"]["phase.initiation.llm_calls"]["value"] > 0
+    assert saved["metrics"]["throughput.c1.workflows_per_s"]["value"] > 0
+
+    second = ["--output", str(tmp_path / "second.json"), "--baseline", str(baseline), "--tolerance", "100"]
+    assert orchestration_bench.main(TINY + second) == 0
+
+    # 调用数大幅增加时判定为回归
+    saved["metrics"]["phase.initiation.llm_calls"]["value"] = 0.01
+    baseline.write_text(json.dumps(saved), encoding="utf-8")
+    assert orchestration_bench.main(TINY + second) == 1
@@ -0,0 +1,51 @@
+"""
+增量回归测试的基线合并测试
+"""
+
+from workflows.regression import GENERAL_COMPONENT, IncrementalRegression, RegressionBaseline, diff_components
+
+
+def _regression(results, specs):
+    baseline = RegressionBaseline()
+    baseline.results, baseline.specs = dict(results), dict(specs)
+    return IncrementalRegression(None, baseline)
+
+
+def test_merge_replaces_mapped_components():
+    regression = _regression({"登录": "旧结果", "支付": "支付结果"}, {"登录": "v1", "支付": "v1"})
+    current = {"登录": "v2"}
+    regression._merge("## 登录\n全部通过", diff_components(regression.baseline.specs, current), current)
+    assert regression.baseline.results == {"登录": "全部通过", "支付": "支付结果"}
+    assert regression.baseline.specs["登录"] == "v2"
+
+
+def test_unsectioned_report_is_stored_once():
+    regression = _regression({"登录": "旧登录", "支付": "旧支付"}, {"登录": "v1", "支付": "v1"})
+    current = {"登录": "v2", "支付": "v2", "订单": "v1"}
+    report = "所有用例执行完毕，2个失败"
+    regression._merge(report, diff_components(regression.baseline.specs, current), current)
+    results = regression.baseline.results
+    assert results == {"登录": "旧登录", "支付": "旧支付", GENERAL_COMPONENT: report}
+    # 没有得到结果的组件不更新规格，下一轮仍会重新测试
+    assert regression.baseline.specs == {"登录": "v1", "支付": "v1"}
+
+
+def test_extra_sections_go_to_general_component():
+    regression = _regression({"登录": "旧登录"}, {"登录": "v1"})
+    current = {"登录": "v2"}
+    report = "## 登录\n通过\n\n## 总结\n无阻塞问题"
+    regression._merge(report, diff_components(regression.baseline.specs, current), current)
+    assert regression.baseline.results["登录"] == "通过"
+    assert "无阻塞问题" in regression.baseline.results[GENERAL_COMPONENT]
+
+
+def test_general_content_survives_later_rounds():
+    regression = _regression({"登录": "旧登录", GENERAL_COMPONENT: "测试环境：staging"}, {"登录": "v1"})
+    for round_no, spec in enumerate(("v2", "v3"), start=1):
+        current = {"登录": spec}
+        report = f"## 登录\n第{round_no}轮通过\n\n## 总结\n第{round_no}轮无阻塞问题"
+        regression._merge(report, diff_components(regression.baseline.specs, current), current)
+    general = regression.baseline.results[GENERAL_COMPONENT]
+    assert general.startswith("测试环境：staging\n\n")
+    assert "第1轮无阻塞问题" in general and "第2轮无阻塞问题" in general
+    assert regression.baseline.results["登录"] == "第2轮通过"
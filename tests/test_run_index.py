@@ -0,0 +1,23 @@
+"""
+历史运行检索索引测试
+"""
+
+from storage.artifact_store import ArtifactStore
+from storage.run_index import RunIndex
+from utils.text import estimate_tokens
+
+
+def test_import_reads_phase_stats_from_manifests(tmp_path):
+    store = ArtifactStore(root=str(tmp_path / "artifacts"), max_bytes=0)
+    store.save_phase("run-new", "design", "使用 PostgreSQL 和 Kubernetes", {"project": "shop"},
+                     stats={"tokens": 120, "seconds": 3.5})
+    # 早期清单没有记录阶段的 tokens / seconds
+    store.save_phase("run-old", "design", "使用 MySQL 部署在虚拟机上", {"project": "blog"})
+    index = RunIndex(path=str(tmp_path / "runs.db"))
+    assert index.import_artifact_store(store) == 2
+    new = index.phases("run-new")[0]
+    assert (new["tokens"], new["seconds"]) == (120, 3.5)
+    old = index.phases("run-old")[0]
+    assert (old["tokens"], old["seconds"]) == (estimate_tokens("使用 MySQL 部署在虚拟机上"), 0.0)
+    assert [run["run_id"] for run in index.search("Kubernetes")] == ["run-new"]
+    assert index.import_artifact_store(store) == 0
@@ -0,0 +1,47 @@
+"""
+章节完成监控测试
+"""
+
+from utils.section_monitor import SectionCompletionMonitor
+
+EXPECTED = "1. 测试策略\n2. 测试范围\n3. 风险评估"
+
+
+def feed_all(monitor, text, chunk_size=7):
+    for offset in range(0, len(text), chunk_size):
+        if monitor.feed(text[offset:offset + chunk_size]):
+            break
+    return monitor
+
+
+def test_long_last_section_is_not_cut():
+    last = "风险评估需要覆盖并发、数据迁移和第三方依赖。\n" * 80
+    text = "## 1. 测试策略\n简短。\n## 2. 测试范围\n简短。\n## 3. 风险评估\n" + last
+    monitor = feed_all(SectionCompletionMonitor(EXPECTED), text)
+    assert not monitor.should_stop
+    assert monitor.text == text
+
+
+def test_stops_on_following_heading():
+    text = "## 1. 测试策略\n内容\n## 2. 测试范围\n内容\n## 3. 风险评估\n内容\n### 3.1 细节\n细节\n## 4. 总结\n多余的总结\n"
+    monitor = feed_all(SectionCompletionMonitor(EXPECTED), text)
+    report = monitor.report()
+    assert report["stopped_early"] and "总结" in report["stop_reason"]
+    assert monitor.text.endswith("细节\n")
+    assert report["tokens_discarded"] > 0
+    assert "tokens_saved" not in report
+
+
+def test_stops_on_closing_marker():
+    text = "## 1. 测试策略\n内容\n---\n## 2. 测试范围\n内容\n## 3. 风险评估\n内容\n---\n附录\n"
+    monitor = feed_all(SectionCompletionMonitor(EXPECTED), text)
+    assert monitor.stopped_early
+    assert monitor.text.endswith("## 3. 风险评估\n内容\n")
+
+
+def test_hard_cap_is_not_reported_as_early_stop():
+    text = "## 1. 测试策略\n" + "内容内容内容内容\n" * 20
+    monitor = feed_all(SectionCompletionMonitor(EXPECTED, max_tokens=30), text)
+    assert monitor.should_stop and monitor.capped
+    assert not monitor.report()["stopped_early"]
+    assert monitor.tokens_generated >= 30
@@ -0,0 +1,24 @@
+"""
+推测执行评审测试
+"""
+
+import pytest
+
+from workflows.speculative import review_requires_changes
+
+
+@pytest.mark.parametrize("review_output, expected", [
+    ("评审结论：需要重大修改\n接口定义缺失", True),
+    ("评审结论：不通过", True),
+    ("评审结论：通过", False),
+    ("评审结论：通过，无需重大修改", False),
+    ("不需要重大修改，通过", False),
+    ("整体结构合理，没有重大修改意见", False),
+    ("## 评审结论\n需要重新设计数据模型", True),
+    ("评审结论：通过\n\n附注：后续版本可能需要重大修改", False),
+    ("需求不清晰，需要重大修改", True),
+    ("需求描述完整", False),
+    ("", False),
+])
+def test_review_requires_changes(review_output, expected):
+    assert review_requires_changes(review_output) is expected
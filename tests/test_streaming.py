@@ -0,0 +1,26 @@
+"""
+流式调用适配测试
+"""
+
+from types import SimpleNamespace
+
+from utils.streaming import stream_completion
+
+
+class CallOnlyLLM:
+    """与 crewai.LLM 相同：stream 是开关属性，不可调用，只能通过 call 调用"""
+
+    stream = False
+
+    def call(self, prompt):
+        return f"回答：{prompt}"
+
+
+def test_llm_with_call_method():
+    assert list(stream_completion(CallOnlyLLM(), "你好")) == ["回答：你好"]
+
+
+def test_streaming_llm_and_plain_callable():
+    streaming = SimpleNamespace(stream=lambda prompt: iter(["片段1", SimpleNamespace(content="片段2"), ""]))
+    assert list(stream_completion(streaming, "p")) == ["片段1", "片段2"]
+    assert list(stream_completion(lambda prompt: prompt.upper(), "abc")) == ["ABC"]
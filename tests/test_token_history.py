@@ -0,0 +1,77 @@
+"""
+输出长度历史测试
+"""
+
+import multiprocessing
+
+import pytest
+
+from utils.token_history import TokenHistory
+
+
+def _write_samples(path: str, worker: int, count: int) -> None:
+    history = TokenHistory(path=path, window=1000, compact_every=7)
+    for index in range(count):
+        history.record("design", f"model-{worker % 2}", worker * 1000 + index)
+
+
+def test_history_persists_and_compacts(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    history = TokenHistory(path=path, window=3, compact_every=4)
+    for tokens in (100, 200, 300, 400, 500):
+        history.record("design", "m", tokens)
+    assert history.samples("design", "m") == [300, 400, 500]
+    with open(path, encoding='utf-8') as f:
+        # 第4条样本后压缩为快照，之后又追加了1行
+        assert len(f.read().splitlines()) == 2
+    assert TokenHistory(path=path, window=3).samples("design", "m") == [300, 400, 500]
+
+
+def test_concurrent_writers_keep_every_sample(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    workers = [multiprocessing.Process(target=_write_samples, args=(path, worker, 25)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    history = TokenHistory(path=path, window=1000)
+    assert len(history.samples("design", "model-0")) == 50
+    assert len(history.samples("design", "model-1")) == 50
+    assert not [name for name in tmp_path.iterdir() if name.suffix == ".tmp"]
+
+
+def test_reader_sees_samples_from_other_instances(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    reader = TokenHistory(path=path)
+    TokenHistory(path=path).record("plan", "m", 42)
+    assert reader.samples("plan", "m") == [42]
+
+
+def test_in_memory_history():
+    history = TokenHistory(path="", window=2)
+    for tokens in (1, 2, 3):
+        history.record("plan", "m", tokens)
+    assert history.samples("plan", "m") == [2, 3]
+
+
+def test_crew_agent_cap_is_never_lowered(tmp_path):
+    pytest.importorskip("crewai")
+    from types import SimpleNamespace
+    from workflows.software_development_workflow import SoftwareDevelopmentWorkflow
+
+    history = TokenHistory(path=str(tmp_path / "history.jsonl"))
+    for _ in range(10):
+        history.record("design/架构师", "m", 100)
+    workflow = SimpleNamespace(token_history=history)
+    capped = SimpleNamespace(model="m", max_tokens=4000, call=lambda prompt: "完成")
+    SoftwareDevelopmentWorkflow._adapt_max_tokens(workflow, capped, "design/架构师")
+    assert capped.max_tokens == 4000
+    unlimited = SimpleNamespace(model="m", max_tokens=None, call=lambda prompt: "完成")
+    SoftwareDevelopmentWorkflow._adapt_max_tokens(workflow, unlimited, "design/架构师")
+    assert unlimited.max_tokens is None
+    small = SimpleNamespace(model="m", max_tokens=50, call=lambda prompt: "完成")
+    SoftwareDevelopmentWorkflow._adapt_max_tokens(workflow, small, "design/架构师")
+    assert small.max_tokens > 50
+    assert small.call("提示") == "完成"
+    assert len(history.samples("design/架构师", "m")) == 11
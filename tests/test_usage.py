@@ -0,0 +1,59 @@
+"""
+用量核算与预算测试
+"""
+
+import pytest
+
+from config import Config
+from observability.usage import BudgetExceededError, UsageTracker
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setitem(Config.BUDGET_CONFIG, "max_tokens_per_run", 100)
+    monkeypatch.setitem(Config.BUDGET_CONFIG, "max_cost_per_run", None)
+    monkeypatch.setitem(Config.BUDGET_CONFIG, "action", "downgrade")
+    monkeypatch.setitem(Config.BUDGET_CONFIG, "downgrade_model", "cheap-model")
+    return Config.BUDGET_CONFIG
+
+
+def test_record_attributes_agent_and_task():
+    tracker = UsageTracker()
+    with tracker.scope(run="r1", project="p", phase="design"):
+        tracker.record("m", 10, 20, agent="架构师", task="设计系统", calls=2)
+        tracker.record("m", 5, 5)
+    summary = tracker.run_summary("r1", project="p")
+    assert summary["total"]["calls"] == 3
+    assert summary["total"]["total_tokens"] == 40
+    assert summary["phases"]["design"]["total_tokens"] == 40
+    assert summary["agents"] == {"架构师": tracker.totals("agent")["r1/架构师"]}
+    assert summary["agents"]["架构师"]["total_tokens"] == 30
+    assert tracker.totals("task")["r1/design/设计系统"]["calls"] == 2
+
+
+def test_check_budget_does_not_report_downgrade(budget):
+    tracker = UsageTracker()
+    with tracker.scope(run="r1"):
+        tracker.record("m", 80, 40)
+    assert tracker.check_budget("r1") == "cheap-model"
+    assert tracker.run_summary("r1")["downgraded_to"] is None
+    tracker.mark_downgraded("cheap-model", run="r1")
+    assert tracker.run_summary("r1")["downgraded_to"] == "cheap-model"
+
+
+def test_resolve_model_marks_downgrade(budget):
+    tracker = UsageTracker()
+    assert tracker.resolve_model("m", run="r1") == "m"
+    with tracker.scope(run="r1"):
+        tracker.record("m", 80, 40)
+        assert tracker.resolve_model("m") == "cheap-model"
+    assert tracker.run_summary("r1")["downgraded_to"] == "cheap-model"
+
+
+def test_abort_raises(budget):
+    budget["action"] = "abort"
+    tracker = UsageTracker()
+    with tracker.scope(run="r1"):
+        tracker.record("m", 80, 40)
+    with pytest.raises(BudgetExceededError):
+        tracker.check_budget("r1")
@@ -0,0 +1,19 @@
+from .text import estimate_tokens, normalize_text, similarity
+from .sections import (
+    parse_expected_sections,
+    split_sections,
+    map_sections,
+    extract_items,
+    render_sections
+)
+
+__all__ = [
+    'estimate_tokens',
+    'normalize_text',
+    'similarity',
+    'parse_expected_sections',
+    'split_sections',
+    'map_sections',
+    'extract_items',
+    'render_sections'
+]
@@ -0,0 +1,70 @@
+"""
+哈希n-gram向量
+
+把文本的字符二元组和三元组通过哈希映射到固定维度，得到L2归一化的稠密向量，
+无需训练模型即可计算中英文混合文本的相似度。安装了 numpy 时批量计算使用 numpy，
+否则使用标准库 array 实现
+"""
+
+import math
+import zlib
+from array import array
+from operator import mul
+from typing import List, Sequence
+
+from .text import char_ngrams
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+class HashedNgramEmbedder:
+    """
+    哈希n-gram向量生成器
+    """
+
+    def __init__(self, dim: int = 256, ngram_sizes: Sequence[int] = (2, 3)):
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    def embed(self, text: str) -> array:
+        """
+        生成文本的归一化向量（float32）
+        """
+        vector = [0.0] * self.dim
+        for n in self.ngram_sizes:
+            for gram in char_ngrams(text, n):
+                # 使用稳定的哈希；最高位决定符号，减少哈希冲突带来的偏差
+                digest = zlib.crc32(gram.encode('utf-8'))
+                vector[digest % self.dim] += -1.0 if digest & 0x80000000 else 1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm:
+            vector = [value / norm for value in vector]
+        return array('f', vector)
+
+
+def vector_to_bytes(vector: array) -> bytes:
+    return vector.tobytes()
+
+
+def vector_from_bytes(data: bytes) -> array:
+    vector = array('f')
+    vector.frombytes(data)
+    return vector
+
+
+def cosine_scores(query: array, vectors: List[array]) -> List[float]:
+    """
+    计算查询向量与一组归一化向量的余弦相似度
+    """
+    if not vectors:
+        return []
+    if NUMPY_AVAILABLE:
+        matrix = np.frombuffer(b''.join(vector.tobytes() for vector in vectors), dtype=np.float32)
+        matrix = matrix.reshape(len(vectors), len(query))
+        return (matrix @ np.frombuffer(query.tobytes(), dtype=np.float32)).tolist()
+    return [sum(map(mul, query, vector)) for vector in vectors]
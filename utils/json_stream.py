@@ -0,0 +1,143 @@
+"""
+增量JSON解析
+
+结构化输出模式要求模型输出一个顶层JSON对象，每个键对应文档的一个章节。
+IncrementalJSONParser 在token陆续到达时逐字符扫描，每当某个顶层键的值闭合就立即解析并产出，
+下游无需等待整份文档生成完毕；单个章节格式错误也不会影响其他章节
+"""
+
+import json
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+class SectionParseError:
+    """
+    章节值无法解析为JSON时产出的占位对象
+    """
+
+    def __init__(self, raw: str, message: str):
+        self.raw = raw
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f"SectionParseError({self.message!r})"
+
+
+class IncrementalJSONParser:
+    """
+    顶层JSON对象的增量解析器
+
+    忽略第一个 "{" 之前的内容（如Markdown代码块标记），
+    通过 feed() 输入文本片段，产出 (键, 值) 二元组；值无法解析时为 SectionParseError
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # 当前顶层成员的状态：key -> colon -> value
+        self._stage = 'key'
+        self._token: List[str] = []
+        self._key: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        """
+        顶层对象是否已经闭合
+        """
+        return self._finished
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, Any]]:
+        for char in chunk:
+            if self._finished:
+                return
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+            result = self._consume(char)
+            if result is not None:
+                yield result
+
+    def close(self) -> Iterator[Tuple[str, Any]]:
+        """
+        输入结束时调用：未闭合的当前章节作为解析失败产出
+        """
+        if self._finished or self._key is None:
+            return
+        raw = ''.join(self._token)
+        key = self._key
+        self._key = None
+        self._finished = True
+        yield key, SectionParseError(raw, "输出在该章节结束前中断")
+
+    def _consume(self, char: str) -> Optional[Tuple[str, Any]]:
+        if self._in_string:
+            self._token.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._stage == 'key' and self._depth == 1:
+                    self._key = self._loads(''.join(self._token), str)
+                    self._token = []
+                    self._stage = 'colon'
+            return None
+
+        if self._stage == 'key':
+            if char == '"':
+                self._in_string = True
+                self._token = [char]
+            elif char == '}':
+                self._finished = True
+            return None
+
+        if self._stage == 'colon':
+            if char == ':':
+                self._stage = 'value'
+                self._token = []
+            return None
+
+        # 值阶段
+        if char == '"':
+            self._in_string = True
+            self._token.append(char)
+            return None
+        if char in '{[':
+            self._depth += 1
+        elif char in '}]':
+            if self._depth == 1:
+                # 顶层对象闭合，最后一个值随之结束
+                self._finished = True
+                return self._complete_value()
+            self._depth -= 1
+        elif char == ',' and self._depth == 1:
+            return self._complete_value()
+        self._token.append(char)
+        return None
+
+    def _complete_value(self) -> Optional[Tuple[str, Any]]:
+        raw = ''.join(self._token).strip()
+        key = self._key
+        self._token = []
+        self._key = None
+        self._stage = 'key'
+        if key is None or not raw:
+            return None
+        try:
+            return key, json.loads(raw)
+        except json.JSONDecodeError as e:
+            return key, SectionParseError(raw, str(e))
+
+    @staticmethod
+    def _loads(raw: str, expected_type: type) -> Any:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return raw.strip('"')
+        return value if isinstance(value, expected_type) else str(value)
@@ -0,0 +1,185 @@
+"""
+章节质量评分
+
+对照任务 expected_output 的章节清单，为输出文档的每个章节给出0~1的本地评分，
+用于决定哪些章节需要重新生成；并在LLM评审之前做整份文档的本地预检。
+评分只依赖文本特征，不调用LLM
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from .sections import extract_items, map_sections, parse_expected_sections
+from .text import char_ngrams, count_cjk_chars, estimate_tokens, normalize_text
+
+# 评分权重：篇幅是否充分、内容是否切题、是否有条理
+LENGTH_WEIGHT = 0.5
+RELEVANCE_WEIGHT = 0.3
+STRUCTURE_WEIGHT = 0.2
+
+# 表示内容未完成的占位文字
+_PLACEHOLDER_PATTERN = re.compile(r'(待补充|待完善|TODO|TBD|略|同上|\.\.\.|……)\s*$', re.IGNORECASE)
+
+
+def score_section(title: str, body: Optional[str], min_tokens: int = 80) -> float:
+    """
+    为单个章节评分
+
+    缺失或只有占位文字的章节得0分；其余按篇幅、与标题的相关度和结构化程度加权
+    """
+    if not body or not body.strip() or _PLACEHOLDER_PATTERN.fullmatch(body.strip()):
+        return 0.0
+
+    length_score = min(1.0, estimate_tokens(body) / min_tokens)
+
+    title_grams = set(char_ngrams(title))
+    body_grams = set(char_ngrams(body))
+    relevance_score = len(title_grams & body_grams) / len(title_grams) if title_grams else 1.0
+    # 标题中的字词不必全部出现在正文中，覆盖一半即视为切题
+    relevance_score = min(1.0, relevance_score * 2)
+
+    items = extract_items(body)
+    has_table = '|' in body and '---' in body
+    structure_score = 1.0 if len(items) >= 3 or has_table or '```' in body else len(items) / 3
+
+    return round(
+        LENGTH_WEIGHT * length_score + RELEVANCE_WEIGHT * relevance_score + STRUCTURE_WEIGHT * structure_score,
+        3
+    )
+
+
+def score_sections(document: str, required_titles: List[str], min_tokens: int = 80) -> Dict[str, float]:
+    """
+    为文档中的每个必需章节评分，返回 章节标题 -> 分数
+    """
+    mapped, _ = map_sections(document, required_titles)
+    return {title: score_section(title, body, min_tokens) for title, body in mapped.items()}
+
+
+_CODE_BLOCK_PATTERN = re.compile(r'```.*?```', re.DOTALL)
+_LETTER_PATTERN = re.compile(r'[A-Za-z]')
+
+
+def language_ratio(text: str) -> float:
+    """
+    中文字符在文字（中文字符与拉丁字母）中的占比，代码块不计入
+    """
+    text = _CODE_BLOCK_PATTERN.sub('', text or '')
+    cjk = count_cjk_chars(text)
+    letters = len(_LETTER_PATTERN.findall(text))
+    # 拉丁字母按约4个字母一个词折算，与中文字符的信息量大致相当
+    total = cjk + letters / 4
+    return cjk / total if total else 0.0
+
+
+def duplicate_ratio(text: str, min_length: int = 10) -> float:
+    """
+    重复内容占比：规范化后重复出现的段落（行）在所有有效段落中的比例
+    """
+    lines = [normalize_text(line) for line in (text or '').splitlines()]
+    lines = [line for line in lines if len(line) >= min_length]
+    if not lines:
+        return 0.0
+    return 1 - len(set(lines)) / len(lines)
+
+
+class LocalQualityScorer:
+    """
+    本地质量预检
+
+    在调用LLM评审之前用确定性的文本检查（章节覆盖、篇幅、语言、重复内容）快速判定输出，
+    明显不完整的输出直接打回，不再花费评审调用。结论写入JSONL日志，用于与LLM评审结论对照校准
+    """
+
+    def __init__(self, language: Optional[str] = None, log_path: Optional[str] = None, **thresholds):
+        gate_config = dict(Config.QUALITY_GATE_CONFIG)
+        gate_config.update(thresholds)
+        self.language = language or Config.PROJECT_CONFIG["default_language"]
+        self.log_path = log_path if log_path is not None else gate_config["log_path"]
+        self.config = gate_config
+        self._lock = threading.Lock()
+
+    def score(self, document: str, expected_output: str = "") -> Dict[str, Any]:
+        """
+        预检文档
+
+        返回字典包含 verdict（reject：直接打回；review：交给LLM评审）、综合分 score、
+        各项检查结果 checks、未通过的检查 failures，以及缺失或为空的章节 missing_sections
+        """
+        config = self.config
+        document = document or ''
+        failures: List[str] = []
+
+        titles = parse_expected_sections(expected_output) if expected_output else []
+        missing = []
+        if titles:
+            mapped, _ = map_sections(document, titles)
+            missing = [title for title, body in mapped.items() if score_section(title, body) == 0.0]
+            coverage = 1 - len(missing) / len(titles)
+        else:
+            coverage = 1.0
+        if coverage < config["min_coverage"]:
+            failures.append(f"章节覆盖率 {coverage:.0%} 低于 {config['min_coverage']:.0%}")
+
+        tokens = estimate_tokens(document)
+        if tokens < config["min_tokens"]:
+            failures.append(f"篇幅过短（约 {tokens} tokens）")
+        elif tokens > config["max_tokens"]:
+            failures.append(f"篇幅过长（约 {tokens} tokens）")
+        length_ok = config["min_tokens"] <= tokens <= config["max_tokens"]
+
+        ratio = language_ratio(document)
+        if self.language.lower().startswith('zh'):
+            language_ok = ratio >= config["min_language_ratio"]
+        else:
+            language_ok = ratio < config["min_language_ratio"]
+        if not language_ok:
+            failures.append(f"输出语言与 {self.language} 不符（中文占比 {ratio:.0%}）")
+
+        duplicates = duplicate_ratio(document)
+        if duplicates > config["max_duplicate_ratio"]:
+            failures.append(f"重复内容占比 {duplicates:.0%}")
+
+        score = round(
+            0.4 * coverage + 0.2 * length_ok + 0.2 * language_ok + 0.2 * (1 - duplicates),
+            3
+        )
+        return {
+            "verdict": "reject" if failures else "review",
+            "score": score,
+            "checks": {
+                "coverage": round(coverage, 3),
+                "tokens": tokens,
+                "language_ratio": round(ratio, 3),
+                "duplicate_ratio": round(duplicates, 3)
+            },
+            "failures": failures,
+            "missing_sections": missing
+        }
+
+    def log(self, name: str, result: Dict[str, Any], review_verdict: Optional[str] = None) -> None:
+        """
+        追加一条预检记录，review_verdict 为LLM评审结论（未执行评审时为空）
+        """
+        if not self.log_path:
+            return
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "name": name,
+            "verdict": result["verdict"],
+            "score": result["score"],
+            "checks": result["checks"],
+            "failures": result["failures"],
+            "review_verdict": review_verdict
+        }
+        with self._lock:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
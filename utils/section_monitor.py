@@ -0,0 +1,170 @@
+"""
+章节完成监控与提前终止
+
+很多任务的输出在写完 expected_output 列出的全部章节后还会继续生成总结、附录等额外内容，
+浪费输出token并增加延迟。SectionCompletionMonitor 在流式输出过程中跟踪已出现的必需章节，
+当全部必需章节都已出现且最后一个章节已经结束（出现后续标题或结束标记）时通知调用方停止生成
+"""
+
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from .sections import match_title, parse_expected_sections, parse_heading
+from .streaming import stream_completion
+from .text import estimate_tokens
+
+
+class SectionCompletionMonitor:
+    """
+    流式输出的章节完成监控器
+
+    全部必需章节都已出现后，最后一个必需章节在以下情况视为结束：
+    1. 出现了不属于必需章节的同级或更高级标题（如 "8. 总结"）
+    2. 出现了单独成行的结束标记（见 Config.EARLY_STOP_CONFIG["closing_markers"]，如 "---"）
+    此外有效输出达到 max_tokens 时无论章节是否完成都停止（硬上限）
+    """
+
+    def __init__(self, expected_output: str, max_tokens: Optional[int] = None,
+                 closing_markers: Optional[List[str]] = None):
+        early_stop_config = Config.EARLY_STOP_CONFIG
+        self.required = parse_expected_sections(expected_output)
+        self.max_tokens = max_tokens
+        markers = early_stop_config["closing_markers"] if closing_markers is None else closing_markers
+        self.closing_markers = {marker.strip() for marker in markers}
+
+        self.seen: List[str] = []
+        self.section_tokens: Dict[str, int] = {}
+        self.stop_reason: Optional[str] = None
+        self.capped = False
+        self.tokens_generated = 0
+        self._kept: List[str] = []
+        self._pending = ''
+        self._discarded = ''
+        self._current: Optional[str] = None
+        self._last_heading_level: Optional[int] = None
+        self._last_heading_number: Optional[int] = None
+        self._markdown = False
+
+    @property
+    def complete(self) -> bool:
+        """
+        是否所有必需章节都已出现
+        """
+        return bool(self.required) and len(self.seen) == len(self.required)
+
+    @property
+    def should_stop(self) -> bool:
+        return self.stop_reason is not None
+
+    @property
+    def stopped_early(self) -> bool:
+        """
+        是否因全部必需章节完成而提前终止（达到 max_tokens 硬上限不算）
+        """
+        return self.should_stop and not self.capped
+
+    @property
+    def text(self) -> str:
+        """
+        截至停止点的有效输出（不含触发停止的额外内容）
+        """
+        return ''.join(self._kept) + ('' if self.should_stop else self._pending)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        输入一个流式片段，返回是否应当停止生成
+        """
+        if self.should_stop:
+            self._discarded += chunk
+            return True
+        self._pending += chunk
+        while '\n' in self._pending and not self.should_stop:
+            line, self._pending = self._pending.split('\n', 1)
+            self._consume_line(line + '\n')
+        if self.should_stop:
+            self._discarded += self._pending
+            self._pending = ''
+        return self.should_stop
+
+    def _consume_line(self, line: str) -> None:
+        heading = parse_heading(line.rstrip('\n'))
+        starts_section = False
+        if heading is not None:
+            level, number, title = heading
+            if level > 0:
+                self._markdown = True
+            if not (self._markdown and level == 0):
+                target = match_title(title, self.required)
+                if target is not None and target not in self.seen:
+                    self.seen.append(target)
+                    self._current = target
+                    self._last_heading_level = level
+                    self._last_heading_number = number
+                    starts_section = True
+                elif self.complete and self._closes_last_section(level, number):
+                    self._stop(f"全部必需章节已完成，出现额外章节: {title}", line)
+                    return
+        elif self.complete and line.strip() in self.closing_markers:
+            self._stop(f"全部必需章节已完成，出现结束标记: {line.strip()}", line)
+            return
+
+        self._kept.append(line)
+        tokens = estimate_tokens(line)
+        self.tokens_generated += tokens
+        if not starts_section and self._current is not None:
+            self.section_tokens[self._current] = self.section_tokens.get(self._current, 0) + tokens
+        if self.max_tokens and self.tokens_generated >= self.max_tokens:
+            self.capped = True
+            self.stop_reason = f"达到max_tokens上限 {self.max_tokens}"
+
+    def _stop(self, reason: str, line: str) -> None:
+        self.stop_reason = reason
+        self._discarded += line
+
+    def _closes_last_section(self, level: int, number: Optional[int]) -> bool:
+        if self._markdown:
+            # 更深层级的标题属于最后一个章节的子标题
+            return self._last_heading_level is not None and level <= self._last_heading_level
+        # 顶格编号行：编号大于最后一个必需章节时才视为新章节，避免把章节内的编号列表误判为标题
+        return number is not None and self._last_heading_number is not None and number > self._last_heading_number
+
+    def report(self) -> Dict[str, Any]:
+        """
+        生成监控报告
+
+        tokens_discarded 只统计停止时已经收到、但不计入输出的额外内容；
+        停止后模型原本还会生成多少token无法得知，因此不做估算
+        """
+        return {
+            "required_sections": self.required,
+            "completed_sections": list(self.seen),
+            "missing_sections": [title for title in self.required if title not in self.seen],
+            "stopped_early": self.stopped_early,
+            "stop_reason": self.stop_reason,
+            "tokens_generated": estimate_tokens(self.text),
+            "tokens_discarded": estimate_tokens(self._discarded)
+        }
+
+
+def generate_with_early_stop(llm, prompt: str, expected_output: str, max_tokens: Optional[int] = None,
+                             task_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    流式生成并在必需章节全部完成后提前终止
+
+    返回监控报告，并在 output 字段中给出截至停止点的输出
+    """
+    if max_tokens is None:
+        max_tokens = llm.resolve_max_tokens(task_key) if hasattr(llm, 'resolve_max_tokens') \
+            else getattr(llm, 'max_tokens', None) or Config.MAX_TOKENS
+    monitor = SectionCompletionMonitor(expected_output, max_tokens=max_tokens)
+    stream = stream_completion(llm, prompt, task_key=task_key)
+    try:
+        for chunk in stream:
+            if monitor.feed(chunk):
+                break
+    finally:
+        # 关闭生成器以中断底层的流式连接
+        stream.close()
+    report = monitor.report()
+    report["output"] = monitor.text
+    return report
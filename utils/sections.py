@@ -0,0 +1,154 @@
+"""
+文档章节解析工具
+
+任务的 expected_output 以编号列表的形式列出输出文档应包含的章节，
+本模块负责从 expected_output 中提取章节清单，并把模型输出的Markdown文档
+按章节拆分、与清单对应起来，供合并、校验和局部重新生成使用
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .text import normalize_text, similarity, strip_list_marker
+
+# expected_output 中的编号章节行，例如 "1. 测试策略和方法"
+_EXPECTED_ITEM_PATTERN = re.compile(r'^\s*\d+[.、]\s*(.+?)\s*$')
+# Markdown标题，例如 "## 1. 测试策略和方法"
+_HEADING_PATTERN = re.compile(r'^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$')
+# 顶格的编号标题或加粗标题，例如 "1. 测试策略" 或 "**1. 测试策略**"
+_NUMBERED_HEADING_PATTERN = re.compile(r'^(?:\*\*)?\d+[.、]\s*(.+?)(?:\*\*)?\s*[:：]?\s*$')
+# 列表项
+_LIST_ITEM_PATTERN = re.compile(r'^\s*(?:[-*+•]|\d+[.、)）]|[（(]\d+[)）])\s+')
+
+# 章节标题与清单条目的最低匹配相似度
+TITLE_MATCH_THRESHOLD = 0.5
+
+
+def parse_expected_sections(expected_output: str) -> List[str]:
+    """
+    从任务的 expected_output 中提取必需章节标题列表
+    """
+    titles = []
+    for line in (expected_output or '').splitlines():
+        match = _EXPECTED_ITEM_PATTERN.match(line)
+        if match:
+            titles.append(match.group(1))
+    return titles
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    按标题把文档拆分为 (标题, 正文) 列表
+
+    优先使用Markdown标题；文档中没有Markdown标题时退化为顶格编号行。
+    第一个标题之前的内容以空标题返回
+    """
+    lines = (text or '').splitlines()
+    use_markdown = any(_HEADING_PATTERN.match(line) for line in lines)
+
+    sections: List[Tuple[str, str]] = []
+    title = ''
+    body: List[str] = []
+    for line in lines:
+        heading = _match_heading(line, use_markdown)
+        if heading is not None:
+            if title or any(part.strip() for part in body):
+                sections.append((title, '\n'.join(body).strip()))
+            title, body = heading, []
+        else:
+            body.append(line)
+    if title or any(part.strip() for part in body):
+        sections.append((title, '\n'.join(body).strip()))
+    return sections
+
+
+def _match_heading(line: str, use_markdown: bool) -> Optional[str]:
+    if use_markdown:
+        match = _HEADING_PATTERN.match(line)
+        return strip_list_marker(match.group(2)).strip('*').strip() if match else None
+    match = _NUMBERED_HEADING_PATTERN.match(line)
+    if match and len(match.group(1)) <= 40:
+        return match.group(1).strip('*').strip()
+    return None
+
+
+def parse_heading(line: str) -> Optional[Tuple[int, Optional[int], str]]:
+    """
+    解析单行标题，返回 (级别, 编号, 标题)，不是标题时返回None
+
+    Markdown标题的级别为 "#" 的个数，顶格编号行的级别为0；标题不带编号时编号为None
+    """
+    match = _HEADING_PATTERN.match(line)
+    if match:
+        text = match.group(2).strip('*').strip()
+        number = re.match(r'^(\d+)[.、]', text)
+        return len(match.group(1)), int(number.group(1)) if number else None, strip_list_marker(text).strip('*').strip()
+    match = _NUMBERED_HEADING_PATTERN.match(line)
+    if match and len(match.group(1)) <= 40:
+        number = re.match(r'^(?:\*\*)?(\d+)', line)
+        return 0, int(number.group(1)), match.group(1).strip('*').strip()
+    return None
+
+
+def match_title(title: str, candidates: List[str]) -> Optional[str]:
+    """
+    在候选章节标题中找出与给定标题最匹配的一个，低于阈值时返回None
+    """
+    best, best_score = None, 0.0
+    for candidate in candidates:
+        score = similarity(title, candidate, overlap=True)
+        if score > best_score:
+            best, best_score = candidate, score
+    return best if best_score >= TITLE_MATCH_THRESHOLD else None
+
+
+def map_sections(text: str, required_titles: List[str]) -> Tuple[Dict[str, Optional[str]], List[Tuple[str, str]]]:
+    """
+    把文档章节对应到必需章节清单
+
+    返回 (必需章节 -> 正文，未找到时为None) 以及无法对应的其余章节列表
+    """
+    mapped: Dict[str, Optional[str]] = {title: None for title in required_titles}
+    extras: List[Tuple[str, str]] = []
+    for heading, body in split_sections(text):
+        target = match_title(heading, required_titles) if heading else None
+        if target is None:
+            extras.append((heading, body))
+        elif mapped[target] is None:
+            mapped[target] = body
+        else:
+            mapped[target] = f"{mapped[target]}\n\n{body}".strip()
+    return mapped, extras
+
+
+def extract_items(body: str) -> List[str]:
+    """
+    把章节正文拆分为条目：列表项各为一条（含其缩进的续行），其余段落各为一条
+    """
+    items: List[str] = []
+    current: List[str] = []
+    for line in (body or '').splitlines():
+        if not line.strip():
+            if current:
+                items.append('\n'.join(current).strip())
+                current = []
+        elif _LIST_ITEM_PATTERN.match(line) and not line.startswith((' ' * 4, '\t')):
+            if current:
+                items.append('\n'.join(current).strip())
+            current = [line.strip()]
+        else:
+            current.append(line.rstrip())
+    if current:
+        items.append('\n'.join(current).strip())
+    return [item for item in items if normalize_text(item)]
+
+
+def render_sections(sections: List[Tuple[str, str]], title: str = '', level: int = 2) -> str:
+    """
+    把 (标题, 正文) 列表渲染为编号的Markdown文档
+    """
+    parts = [f"# {title}"] if title else []
+    marker = '#' * level
+    for index, (heading, body) in enumerate(sections, 1):
+        parts.append(f"{marker} {index}. {heading}\n\n{body.strip()}")
+    return '\n\n'.join(parts) + '\n'
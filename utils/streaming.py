@@ -0,0 +1,42 @@
+"""
+流式输出工具
+
+统一不同LLM对象的流式接口：LiteLLMWrapper.stream 直接产出文本片段，
+LangChain聊天模型的 stream 产出带 content 属性的消息片段；
+不支持流式的LLM退化为一次性调用并整体产出（crewai.LLM 的 stream 是开关属性，使用 call）
+"""
+
+from typing import Any, Iterator, Optional
+
+
+def _chunk_text(chunk: Any) -> str:
+    if isinstance(chunk, str):
+        return chunk
+    content = getattr(chunk, 'content', None)
+    if content is not None:
+        return content if isinstance(content, str) else ''.join(str(part) for part in content)
+    return str(chunk)
+
+
+def stream_completion(llm, prompt: str, task_key: Optional[str] = None) -> Iterator[str]:
+    """
+    以流式方式调用LLM，逐个产出文本片段
+    task_key 标识发起调用的任务工厂，支持自适应max_tokens的LLM（LiteLLMWrapper）据此设置预算
+    """
+    if callable(getattr(llm, 'stream', None)):
+        chunks = llm.stream(prompt, task_key=task_key) if task_key and hasattr(llm, 'resolve_max_tokens') \
+            else llm.stream(prompt)
+        for chunk in chunks:
+            text = _chunk_text(chunk)
+            if text:
+                yield text
+        return
+    if callable(getattr(llm, 'invoke', None)):
+        response = llm.invoke(prompt, task_key=task_key) if task_key and hasattr(llm, 'resolve_max_tokens') \
+            else llm.invoke(prompt)
+        yield _chunk_text(response)
+        return
+    if callable(getattr(llm, 'call', None)):
+        yield _chunk_text(llm.call(prompt))
+        return
+    yield _chunk_text(llm(prompt))
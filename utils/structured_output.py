@@ -0,0 +1,181 @@
+"""
+结构化输出
+
+按章节定义的轻量schema校验模型输出的JSON，并驱动"流式增量解析 + 局部重试"的生成流程：
+章节在流式输出过程中一闭合就被解析和校验，最终只针对缺失或未通过校验的章节重新请求，
+而不是重新生成整份文档
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from .json_stream import IncrementalJSONParser, SectionParseError
+from .streaming import stream_completion
+
+_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+}
+
+
+def validate_section(section_schema: Dict[str, Any], value: Any) -> List[str]:
+    """
+    按章节schema校验章节值，返回错误信息列表（为空表示通过）
+
+    章节schema格式：{"description": 说明, "fields": {字段名: 类型}, "required": [必填字段], "min_items": 最少条目数}
+    章节值应为对象数组
+    """
+    if isinstance(value, SectionParseError):
+        return [f"JSON解析失败: {value.message}"]
+    if not isinstance(value, list):
+        return ["章节值必须是数组"]
+
+    errors = []
+    min_items = section_schema.get("min_items", 1)
+    if len(value) < min_items:
+        errors.append(f"至少需要 {min_items} 个条目，实际 {len(value)} 个")
+
+    fields = section_schema.get("fields", {})
+    required = section_schema.get("required", list(fields))
+    for index, item in enumerate(value):
+        if not isinstance(item, dict):
+            errors.append(f"第 {index + 1} 个条目必须是对象")
+            continue
+        for field in required:
+            if item.get(field) in (None, "", []):
+                errors.append(f"第 {index + 1} 个条目缺少字段 {field}")
+        for field, field_type in fields.items():
+            if field in item and item[field] is not None and not _TYPE_CHECKS[field_type](item[field]):
+                errors.append(f"第 {index + 1} 个条目的字段 {field} 应为 {field_type}")
+    return errors
+
+
+def to_json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把章节schema转换为标准JSON Schema，可用于支持 response_format 的模型
+    """
+    properties = {}
+    for key, section in schema["sections"].items():
+        fields = section.get("fields", {})
+        properties[key] = {
+            "type": "array",
+            "description": section.get("description", ""),
+            "minItems": section.get("min_items", 1),
+            "items": {
+                "type": "object",
+                "properties": {field: {"type": field_type} for field, field_type in fields.items()},
+                "required": section.get("required", list(fields))
+            }
+        }
+    return {"type": "object", "properties": properties, "required": list(schema["sections"])}
+
+
+def render_schema_instructions(schema: Dict[str, Any], keys: Optional[List[str]] = None) -> str:
+    """
+    生成要求模型按schema输出JSON的提示说明
+    """
+    keys = keys or list(schema["sections"])
+    lines = [
+        "请只输出一个JSON对象，不要输出任何其他文字。JSON对象按以下顺序包含这些键，每个键的值是对象数组：",
+    ]
+    for key in keys:
+        section = schema["sections"][key]
+        fields = ', '.join(f'"{field}": {field_type}' for field, field_type in section.get("fields", {}).items())
+        lines.append(f'- "{key}"（{section.get("description", "")}）：每个条目包含 {{{fields}}}')
+    return '\n'.join(lines)
+
+
+class StructuredOutputRunner:
+    """
+    结构化输出生成器：流式增量解析，章节级校验与重试
+    """
+
+    def __init__(self, llm, schema: Dict[str, Any], max_retries: int = 2, task_key: Optional[str] = None):
+        self.llm = llm
+        self.schema = schema
+        self.max_retries = max_retries
+        self.task_key = task_key
+
+    def run(self, prompt: str, on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        生成结构化输出
+
+        on_section(键, 值) 在每个章节通过校验后立即回调。
+        返回字典包含 data（通过校验的章节）、errors（最终仍未通过的章节及错误）、
+        retried_sections（被重新请求过的章节）和 attempts（调用次数）
+        """
+        sections = self.schema["sections"]
+        data: Dict[str, Any] = {}
+        errors: Dict[str, List[str]] = {}
+        retried: List[str] = []
+
+        pending = list(sections)
+        request = f"{prompt}\n\n{render_schema_instructions(self.schema)}"
+        attempts = 0
+        while pending and attempts <= self.max_retries:
+            attempts += 1
+            # 局部重试的输出长度与完整输出不同，单独记录历史
+            task_key = self.task_key if attempts == 1 or not self.task_key else f"{self.task_key}:retry"
+            received = self._collect(request, task_key, pending, data, errors, on_section)
+            for key in pending:
+                if key not in received and key not in errors:
+                    errors[key] = ["输出中缺少该章节"]
+            pending = [key for key in pending if key not in data]
+            if pending and attempts <= self.max_retries:
+                retried.extend(key for key in pending if key not in retried)
+                request = self._build_retry_request(prompt, pending, errors)
+
+        return {
+            "data": data,
+            "errors": {key: errors[key] for key in sections if key not in data and key in errors},
+            "retried_sections": retried,
+            "attempts": attempts
+        }
+
+    def _collect(self, request: str, task_key: Optional[str], pending: List[str], data: Dict[str, Any],
+                 errors: Dict[str, List[str]], on_section: Optional[Callable[[str, Any], None]]) -> List[str]:
+        parser = IncrementalJSONParser()
+        received = []
+
+        def _accept(key: str, value: Any) -> None:
+            if key not in pending:
+                return
+            received.append(key)
+            section_errors = validate_section(self.schema["sections"][key], value)
+            if section_errors:
+                errors[key] = section_errors
+                return
+            data[key] = value
+            errors.pop(key, None)
+            if on_section:
+                on_section(key, value)
+
+        for chunk in stream_completion(self.llm, request, task_key=task_key):
+            for key, value in parser.feed(chunk):
+                _accept(key, value)
+            if parser.finished:
+                break
+        for key, value in parser.close():
+            _accept(key, value)
+        return received
+
+    def _build_retry_request(self, prompt: str, pending: List[str], errors: Dict[str, List[str]]) -> str:
+        problems = '\n'.join(
+            f'- "{key}": {"; ".join(errors.get(key, ["输出中缺少该章节"])[:5])}' for key in pending
+        )
+        return (
+            f"{prompt}\n\n以下章节在上一次输出中缺失或未通过校验：\n{problems}\n\n"
+            f"其余章节已经完成，请只重新生成这些章节。\n"
+            f"{render_schema_instructions(self.schema, pending)}"
+        )
+
+
+def dumps_structured(data: Dict[str, Any]) -> str:
+    """
+    把结构化输出序列化为便于阅读的JSON文本
+    """
+    return json.dumps(data, ensure_ascii=False, indent=2)
@@ -0,0 +1,80 @@
+"""
+文本处理工具
+
+提供token估算、文本规范化等轻量级辅助函数，不依赖任何第三方库
+"""
+
+import re
+from typing import List
+
+# CJK统一表意文字及常用全角标点
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+_NORMALIZE_PATTERN = re.compile(r'[\s\W_]+', re.UNICODE)
+_LIST_MARKER_PATTERN = re.compile(r'^\s*(?:(?:#{1,6}|\*\*|[-*+•]|\d+[.、)）]|[（(]\d+[)）])\s*)+')
+
+
+def count_cjk_chars(text: str) -> int:
+    """
+    统计文本中的CJK字符数量
+    """
+    return len(_CJK_PATTERN.findall(text or ""))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数量
+
+    中文字符按每字约1个token计算，其余字符按每4个字符约1个token计算，
+    用于分片和预算控制，不追求与具体模型分词器完全一致
+    """
+    if not text:
+        return 0
+    cjk = count_cjk_chars(text)
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化文本用于比较和去重：去掉列表标记、标点和空白并转为小写
+    """
+    text = _LIST_MARKER_PATTERN.sub('', text or '')
+    return _NORMALIZE_PATTERN.sub('', text).lower()
+
+
+def strip_list_marker(line: str) -> str:
+    """
+    去掉行首的列表标记（如 "- "、"1. "、"（2）"）
+    """
+    return _LIST_MARKER_PATTERN.sub('', line).strip()
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """
+    生成字符n-gram，适用于中英文混合文本的相似度计算
+    """
+    text = normalize_text(text)
+    if len(text) < n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def similarity(a: str, b: str, overlap: bool = False) -> float:
+    """
+    计算两段短文本的相似度，取值0~1
+
+    默认使用字符二元组Dice系数；overlap=True 时使用重叠系数（交集除以较小集合），
+    适合标题这类一方常常是另一方改写或缩写的场景
+    """
+    norm_a, norm_b = normalize_text(a), normalize_text(b)
+    if not norm_a or not norm_b:
+        return 0.0
+    if norm_a in norm_b or norm_b in norm_a:
+        return 1.0
+    grams_a, grams_b = set(char_ngrams(norm_a)), set(char_ngrams(norm_b))
+    if not grams_a or not grams_b:
+        return 0.0
+    common = len(grams_a & grams_b)
+    if overlap:
+        return common / min(len(grams_a), len(grams_b))
+    return 2 * common / (len(grams_a) + len(grams_b))
@@ -0,0 +1,117 @@
+"""
+任务计时与关键路径分析
+
+CrewAI的异步任务在 kickoff 时同时启动，完成时通过任务回调通知。
+TaskTimer 记录各任务的完成时刻，再结合任务依赖关系推算每个任务的开始时间、
+耗时以及整个任务图的关键路径
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class TaskTimer:
+    """
+    基于任务完成回调的计时器
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = None
+        self._ends: Dict[str, float] = {}
+
+    def start(self) -> None:
+        """
+        标记整个任务图开始执行
+        """
+        with self._lock:
+            self._start = time.perf_counter()
+            self._ends.clear()
+
+    def callback(self, name: str) -> Callable[[Any], None]:
+        """
+        生成可赋值给 Task.callback 的回调，任务完成时记录完成时刻
+        """
+        def _on_complete(_output: Any) -> None:
+            self.mark_end(name)
+        return _on_complete
+
+    def mark_end(self, name: str) -> None:
+        with self._lock:
+            if self._start is None:
+                self._start = time.perf_counter()
+            self._ends[name] = time.perf_counter() - self._start
+
+    def timings(self, dependencies: Dict[str, List[str]]) -> Dict[str, Dict[str, float]]:
+        """
+        根据依赖关系推算各任务的开始时间和耗时
+
+        任务的开始时间取其所有依赖任务完成时刻的最大值，没有依赖的任务从0开始
+        """
+        with self._lock:
+            ends = dict(self._ends)
+        result = {}
+        for name, end in ends.items():
+            start = max((ends.get(dep, 0.0) for dep in dependencies.get(name, [])), default=0.0)
+            result[name] = {"start": start, "end": end, "duration": max(0.0, end - start)}
+        return result
+
+
+def critical_path(durations: Dict[str, float], dependencies: Dict[str, List[str]]) -> Tuple[List[str], float]:
+    """
+    计算任务依赖图（DAG）上耗时最长的路径
+
+    返回 (关键路径上的任务名列表, 路径总耗时)
+    """
+    finish: Dict[str, float] = {}
+    previous: Dict[str, str] = {}
+
+    def _finish(name: str, visiting: frozenset) -> float:
+        if name in finish:
+            return finish[name]
+        if name in visiting:
+            raise ValueError(f"任务依赖存在环: {name}")
+        best, best_dep = 0.0, None
+        for dep in dependencies.get(name, []):
+            dep_finish = _finish(dep, visiting | {name})
+            if best_dep is None or dep_finish > best:
+                best, best_dep = dep_finish, dep
+        if best_dep is not None:
+            previous[name] = best_dep
+        finish[name] = best + durations.get(name, 0.0)
+        return finish[name]
+
+    for name in durations:
+        _finish(name, frozenset())
+    if not finish:
+        return [], 0.0
+
+    last = max(finish, key=finish.get)
+    path = [last]
+    while path[-1] in previous:
+        path.append(previous[path[-1]])
+    return list(reversed(path)), finish[last]
+
+
+def render_timing_report(timings: Dict[str, Dict[str, float]], path: List[str], total: float,
+                         labels: Optional[Dict[str, str]] = None) -> str:
+    """
+    渲染任务耗时表和关键路径的Markdown报告
+    """
+    labels = labels or {}
+    lines = [
+        "| 任务 | 开始(秒) | 结束(秒) | 耗时(秒) | 关键路径 |",
+        "| --- | --- | --- | --- | --- |"
+    ]
+    for name, timing in sorted(timings.items(), key=lambda item: item[1]["start"]):
+        flag = "✔" if name in path else ""
+        lines.append(
+            f"| {labels.get(name, name)} | {timing['start']:.2f} | {timing['end']:.2f} "
+            f"| {timing['duration']:.2f} | {flag} |"
+        )
+    sequential = sum(timing["duration"] for timing in timings.values())
+    lines.append("")
+    lines.append(f"关键路径：{' → '.join(labels.get(name, name) for name in path)}（{total:.2f} 秒）")
+    lines.append(f"串行执行预计耗时 {sequential:.2f} 秒")
+    return '\n'.join(lines)
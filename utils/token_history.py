@@ -0,0 +1,184 @@
+"""
+输出长度历史与自适应 max_tokens
+
+固定的 max_tokens 对短任务预留了过多预算，对长任务又会截断后重跑。
+TokenHistory 按 (任务工厂, 模型) 记录实际输出的token数，
+并以历史的高分位数乘以安全系数作为下一次调用的 max_tokens
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 用于识别文件是否已被替换的开头字节数，覆盖快照ID
+_HEAD_SIZE = 64
+
+
+def percentile(values: List[int], fraction: float) -> float:
+    """
+    计算分位数（最近秩法）
+    """
+    if not values:
+        raise ValueError("无法对空序列计算分位数")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class TokenHistory:
+    """
+    按任务和模型记录的输出长度历史，以JSON行文件持久化
+
+    文件由快照行 {"generation": 快照ID, "samples": {"任务|模型": [样本, ...]}}
+    和其后追加的样本行 {"key": "任务|模型", "tokens": 数量} 组成。
+    多个进程可共用同一文件：写入时在文件锁内读入其他进程追加的样本再追加一行；
+    追加的样本行超过 compact_every 后，把各键最近 window 个样本写成新的快照，
+    经同目录下的临时文件原子替换原文件
+    """
+
+    def __init__(self, path: Optional[str] = None, window: Optional[int] = None,
+                 compact_every: Optional[int] = None):
+        adaptive_config = Config.ADAPTIVE_TOKENS_CONFIG
+        self.path = path if path is not None else adaptive_config["history_path"]
+        self.window = window or adaptive_config["window"]
+        self.compact_every = compact_every or adaptive_config["compact_every"]
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[int]] = {}
+        # 已读入文件的开头（替换后的文件可能复用原inode，以快照ID区分）、读到的位置，以及最近一次快照之后的样本行数
+        self._head = b''
+        self._offset = 0
+        self._appended = 0
+        if self.path:
+            self._sync()
+
+    @staticmethod
+    def _key(task_key: str, model: str) -> str:
+        return f"{task_key}|{model}"
+
+    def _add(self, key: str, output_tokens: int) -> None:
+        samples = self._samples.setdefault(key, [])
+        samples.append(int(output_tokens))
+        del samples[:-self.window]
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        if "key" in entry and "tokens" in entry:
+            self._add(entry["key"], entry["tokens"])
+            self._appended += 1
+        else:
+            for key, samples in entry["samples"].items():
+                self._samples[key] = [int(value) for value in samples][-self.window:]
+
+    def _sync(self) -> None:
+        """
+        读入文件中尚未读取的完整行；文件已被其他进程压缩替换时重新读取
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            head = f.read(_HEAD_SIZE)
+            if size < self._offset or head[:len(self._head)] != self._head:
+                self._samples, self._offset, self._appended = {}, 0, 0
+            self._head = head
+            if size == self._offset:
+                return
+            f.seek(self._offset)
+            data = f.read()
+        # 只处理完整的行，其他进程正在写入的行留到下次读取
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].decode('utf-8').splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += end
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """
+        跨进程的写锁（不支持 fcntl 的平台上只在进程内加锁）
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def record(self, task_key: str, model: str, output_tokens: int) -> None:
+        """
+        记录一次调用的实际输出token数（含续写部分）
+        """
+        key = self._key(task_key, model)
+        with self._lock:
+            if not self.path:
+                self._add(key, output_tokens)
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._file_lock():
+                self._sync()
+                line = (json.dumps({"key": key, "tokens": int(output_tokens)}, ensure_ascii=False) + '\n')
+                with open(self.path, 'ab') as f:
+                    f.write(line.encode('utf-8'))
+                    self._offset = f.tell()
+                if not self._head:
+                    with open(self.path, 'rb') as f:
+                        self._head = f.read(_HEAD_SIZE)
+                self._add(key, output_tokens)
+                self._appended += 1
+                if self._appended >= self.compact_every:
+                    self._compact()
+
+    def samples(self, task_key: str, model: str) -> List[int]:
+        with self._lock:
+            if self.path:
+                self._sync()
+            return list(self._samples.get(self._key(task_key, model), []))
+
+    def suggest_max_tokens(self, task_key: str, model: str, default: Optional[int]) -> Optional[int]:
+        """
+        根据历史输出长度给出 max_tokens 建议值
+
+        样本不足时返回 default；否则取历史的高分位数乘以安全系数，并限制在配置的上下限之间
+        """
+        adaptive_config = Config.ADAPTIVE_TOKENS_CONFIG
+        samples = self.samples(task_key, model)
+        if len(samples) < adaptive_config["min_samples"]:
+            return default
+        suggested = percentile(samples, adaptive_config["percentile"]) * adaptive_config["safety_margin"]
+        return int(min(max(suggested, adaptive_config["min_tokens"]), adaptive_config["max_tokens"]))
+
+    def _compact(self) -> None:
+        """
+        在文件锁内把当前样本写成新的快照文件；临时文件建在同一目录，每个进程各自独立
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.',
+                                        prefix=f".{os.path.basename(self.path)}-", suffix='.tmp')
+        try:
+            snapshot = json.dumps({"generation": uuid.uuid4().hex, "samples": self._samples}, ensure_ascii=False)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(snapshot.encode('utf-8') + b'\n')
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        data = snapshot.encode('utf-8') + b'\n'
+        self._head, self._offset, self._appended = data[:_HEAD_SIZE], len(data), 0
@@ -2,8 +2,30 @@ from .software_development_workflow import (
     SoftwareDevelopmentWorkflow,
     create_software_development_workflow
 )
+from .code_review import ShardedCodeReview, split_code_files
+from .parallel import run_parallel
+from .testing_pipeline import TestingPipeline, render_latency_report
+from .regression import IncrementalRegression, RegressionBaseline, diff_components, index_by_component
+from .speculative import SpeculationStats, SpeculativeReviewRunner, review_requires_changes
+from .refinement import SectionRefiner
+from .template_cache import TemplateCache, merge_with_baseline
 
 __all__ = [
     'SoftwareDevelopmentWorkflow',
-    'create_software_development_workflow'
+    'create_software_development_workflow',
+    'ShardedCodeReview',
+    'split_code_files',
+    'run_parallel',
+    'TestingPipeline',
+    'render_latency_report',
+    'IncrementalRegression',
+    'RegressionBaseline',
+    'diff_components',
+    'index_by_component',
+    'SpeculationStats',
+    'SpeculativeReviewRunner',
+    'review_requires_changes',
+    'SectionRefiner',
+    'TemplateCache',
+    'merge_with_baseline'
 ]
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+分片并行代码审查
+
+大型变更集一次性交给 create_code_review_task 会撑满上下文窗口，耗时也随输入线性增长。
+这里按文件或模块把代码切分为受token预算约束的分片，各分片并行审查，
+最后按原有审查报告的章节结构合并结果并去除重复问题
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from crewai import Crew, Process
+
+from agents import create_developer
+from config import Config
+from observability import is_verbose
+from tasks import create_code_review_task
+from utils import estimate_tokens, extract_items, map_sections, normalize_text, parse_expected_sections, render_sections, similarity
+from .parallel import run_parallel
+
+# 识别代码文件边界的行模式，第一个捕获组为文件路径
+_FILE_HEADER_PATTERNS = [
+    re.compile(r'^diff --git a/(\S+) b/\S+'),
+    re.compile(r'^(?:#{1,6}\s*|//\s*|#\s*)?(?:文件|File|FILE|Path|路径)\s*[:：]\s*`?([^\s`]+)`?\s*$'),
+    re.compile(r'^={3,}\s*([^\s=]+)\s*={3,}\s*$'),
+    re.compile(r'^#{1,6}\s+`?([\w./\\-]+\.\w{1,8})`?\s*$'),
+    re.compile(r'^```\w*\s+(?:title=)?["\']?([\w./\\-]+\.\w{1,8})["\']?\s*$'),
+]
+
+# 合并后判定为重复问题的相似度阈值
+DUPLICATE_SIMILARITY = 0.9
+
+
+def split_code_files(code_files: str) -> List[Tuple[str, str]]:
+    """
+    按文件边界把代码文本拆分为 (文件路径, 内容) 列表
+
+    无法识别文件边界时整体作为一个名为 "code_files" 的单元返回
+    """
+    units: List[Tuple[str, List[str]]] = []
+    for line in (code_files or '').splitlines():
+        path = _match_file_header(line)
+        if path:
+            units.append((path, [line]))
+        elif units:
+            units[-1][1].append(line)
+        else:
+            units.append(('', [line]))
+
+    result = []
+    for path, lines in units:
+        content = '\n'.join(lines)
+        if not path:
+            # 第一个文件头之前的说明文字并入下一个单元，没有文件头时作为整体
+            if content.strip():
+                result.append(('code_files', content))
+            continue
+        if result and result[-1][0] == 'code_files' and len(units) > 1:
+            content = f"{result.pop()[1]}\n{content}"
+        result.append((path, content))
+    return result
+
+
+def _match_file_header(line: str) -> Optional[str]:
+    for pattern in _FILE_HEADER_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            return match.group(1).replace('\\', '/')
+    return None
+
+
+def _split_oversized(path: str, content: str, budget: int) -> List[Tuple[str, str]]:
+    """
+    把超出预算的单个文件按行切分为多个部分
+    """
+    parts: List[List[str]] = [[]]
+    tokens = 0
+    for line in content.splitlines():
+        line_tokens = estimate_tokens(line + '\n')
+        if parts[-1] and tokens + line_tokens > budget:
+            parts.append([])
+            tokens = 0
+        parts[-1].append(line)
+        tokens += line_tokens
+    if len(parts) == 1:
+        return [(path, content)]
+    return [(f"{path} (part {i}/{len(parts)})", '\n'.join(lines)) for i, lines in enumerate(parts, 1)]
+
+
+class ShardedCodeReview:
+    """
+    分片并行代码审查流水线
+    """
+
+    def __init__(self, llm, max_tokens_per_shard: Optional[int] = None, group_by: Optional[str] = None,
+                 max_workers: Optional[int] = None, parallel: Optional[bool] = None):
+        review_config = Config.CODE_REVIEW_CONFIG
+        self.llm = llm
+        self.max_tokens_per_shard = max_tokens_per_shard or review_config["max_tokens_per_shard"]
+        self.group_by = group_by or review_config["group_by"]
+        self.max_workers = max_workers
+        self.parallel = review_config["parallel"] if parallel is None else parallel
+        if self.group_by not in ("file", "module"):
+            raise ValueError(f"不支持的分片方式: {self.group_by}，可选值为 file 或 module")
+
+    def build_shards(self, code_files: str) -> List[Dict[str, Any]]:
+        """
+        把代码拆分为分片，每个分片包含若干完整文件且估算token数不超过预算
+        """
+        groups: Dict[str, List[Tuple[str, str]]] = {}
+        for path, content in split_code_files(code_files):
+            key = path if self.group_by == "file" else (os.path.dirname(path) or '.')
+            groups.setdefault(key, []).append((path, content))
+
+        units: List[Tuple[List[str], str, int]] = []
+        for members in groups.values():
+            content = '\n\n'.join(text for _, text in members)
+            tokens = estimate_tokens(content)
+            if tokens <= self.max_tokens_per_shard:
+                units.append(([path for path, _ in members], content, tokens))
+                continue
+            # 模块整体超出预算时逐个文件处理，单个文件仍超出时按行切分
+            for path, text in members:
+                text_tokens = estimate_tokens(text)
+                if text_tokens <= self.max_tokens_per_shard:
+                    units.append(([path], text, text_tokens))
+                    continue
+                for part_path, part in _split_oversized(path, text, self.max_tokens_per_shard):
+                    units.append(([part_path], part, estimate_tokens(part)))
+
+        shards: List[Dict[str, Any]] = []
+        for files, content, tokens in units:
+            if shards and shards[-1]["tokens"] + tokens <= self.max_tokens_per_shard:
+                shards[-1]["files"].extend(files)
+                shards[-1]["content"] += f"\n\n{content}"
+                shards[-1]["tokens"] += tokens
+            else:
+                shards.append({"index": len(shards) + 1, "files": list(files), "content": content, "tokens": tokens})
+        return shards
+
+    def review(self, code_files: str) -> Dict[str, Any]:
+        """
+        执行分片审查并合并结果
+
+        返回字典包含合并后的报告 report、各分片统计 shards、
+        并行执行总耗时 wall_time、去除的重复问题数 duplicates_removed，
+        以及审查失败的分片 failed_shards（非空时报告标注为未完成并列出未审查的文件）
+        """
+        shards = self.build_shards(code_files)
+        jobs = {}
+        section_titles: List[str] = []
+        for shard in shards:
+            # 每个分片使用独立的智能体，避免并发执行时共享智能体状态
+            agent = create_developer(self.llm)
+            task = create_code_review_task(agent=agent, code_files=shard["content"])
+            section_titles = section_titles or parse_expected_sections(task.expected_output)
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                process=Process.sequential,
+                verbose=is_verbose()
+            )
+            jobs[f"shard-{shard['index']}"] = crew.kickoff
+
+        records = run_parallel(jobs, self.max_workers, enabled=self.parallel)
+
+        shard_stats = []
+        outputs = []
+        failed = []
+        for shard in shards:
+            record = records[f"shard-{shard['index']}"]
+            shard_stats.append({
+                "index": shard["index"],
+                "files": shard["files"],
+                "tokens": shard["tokens"],
+                "duration": record["duration"],
+                "error": record["error"]
+            })
+            if record["error"] is None:
+                outputs.append((shard, str(record["output"])))
+            else:
+                failed.append(shard_stats[-1])
+
+        report, duplicates = self.consolidate(outputs, section_titles, failed)
+        wall_time = max((record["end"] for record in records.values()), default=0.0)
+        report += self._render_timing(shard_stats, wall_time)
+        return {
+            "report": report,
+            "shards": shard_stats,
+            "wall_time": wall_time,
+            "duplicates_removed": duplicates,
+            "failed_shards": failed
+        }
+
+    def consolidate(self, outputs: List[Tuple[Dict[str, Any], str]], section_titles: List[str],
+                    failed: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, int]:
+        """
+        按审查报告的章节结构合并各分片结果，去除重复的问题条目
+
+        failed 为审查失败的分片（含 index、files、error）：报告开头列出未审查的文件，
+        各章节标注为未完成，不把缺失的结果当作"未发现问题"
+        返回合并后的Markdown报告和被去除的重复条目数
+        """
+        merged: Dict[str, List[Tuple[str, List[int]]]] = {title: [] for title in section_titles}
+        others: List[Tuple[str, List[int]]] = []
+        duplicates = 0
+
+        for shard, output in outputs:
+            mapped, extras = map_sections(output, section_titles)
+            for title, body in mapped.items():
+                if body:
+                    duplicates += self._merge_items(merged[title], extract_items(body), shard["index"])
+            for heading, body in extras:
+                if heading:
+                    duplicates += self._merge_items(others, extract_items(f"**{heading}**\n{body}"), shard["index"])
+
+        sections = []
+        incomplete_note = ""
+        if failed:
+            indexes = ', '.join(str(stat["index"]) for stat in failed)
+            incomplete_note = f"⚠️ 未完成：分片 {indexes} 审查失败，本节不含这些分片中文件的问题。"
+        for title, items in merged.items():
+            if items:
+                body = self._render_items(items)
+                if incomplete_note:
+                    body += f"\n\n{incomplete_note}"
+            else:
+                body = incomplete_note or "未发现相关问题。"
+            sections.append((title, body))
+        if others:
+            sections.append(("其他审查意见", self._render_items(others)))
+        report = render_sections(sections, title="代码审查报告")
+        if failed:
+            # 未审查的文件列在标题之后，章节编号保持与审查报告模板一致
+            header, body = report.split('\n\n', 1)
+            warning = '\n'.join(
+                ["> ⚠️ 审查未完成，以下分片审查失败，其中的文件未经审查："] +
+                [f"> - 分片 {stat['index']}: {', '.join(stat['files'])}（{stat['error']}）" for stat in failed]
+            )
+            report = f"{header}\n\n{warning}\n\n{body}"
+        return report, duplicates
+
+    @staticmethod
+    def _merge_items(existing: List[Tuple[str, List[int]]], items: List[str], shard_index: int) -> int:
+        duplicates = 0
+        for item in items:
+            key = normalize_text(item)
+            for known, sources in existing:
+                if normalize_text(known) == key or similarity(known, item) >= DUPLICATE_SIMILARITY:
+                    if shard_index not in sources:
+                        sources.append(shard_index)
+                    duplicates += 1
+                    break
+            else:
+                existing.append((item, [shard_index]))
+        return duplicates
+
+    @staticmethod
+    def _render_items(items: List[Tuple[str, List[int]]]) -> str:
+        lines = []
+        for item, sources in items:
+            source = ', '.join(str(index) for index in sources)
+            lines.append(f"{item} _(分片 {source})_")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _render_timing(shard_stats: List[Dict[str, Any]], wall_time: float) -> str:
+        lines = [
+            "\n## 附录：分片审查统计\n",
+            "| 分片 | 文件 | 估算tokens | 耗时(秒) | 状态 |",
+            "| --- | --- | --- | --- | --- |"
+        ]
+        for stat in shard_stats:
+            status = "成功" if stat["error"] is None else f"失败: {stat['error']}"
+            files = ', '.join(stat["files"])
+            lines.append(f"| {stat['index']} | {files} | {stat['tokens']} | {stat['duration']:.2f} | {status} |")
+        total = sum(stat["duration"] for stat in shard_stats)
+        lines.append(f"\n并行总耗时 {wall_time:.2f} 秒，各分片耗时合计 {total:.2f} 秒。\n")
+        return '\n'.join(lines)
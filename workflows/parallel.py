@@ -0,0 +1,78 @@
+"""
+并行执行工具
+
+在线程池中并发执行多个Crew（或任意无参调用），并记录每个作业的开始、结束时间和耗时。
+CrewAI的 kickoff() 是阻塞调用，大部分时间花在等待模型响应上，因此线程池即可获得并发收益。
+作业在提交时的上下文副本中执行，继承当前的追踪span
+"""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+from observability import get_metrics_registry
+
+_metrics = get_metrics_registry()
+JOBS_QUEUED = _metrics.gauge("workflow_jobs_queued", "已提交、等待线程池执行的作业数")
+JOBS_RUNNING = _metrics.gauge("workflow_jobs_running", "正在执行的作业数")
+JOBS_COMPLETED = _metrics.counter("workflow_jobs_completed_total", "执行完成的作业数", ("status",))
+
+
+def get_max_workers(max_workers: Optional[int] = None, enabled: Optional[bool] = None) -> int:
+    """
+    根据工作流配置确定并发数；关闭并行执行时退化为串行
+    enabled 为None时按 WORKFLOW_CONFIG["enable_parallel_execution"] 决定是否并行
+    """
+    if enabled is None:
+        enabled = Config.WORKFLOW_CONFIG.get("enable_parallel_execution", False)
+    if not enabled:
+        return 1
+    if max_workers is None:
+        max_workers = Config.WORKFLOW_CONFIG.get("max_parallel_workers", 4)
+    return max(1, int(max_workers))
+
+
+def run_parallel(jobs: Dict[str, Callable[[], Any]], max_workers: Optional[int] = None,
+                 enabled: Optional[bool] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    并发执行一组作业
+
+    jobs 为 作业名 -> 无参调用。返回 作业名 -> 执行记录，记录包含：
+    output（返回值）、error（异常信息，成功时为None）、
+    start / end（相对于本批次开始的秒数）和 duration（耗时秒数）。
+    单个作业失败不会影响其他作业，结果顺序与 jobs 一致；
+    enabled 覆盖全局的并行开关（见 get_max_workers）
+    """
+    batch_start = time.perf_counter()
+
+    def _run(name: str, job: Callable[[], Any]) -> Dict[str, Any]:
+        JOBS_QUEUED.dec()
+        JOBS_RUNNING.inc()
+        start = time.perf_counter()
+        output, error = None, None
+        try:
+            output = job()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        JOBS_RUNNING.dec()
+        JOBS_COMPLETED.labels("error" if error else "ok").inc()
+        return {
+            "name": name,
+            "output": output,
+            "error": error,
+            "start": start - batch_start,
+            "end": end - batch_start,
+            "duration": end - start
+        }
+
+    workers = min(get_max_workers(max_workers, enabled), max(1, len(jobs)))
+    JOBS_QUEUED.inc(len(jobs))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, _run, name, job) for name, job in jobs.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
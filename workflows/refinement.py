@@ -0,0 +1,114 @@
+"""
+章节级重新生成
+
+PROJECT_CONFIG["quality_threshold"] 定义了质量门槛，但此前唯一的手段是重跑整个Crew。
+SectionRefiner 按 expected_output 的章节清单为阶段输出逐章节评分，
+只重新生成低于门槛的章节（以已通过的章节作为上下文），再拼接回原文档，
+修复成本只占完整重跑的一小部分
+"""
+
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from utils import estimate_tokens, map_sections, parse_expected_sections, render_sections
+from utils.quality import score_section
+from utils.sections import parse_heading
+from utils.streaming import stream_completion
+from .parallel import run_parallel
+
+
+class SectionRefiner:
+    """
+    阶段输出的章节级精修循环
+    """
+
+    def __init__(self, llm, threshold: Optional[float] = None, max_rounds: int = 2, min_tokens: int = 80):
+        self.llm = llm
+        self.threshold = threshold if threshold is not None else Config.PROJECT_CONFIG["quality_threshold"]
+        self.max_rounds = max_rounds
+        self.min_tokens = min_tokens
+
+    def refine(self, document: str, task_description: str, expected_output: str,
+               task_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        精修阶段输出
+
+        返回字典包含精修后的文档 output、精修前后的章节评分 scores_before / scores_after、
+        被重新生成的章节 regenerated、轮数 rounds，以及重新生成的输出token估算 tokens_regenerated
+        和整份文档的token估算 tokens_full（用于比较与完整重跑的成本）
+        """
+        titles = parse_expected_sections(expected_output)
+        mapped, extras = map_sections(document, titles)
+        sections: Dict[str, str] = {title: body or '' for title, body in mapped.items()}
+        scores = self._score(sections)
+        scores_before = dict(scores)
+
+        regenerated: List[str] = []
+        tokens_regenerated = 0
+        rounds = 0
+        while rounds < self.max_rounds:
+            failing = [title for title in titles if scores[title] < self.threshold]
+            if not failing:
+                break
+            rounds += 1
+            accepted = {title: body for title, body in sections.items() if title not in failing and body}
+            jobs = {
+                title: lambda title=title: self._regenerate(title, titles, accepted, task_description, task_key)
+                for title in failing
+            }
+            for title, record in run_parallel(jobs).items():
+                if record["error"] is not None or not record["output"]:
+                    continue
+                new_body = record["output"]
+                tokens_regenerated += estimate_tokens(new_body)
+                new_score = score_section(title, new_body, self.min_tokens)
+                # 只接受比原内容更好的结果
+                if new_score > scores[title]:
+                    sections[title] = new_body
+                    scores[title] = new_score
+                    if title not in regenerated:
+                        regenerated.append(title)
+
+        ordered = [(title, sections[title] or '（缺失）') for title in titles]
+        ordered += [(heading, body) for heading, body in extras if heading]
+        preamble = '\n\n'.join(body for heading, body in extras if not heading and body)
+        output = render_sections(ordered)
+        if preamble:
+            output = f"{preamble}\n\n{output}"
+
+        return {
+            "output": output,
+            "scores_before": scores_before,
+            "scores_after": scores,
+            "regenerated": regenerated,
+            "rounds": rounds,
+            "passed": all(score >= self.threshold for score in scores.values()),
+            "tokens_regenerated": tokens_regenerated,
+            "tokens_full": estimate_tokens(document)
+        }
+
+    def _score(self, sections: Dict[str, str]) -> Dict[str, float]:
+        return {title: score_section(title, body, self.min_tokens) for title, body in sections.items()}
+
+    def _regenerate(self, title: str, titles: List[str], accepted: Dict[str, str], task_description: str,
+                    task_key: Optional[str]) -> str:
+        number = titles.index(title) + 1
+        context = '\n\n'.join(
+            f"## {titles.index(name) + 1}. {name}\n{body}" for name, body in accepted.items()
+        ) or '（暂无）'
+        prompt = (
+            f"{task_description}\n\n"
+            f"文档中以下章节已经完成并通过评审，请保持与它们一致：\n{context}\n\n"
+            f"现在请只重新撰写第 {number} 章「{title}」，内容要具体、完整、有条理，"
+            f"以 \"## {number}. {title}\" 作为标题开头，不要输出其他章节。"
+        )
+        key = f"{task_key}:section" if task_key else None
+        text = ''.join(stream_completion(self.llm, prompt, task_key=key))
+        return self._strip_heading(text)
+
+    @staticmethod
+    def _strip_heading(text: str) -> str:
+        lines = text.strip().splitlines()
+        if lines and parse_heading(lines[0]) is not None:
+            lines = lines[1:]
+        return '\n'.join(lines).strip()
@@ -0,0 +1,219 @@
+"""
+增量回归测试
+
+create_regression_testing_task 每轮都会把完整的历史测试结果发送给模型，成本随项目规模增长。
+这里把历史测试结果按组件索引保存为基线，对每轮的变更做组件级结构化差异，
+只把受影响组件的历史结果和变更差异发送给模型，再把结果合并回基线，
+使每轮回归的成本与变更规模而不是项目规模成正比
+"""
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from crewai import Crew, Process
+
+from agents import create_test_engineer
+from config import Config
+from observability import is_verbose
+from tasks import create_regression_testing_task
+from utils import estimate_tokens, map_sections, split_sections
+
+logger = logging.getLogger(__name__)
+
+# 没有标题的内容归入的组件名
+GENERAL_COMPONENT = "通用"
+
+
+def index_by_component(document: str) -> Dict[str, str]:
+    """
+    按标题把文档索引为 组件名 -> 内容
+    """
+    index: Dict[str, str] = {}
+    for heading, body in split_sections(document):
+        name = heading or GENERAL_COMPONENT
+        index[name] = f"{index[name]}\n\n{body}".strip() if name in index else body
+    return index
+
+
+def diff_components(previous: Dict[str, str], current: Dict[str, str], complete: bool = False) -> Dict[str, Any]:
+    """
+    计算两个组件索引之间的结构化差异
+
+    complete=False 时 current 视为部分变更集，其中未出现的组件按未变更处理；
+    complete=True 时 current 视为完整文档，未出现的组件按已删除处理
+    """
+    added = [name for name in current if name not in previous]
+    modified = [name for name in current if name in previous and _digest(previous[name]) != _digest(current[name])]
+    removed = [name for name in previous if name not in current] if complete else []
+    unchanged = [name for name in previous if name not in modified and name not in removed]
+    patches = {}
+    for name in modified:
+        patches[name] = '\n'.join(difflib.unified_diff(
+            previous[name].splitlines(), current[name].splitlines(),
+            fromfile=f"{name} (旧)", tofile=f"{name} (新)", lineterm=''
+        ))
+    return {"added": added, "modified": modified, "removed": removed, "unchanged": unchanged, "patches": patches}
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+
+
+class RegressionBaseline:
+    """
+    按组件索引的回归测试基线
+
+    results 保存各组件最近一次的测试结果，specs 保存各组件最近一次的变更内容，
+    用于计算下一轮变更的差异。基线以JSON文件持久化
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.results: Dict[str, str] = {}
+        self.specs: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'RegressionBaseline':
+        baseline = cls(path)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            baseline.results = data.get("results", {})
+            baseline.specs = data.get("specs", {})
+        return baseline
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"results": self.results, "specs": self.specs}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_empty(self) -> bool:
+        return not self.results and not self.specs
+
+    def seed(self, previous_results: str, specs: Union[str, Dict[str, str]] = "") -> None:
+        """
+        用一份完整的历史测试结果（和对应的规格文档）初始化基线
+        """
+        self.results = index_by_component(previous_results)
+        self.specs = specs if isinstance(specs, dict) else index_by_component(specs) if specs else {}
+
+
+class IncrementalRegression:
+    """
+    差异驱动的回归测试
+    """
+
+    def __init__(self, llm, baseline: RegressionBaseline):
+        self.llm = llm
+        self.baseline = baseline
+
+    def run(self, new_changes: Union[str, Dict[str, str]], complete: bool = False) -> Dict[str, Any]:
+        """
+        执行一轮增量回归测试
+
+        new_changes 可以是Markdown文档（按标题划分组件）或 组件名 -> 内容 的字典。
+        返回本轮报告 report、受影响组件 affected、跳过的组件 skipped，
+        以及本轮发送的估算token数 prompt_tokens 和全量发送时的估算token数 full_tokens
+        """
+        current = new_changes if isinstance(new_changes, dict) else index_by_component(new_changes)
+        diff = diff_components(self.baseline.specs, current, complete=complete)
+        affected = diff["added"] + diff["modified"] + diff["removed"]
+
+        full_tokens = estimate_tokens('\n'.join(self.baseline.results.values())) + \
+            estimate_tokens('\n'.join(current.values()))
+        if not affected:
+            return {"report": "", "affected": [], "skipped": diff["unchanged"], "prompt_tokens": 0,
+                    "full_tokens": full_tokens}
+
+        previous_results = self._render_previous_results(affected)
+        changes = self._render_changes(diff, current)
+
+        agent = create_test_engineer(self.llm)
+        task = create_regression_testing_task(
+            agent=agent,
+            previous_results=previous_results,
+            new_changes=changes,
+            components=[name for name in affected if name not in diff["removed"]]
+        )
+        crew = Crew(
+            agents=[agent],
+            tasks=[task],
+            process=Process.sequential,
+            verbose=is_verbose()
+        )
+        report = str(crew.kickoff())
+
+        self._merge(report, diff, current)
+        self.baseline.save()
+        return {
+            "report": report,
+            "affected": affected,
+            "skipped": diff["unchanged"],
+            "prompt_tokens": estimate_tokens(previous_results) + estimate_tokens(changes),
+            "full_tokens": full_tokens
+        }
+
+    def _render_previous_results(self, affected: List[str]) -> str:
+        parts = []
+        for name in affected:
+            result = self.baseline.results.get(name)
+            parts.append(f"## {name}\n{result}" if result else f"## {name}\n（无历史测试结果）")
+        return '\n\n'.join(parts)
+
+    @staticmethod
+    def _render_changes(diff: Dict[str, Any], current: Dict[str, str]) -> str:
+        parts = []
+        for name in diff["added"]:
+            parts.append(f"## {name}（新增组件）\n{current[name]}")
+        for name in diff["modified"]:
+            parts.append(f"## {name}（变更差异）\n```diff\n{diff['patches'][name]}\n```")
+        for name in diff["removed"]:
+            parts.append(f"## {name}（已删除）")
+        return '\n\n'.join(parts)
+
+    def _merge(self, report: str, diff: Dict[str, Any], current: Dict[str, str]) -> None:
+        """
+        把本轮结果合并回基线：受影响组件的结果被替换，其余组件保持不变
+
+        报告中没有对应章节的组件保留原有结果，且不更新其规格，下一轮仍按变更重新测试；
+        不属于任何组件的内容（模型未按组件分节时为整份报告）只保存一份，追加到 GENERAL_COMPONENT 的已有内容之后
+        """
+        targets = diff["added"] + diff["modified"]
+        mapped, extras = map_sections(report, targets)
+        missing = []
+        for name in targets:
+            if mapped.get(name):
+                self.baseline.results[name] = mapped[name]
+                self.baseline.specs[name] = current[name]
+            else:
+                missing.append(name)
+        if missing:
+            logger.warning("回归报告中没有以下组件的章节，保留其原有结果: %s", ', '.join(missing))
+
+        unmapped = '\n\n'.join(
+            f"## {heading}\n{body}" if heading else body for heading, body in extras if body.strip()
+        ) if any(mapped.get(name) for name in targets) else report
+        if unmapped.strip():
+            previous = self.baseline.results.get(GENERAL_COMPONENT)
+            self.baseline.results[GENERAL_COMPONENT] = f"{previous}\n\n{unmapped}" if previous else unmapped
+        for name in diff["removed"]:
+            self.baseline.results.pop(name, None)
+            self.baseline.specs.pop(name, None)
+
+
+def get_baseline_path(project_id: str) -> str:
+    """
+    获取项目回归基线文件路径
+    """
+    safe_id = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in project_id)
+    return os.path.join(Config.REGRESSION_CONFIG["baseline_dir"], f"{safe_id}.json")
@@ -1,5 +1,11 @@
+import copy
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 from crewai import Crew, Process
-from typing import Union
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
 
 # 尝试导入不同的LLM提供商
 try:
@@ -24,21 +30,129 @@ from agents import (
 from tasks import (
     create_project_initiation_task,
     create_requirements_analysis_task,
+    create_requirements_review_task,
     create_system_design_task,
+    create_architecture_review_task,
     create_development_planning_task,
     create_code_implementation_task,
     create_test_planning_task,
-    create_deployment_planning_task
+    create_deployment_planning_task,
+    create_cicd_setup_task,
+    create_infrastructure_setup_task,
+    create_monitoring_setup_task,
+    create_security_hardening_task,
+    create_production_deployment_task,
+    create_structured_task,
+    get_structured_schema
 )
+from utils.timing import TaskTimer, critical_path, render_timing_report
+from .code_review import ShardedCodeReview
+from .testing_pipeline import TestingPipeline
+from .regression import IncrementalRegression, RegressionBaseline, get_baseline_path
+from .speculative import SpeculationStats, SpeculativeReviewRunner, review_requires_changes
+from .refinement import SectionRefiner
+from .template_cache import TEMPLATE_PHASES, TemplateCache, describe_template, merge_with_baseline
+from .parallel import run_parallel
+from utils import estimate_tokens, map_sections
+from utils.structured_output import StructuredOutputRunner
+from utils.section_monitor import generate_with_early_stop
+from utils.quality import LocalQualityScorer
+from utils.token_history import TokenHistory
+from config import Config, PROJECT_TEMPLATES
+from litellm_wrapper import install_llm_hooks
+from observability import (
+    NOOP_SPAN,
+    BudgetExceededError,
+    RunProfiler,
+    current_span,
+    get_metrics_registry,
+    get_tracer,
+    get_usage_tracker,
+    is_verbose,
+    profiling_enabled
+)
+from storage import (
+    ArtifactStore,
+    BoundedMemoryStorage,
+    ProjectIndex,
+    RunIndex,
+    StreamingResultWriter,
+    build_crew_memory,
+    new_run_id,
+    record_metric,
+    render_reference_projects
+)
+
+logger = logging.getLogger(__name__)
+
+_metrics = get_metrics_registry()
+PHASES_IN_PROGRESS = _metrics.gauge("phases_in_progress", "正在执行的阶段数", ("phase",))
+PHASE_DURATION = _metrics.histogram("phase_duration_seconds", "阶段执行耗时（秒）", ("phase", "status"))
+
+
+def _usage_source(agent: Any) -> Any:
+    """
+    智能体的token计数来源：CrewAI的LLM自带计数，其他模型由智能体的 _token_process 计数
+    """
+    llm = getattr(agent, 'llm', None)
+    if hasattr(llm, 'get_token_usage_summary'):
+        return llm
+    return getattr(agent, '_token_process', None)
+
+
+def _read_usage(source: Any) -> Optional[Tuple[int, int, int]]:
+    """
+    读取计数来源的累计 (输入token, 输出token, 成功调用数)，不支持时返回None
+    """
+    if hasattr(source, 'get_token_usage_summary'):
+        summary = source.get_token_usage_summary()
+    elif hasattr(source, 'get_summary'):
+        summary = source.get_summary()
+    else:
+        return None
+    return (int(getattr(summary, 'prompt_tokens', 0) or 0), int(getattr(summary, 'completion_tokens', 0) or 0),
+            int(getattr(summary, 'successful_requests', 0) or 0))
+
+# 部署扇出任务图：四个配置任务基于同一部署方案并行执行，结果汇总到生产部署任务
+DEPLOYMENT_FANOUT_DEPENDENCIES = {
+    'cicd': [],
+    'infrastructure': [],
+    'monitoring': [],
+    'security': [],
+    'production': ['cicd', 'infrastructure', 'monitoring', 'security']
+}
+
+DEPLOYMENT_FANOUT_LABELS = {
+    'cicd': 'CI/CD流水线搭建',
+    'infrastructure': '基础设施搭建',
+    'monitoring': '监控系统搭建',
+    'security': '安全加固',
+    'production': '生产环境部署'
+}
 
 class SoftwareDevelopmentWorkflow:
     """
     软件开发全流程工作流
     """
     
-    def __init__(self, llm):
+    def __init__(self, llm, memory_namespace: Optional[str] = None, token_history: Optional[TokenHistory] = None):
         self.llm = llm
+        # 提供输出长度历史时，阶段内智能体的 max_tokens 按历史输出长度自适应设置
+        self.token_history = token_history
+        # 智能体通过CrewAI的LLM调用 litellm.completion，由回调记录每次请求的指标和span
+        install_llm_hooks()
+        self.memory_namespace = memory_namespace or Config.MEMORY_CONFIG["namespace"]
         self.agents = self._create_agents()
+        self.speculation_stats = SpeculationStats()
+        self.quality_scorer = LocalQualityScorer()
+        self.run_id: Optional[str] = None
+        self.run_metadata: Dict[str, Any] = {}
+        self._artifact_store: Optional[ArtifactStore] = None
+        self._run_index: Optional[RunIndex] = None
+        self._run_span = NOOP_SPAN
+        self._profiler: Optional[RunProfiler] = None
+        # 最近一次结束的剖析（PROFILING_CONFIG 开启或使用 profile() 时）
+        self.last_profile: Optional[RunProfiler] = None
         
     def _create_agents(self):
         """
@@ -53,6 +167,309 @@ class SoftwareDevelopmentWorkflow:
             'devops_engineer': create_devops_engineer(self.llm)
         }
     
+    def _build_crew(self, **kwargs) -> Crew:
+        """
+        创建Crew，并按 CREW_CONFIG 和 MEMORY_CONFIG 挂载当前项目命名空间的记忆存储
+        """
+        crew_kwargs = build_crew_memory(self.memory_namespace)
+        crew_kwargs.setdefault('verbose', is_verbose())
+        crew_kwargs.update(kwargs)
+        return Crew(**crew_kwargs)
+    
+    def memory_metrics(self) -> Dict[str, Any]:
+        """
+        当前项目命名空间的记忆规模和检索延迟指标
+        """
+        return {
+            key: metrics for key, metrics in BoundedMemoryStorage.registry_metrics().items()
+            if key.startswith(f"{self.memory_namespace}/")
+        }
+    
+    @property
+    def artifact_store(self) -> ArtifactStore:
+        if self._artifact_store is None:
+            self._artifact_store = ArtifactStore()
+        return self._artifact_store
+    
+    @property
+    def run_index(self) -> RunIndex:
+        if self._run_index is None:
+            self._run_index = RunIndex()
+        return self._run_index
+    
+    @property
+    def model_name(self) -> str:
+        return str(getattr(self.llm, 'model', None) or getattr(self.llm, 'model_name', None) or '')
+    
+    def start_run(self, project: Optional[str] = None, run_id: Optional[str] = None,
+                  description: str = "", template: str = "") -> str:
+        """
+        开始一次新的运行，之后保存的阶段输出都记录到该运行的清单中
+        description 和 template 写入运行元数据，供历史运行检索使用
+        """
+        self.run_id = run_id or new_run_id(project)
+        self.run_metadata = {
+            key: value for key, value in (
+                ("project", project), ("description", description), ("template", template), ("model", self.model_name)
+            ) if value
+        }
+        if Config.RUN_INDEX_CONFIG["enabled"]:
+            self.run_index.index_run(self.run_id, **self.run_metadata)
+        self.finish_run()
+        self._run_span = get_tracer().start_span(
+            "workflow.run", kind="workflow",
+            attributes={"run_id": self.run_id, "project": project, "template": template}
+        )
+        if profiling_enabled():
+            self._profiler = RunProfiler(self.profile_dir(self.run_id)).start()
+        return self.run_id
+    
+    def finish_run(self) -> Optional[Dict[str, Any]]:
+        """
+        结束当前运行的根span并写出追踪数据，返回本次运行的用量汇总（阶段、智能体、项目累计）
+        开启了运行剖析时同时停止剖析并写出结果，见 last_profile
+        """
+        if self._run_span is not NOOP_SPAN:
+            self._run_span.end()
+            self._run_span = NOOP_SPAN
+        if self._profiler is not None:
+            self._profiler.stop()
+            logger.info("剖析结果已写入 %s", self._profiler.output_dir)
+            self.last_profile, self._profiler = self._profiler, None
+        if self.run_id is None:
+            return None
+        return get_usage_tracker().run_summary(self.run_id, self.run_metadata.get("project"))
+    
+    @staticmethod
+    def profile_dir(name: str) -> str:
+        return os.path.join(Config.PROFILING_CONFIG["output_dir"], name)
+    
+    @contextmanager
+    def profile(self, name: Optional[str] = None, **options: Any) -> Iterator[RunProfiler]:
+        """
+        剖析一段代码：CPU剖析、内存分配快照和墙钟折叠栈写入 <output_dir>/<name 或运行ID>/
+        options 传给 RunProfiler（cpu / memory / wall / interval）
+
+        with workflow.profile() as profiler:
+            workflow.run_phase("requirements", crew)
+        """
+        if self.run_id is None and name is None:
+            self.start_run()
+        profiler = RunProfiler(self.profile_dir(name or self.run_id), **options)
+        self.last_profile = profiler
+        with profiler:
+            yield profiler
+    
+    def record_phase_result(self, phase: str, output: Any, metadata: Optional[Dict[str, Any]] = None,
+                            seconds: float = 0.0, tokens: Optional[int] = None) -> Optional[str]:
+        """
+        按 WORKFLOW_CONFIG["auto_save_results"] 把阶段输出保存到产物存储，并更新历史运行检索索引
+        返回对象哈希，未开启自动保存时返回None
+        """
+        if self.run_id is None:
+            self.start_run()
+        text = str(output)
+        tokens = estimate_tokens(text) if tokens is None else tokens
+        digest = None
+        if Config.WORKFLOW_CONFIG["auto_save_results"]:
+            digest = self.artifact_store.save_phase(self.run_id, phase, text, {**self.run_metadata, **(metadata or {})},
+                                                    stats={"tokens": tokens, "seconds": round(seconds, 3)})
+        if Config.RUN_INDEX_CONFIG["enabled"]:
+            self.run_index.add_phase(self.run_id, phase, text, tokens=tokens, seconds=seconds,
+                                     model=self.model_name, digest=digest or "")
+        return digest
+    
+    def phase_output_path(self, phase: str) -> str:
+        """
+        阶段输出在运行目录中的路径：<output_dir>/<运行ID>/<阶段>.md
+        """
+        if self.run_id is None:
+            self.start_run()
+        return os.path.join(Config.RESULT_WRITER_CONFIG["output_dir"], self.run_id, f"{phase}.md")
+    
+    def open_phase_writer(self, phase: str) -> Optional[StreamingResultWriter]:
+        """
+        为阶段创建流式结果写入器；未开启流式写入时返回None
+        """
+        if not Config.RESULT_WRITER_CONFIG["enabled"]:
+            return None
+        return StreamingResultWriter(self.phase_output_path(phase))
+    
+    @contextmanager
+    def _phase_llms(self, crew: Crew, phase: str, downgrade_model: Optional[str]) -> Iterator[None]:
+        """
+        阶段执行期间把Crew中各智能体的LLM换成副本，结束后恢复：
+        downgrade_model 不为None时副本改用该模型（预算降级），智能体的LLM不支持替换模型时抛出 BudgetExceededError，
+        不在超出预算的情况下继续使用原模型；提供 token_history 时按该智能体在本阶段的历史输出长度放宽 max_tokens
+        """
+        if downgrade_model is None and self.token_history is None:
+            yield
+            return
+        originals = []
+        try:
+            for agent in crew.agents:
+                llm = getattr(agent, 'llm', None)
+                if not hasattr(llm, 'model'):
+                    if downgrade_model is not None:
+                        raise BudgetExceededError(f"运行 {self.run_id} 超出预算，且智能体 {agent.role} 的模型无法降级")
+                    continue
+                phase_llm = copy.copy(llm)
+                if downgrade_model is not None:
+                    phase_llm.model = downgrade_model
+                if self.token_history is not None and callable(getattr(phase_llm, 'call', None)):
+                    self._adapt_max_tokens(phase_llm, f"{phase}/{agent.role}")
+                originals.append((agent, llm))
+                agent.llm = phase_llm
+            if downgrade_model is not None:
+                get_usage_tracker().mark_downgraded(downgrade_model, run=self.run_id)
+            yield
+        finally:
+            for agent, llm in originals:
+                agent.llm = llm
+    
+    def _adapt_max_tokens(self, llm: Any, task_key: str) -> None:
+        """
+        按历史输出长度放宽 llm.max_tokens，并记录之后每次调用的输出长度
+
+        智能体的LLM只返回文本、没有截断续写，因此建议值只用于提高过小的上限，不会低于原有的 max_tokens；
+        原本没有上限时保持不设上限
+        """
+        history = self.token_history
+        model = str(llm.model)
+        original = getattr(llm, 'max_tokens', None)
+        if original is not None:
+            llm.max_tokens = max(original, history.suggest_max_tokens(task_key, model, default=original))
+        call = llm.call
+
+        def call_and_record(*args, **kwargs):
+            response = call(*args, **kwargs)
+            if isinstance(response, str):
+                history.record(task_key, model, estimate_tokens(response))
+            return response
+
+        llm.call = call_and_record
+    
+    def run_phase(self, phase: str, crew: Crew) -> Any:
+        """
+        执行阶段Crew并自动保存输出，返回 crew.kickoff() 的结果
+
+        开启流式写入时每个任务完成后立即把其输出追加到运行目录并同步到磁盘，
+        阶段中途失败时已完成任务的输出保留在 .partial 文件中
+        LLM用量按 运行 / 项目 / 阶段 归属，任务完成时按智能体LLM的token计数增量记到任务及其智能体；
+        运行超出预算时按 BUDGET_CONFIG 把本阶段的智能体降级到更便宜的模型，或不再执行
+        """
+        if self.run_id is None:
+            self.start_run()
+        tracer = get_tracer()
+        tracker = get_usage_tracker()
+        downgrade_model = tracker.check_budget(run=self.run_id)
+        writer = self.open_phase_writer(phase)
+        usage_scope = tracker.scope(run=self.run_id, project=self.run_metadata.get("project"), phase=phase)
+        with usage_scope, self._phase_llms(crew, phase, downgrade_model), \
+                tracer.span(f"phase.{phase}", kind="crew",
+                            parent=None if current_span().recording else self._run_span,
+                            run_id=self.run_id, phase=phase, template=self.run_metadata.get("template"),
+                            **{"gen_ai.request.model": downgrade_model or self.model_name,
+                               "crew.tasks": len(crew.tasks)}) as phase_span:
+            task_started = [time.time_ns()]
+            # 各计数来源在上一个任务完成（或阶段开始）时的累计用量，任务的用量为完成时的增量
+            sources = {id(source): source for source in map(_usage_source, crew.agents) if source is not None}
+            marks = {key: _read_usage(source) for key, source in sources.items()}
+            attributed = [False]
+            # 异步任务（如部署扇出）的回调在各自的线程中执行
+            callback_lock = threading.Lock()
+
+            def record_task_usage(task, latency: float) -> None:
+                agent = getattr(task, 'agent', None)
+                source = _usage_source(agent)
+                before = marks.get(id(source))
+                now = _read_usage(source)
+                if before is None or now is None:
+                    return
+                marks[id(source)] = now
+                prompt_tokens, completion_tokens, calls = (current - previous for current, previous in zip(now, before))
+                tracker.record(str(getattr(getattr(agent, 'llm', None), 'model', None) or self.model_name),
+                               prompt_tokens, completion_tokens, latency, agent=getattr(agent, 'role', ''),
+                               task=str(getattr(task, 'description', '')).strip()[:80], calls=calls)
+                attributed[0] = True
+
+            def make_callback(task, previous: Optional[Callable]) -> Callable:
+                def on_task_complete(task_output) -> None:
+                    with callback_lock:
+                        # 顺序执行时每个任务从上一个任务完成时开始
+                        end_ns = time.time_ns()
+                        tracer.record_span(
+                            "task", task_started[0], end_ns, kind="task", parent=phase_span,
+                            **{"agent.role": getattr(getattr(task, 'agent', None), 'role', ''),
+                               "task.description": str(getattr(task, 'description', '')).strip()[:80]}
+                        )
+                        record_task_usage(task, (end_ns - task_started[0]) / 1e9)
+                        task_started[0] = end_ns
+                        logger.debug("任务完成 [%s] %s:\n%s", phase, getattr(getattr(task, 'agent', None), 'role', ''),
+                                     task_output)
+                        if writer is not None:
+                            writer.write(f"{task_output}\n\n")
+                            writer.checkpoint()
+                    if previous is not None:
+                        previous(task_output)
+                return on_task_complete
+
+            for task in crew.tasks:
+                task.callback = make_callback(task, task.callback)
+
+            in_progress = PHASES_IN_PROGRESS.labels(phase)
+            in_progress.inc()
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    result = crew.kickoff()
+                else:
+                    with writer:
+                        result = crew.kickoff()
+            except Exception as e:
+                PHASE_DURATION.labels(phase, "error").observe(time.perf_counter() - started)
+                logger.error("阶段失败 run=%s phase=%s: %s", self.run_id, phase, e)
+                record_metric(
+                    "phase", run_id=self.run_id, phase=phase, model=self.model_name,
+                    template=self.run_metadata.get("template"), status="error", error=str(e),
+                    latency_ms=(time.perf_counter() - started) * 1000
+                )
+                raise
+            finally:
+                in_progress.dec()
+            seconds = time.perf_counter() - started
+            PHASE_DURATION.labels(phase, "ok").observe(seconds)
+            logger.info("阶段完成 run=%s phase=%s 耗时=%.1fs", self.run_id, phase, seconds)
+            self._record_kickoff(phase, result, seconds)
+            usage = getattr(result, 'token_usage', None)
+            phase_span.set_attribute("crew.total_tokens", getattr(usage, 'total_tokens', None))
+            # 最后一次任务完成之后仍有的调用（如异步任务交错执行）只记入阶段用量
+            for key, source in sources.items():
+                before, now = marks[key], _read_usage(source)
+                if before is not None and now is not None and now != before:
+                    tracker.record(downgrade_model or self.model_name, now[0] - before[0], now[1] - before[1],
+                                   calls=now[2] - before[2])
+                    attributed[0] = True
+            if not attributed[0] and usage is not None:
+                # 智能体不提供token计数时，以 CrewOutput.token_usage 记入阶段用量
+                tracker.record(downgrade_model or self.model_name, getattr(usage, 'prompt_tokens', 0),
+                               getattr(usage, 'completion_tokens', 0), seconds,
+                               calls=getattr(usage, 'successful_requests', 0) or 1)
+        return result
+    
+    def _record_kickoff(self, phase: str, result: Any, seconds: float) -> None:
+        # CrewOutput.token_usage 提供实际用量时优先使用，否则按输出长度估算
+        usage = getattr(result, 'token_usage', None)
+        tokens = getattr(usage, 'total_tokens', None) if usage is not None else None
+        self.record_phase_result(phase, result, seconds=seconds, tokens=tokens)
+        record_metric(
+            "phase", run_id=self.run_id, phase=phase, model=self.model_name,
+            template=self.run_metadata.get("template"), status="ok",
+            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+            completion_tokens=getattr(usage, 'completion_tokens', None),
+            total_tokens=tokens if tokens is not None else estimate_tokens(str(result)), latency_ms=seconds * 1000
+        )
+    
     def create_project_initiation_crew(self, project_description: str, stakeholder_info: str = ""):
         """
         创建项目启动阶段的Crew
@@ -63,43 +480,146 @@ class SoftwareDevelopmentWorkflow:
             stakeholder_info=stakeholder_info
         )
         
-        return Crew(
+        return self._build_crew(
             agents=[self.agents['project_manager']],
             tasks=[task],
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
         )
     
-    def create_requirements_analysis_crew(self, project_description: str):
+    def create_requirements_analysis_crew(self, project_description: str, reference_projects: str = ""):
         """
         创建需求分析阶段的Crew
+        reference_projects 为相似历史项目的摘录
         """
         task = create_requirements_analysis_task(
             agent=self.agents['requirements_analyst'],
-            project_description=project_description
+            project_description=project_description,
+            reference_projects=reference_projects
         )
         
-        return Crew(
+        return self._build_crew(
             agents=[self.agents['requirements_analyst']],
             tasks=[task],
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
+        )
+    
+    def run_requirements_analysis_with_references(self, project_description: str, project_id: Optional[str] = None,
+                                                  index: Optional[ProjectIndex] = None) -> Dict[str, Any]:
+        """
+        以相似历史项目为参考执行需求分析
+        从历史项目索引检索最相似的项目，把其摘录附加到提示中；提供 project_id 时把本次结果写回索引
+        """
+        index = index or ProjectIndex()
+        references = index.search(project_description, exclude=project_id)
+        crew = self.create_requirements_analysis_crew(
+            project_description,
+            reference_projects=render_reference_projects(references)
         )
+        output = str(crew.kickoff())
+        if project_id:
+            index.add(project_id, project_description, {'requirements': output}, reference_count=len(references))
+        return {
+            "output": output,
+            "references": [(reference["project_id"], reference["score"]) for reference in references]
+        }
+    
+    def index_project(self, project_id: str, project_description: str, phase_outputs: Dict[str, str],
+                      index: Optional[ProjectIndex] = None) -> None:
+        """
+        把已完成项目的描述和各阶段输出写入历史项目索引
+        """
+        (index or ProjectIndex()).add(project_id, project_description, phase_outputs)
     
-    def create_system_design_crew(self, requirements_doc: str):
+    def create_system_design_crew(self, requirements_doc: str, baseline: str = ""):
         """
         创建系统设计阶段的Crew
+        提供 baseline（模板基线）时只生成需要调整的章节
         """
         task = create_system_design_task(
             agent=self.agents['system_architect'],
+            requirements_doc=requirements_doc,
+            baseline=baseline
+        )
+        
+        return self._build_crew(
+            agents=[self.agents['system_architect']],
+            tasks=[task],
+            process=Process.sequential
+        )
+    
+    def create_requirements_review_crew(self, requirements_doc: str):
+        """
+        创建需求评审的Crew
+        """
+        task = create_requirements_review_task(
+            agent=self.agents['requirements_analyst'],
             requirements_doc=requirements_doc
         )
         
-        return Crew(
+        return self._build_crew(
+            agents=[self.agents['requirements_analyst']],
+            tasks=[task],
+            process=Process.sequential
+        )
+    
+    def create_architecture_review_crew(self, architecture_doc: str):
+        """
+        创建架构评审的Crew
+        """
+        task = create_architecture_review_task(
+            agent=self.agents['system_architect'],
+            architecture_doc=architecture_doc
+        )
+        
+        return self._build_crew(
             agents=[self.agents['system_architect']],
             tasks=[task],
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
+        )
+    
+    def run_requirements_review_speculatively(self, requirements_doc: str) -> Dict[str, Any]:
+        """
+        推测执行需求评审
+        需求评审与系统设计同时进行，评审要求重大修改时基于修订后的需求重新进行系统设计
+        """
+        def revise(document: str, review_output: str) -> str:
+            # 优先采用评审报告中给出的优化后需求文档
+            mapped, _ = map_sections(review_output, ["优化后的需求文档"])
+            if mapped["优化后的需求文档"]:
+                return mapped["优化后的需求文档"]
+            return f"{document}\n\n## 需求评审意见\n{review_output}"
+        
+        runner = SpeculativeReviewRunner(self.speculation_stats)
+        return runner.run(
+            requirements_doc,
+            review=lambda doc: str(self.create_requirements_review_crew(doc).kickoff()),
+            dependents={
+                'system_design': lambda doc: str(self.create_system_design_crew(doc).kickoff())
+            },
+            revise=revise
+        )
+    
+    def run_architecture_review_speculatively(self, architecture_doc: str, requirements_doc: str = "") -> Dict[str, Any]:
+        """
+        推测执行架构评审
+        架构评审与开发规划同时进行，评审要求重大修改时先修订架构，再重新进行开发规划
+        """
+        def revise(document: str, review_output: str) -> str:
+            if not requirements_doc:
+                return f"{document}\n\n## 架构评审意见\n{review_output}"
+            # 把评审意见作为约束，基于需求重新设计架构
+            return str(self.create_system_design_crew(
+                f"{requirements_doc}\n\n## 上一版架构的评审意见（必须处理）\n{review_output}"
+            ).kickoff())
+        
+        runner = SpeculativeReviewRunner(self.speculation_stats)
+        return runner.run(
+            architecture_doc,
+            review=lambda doc: str(self.create_architecture_review_crew(doc).kickoff()),
+            dependents={
+                'development_planning': lambda doc: str(self.create_development_crew(doc).kickoff())
+            },
+            revise=revise
         )
     
     def create_development_crew(self, technical_spec: str, module_spec: str = "", task_description: str = ""):
@@ -121,46 +641,284 @@ class SoftwareDevelopmentWorkflow:
             )
             tasks.append(implementation_task)
         
-        return Crew(
+        return self._build_crew(
             agents=[self.agents['developer']],
             tasks=tasks,
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
+        )
+    
+    def run_sharded_code_review(self, code_files: str, max_tokens_per_shard: Optional[int] = None,
+                                group_by: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分片并行审查大型代码变更集
+        按文件或模块切分代码，各分片并行审查后合并为一份去重的审查报告
+        """
+        pipeline = ShardedCodeReview(
+            self.llm,
+            max_tokens_per_shard=max_tokens_per_shard,
+            group_by=group_by
         )
+        return pipeline.review(code_files)
     
-    def create_testing_crew(self, requirements_doc: str, architecture_doc: str):
+    def create_testing_crew(self, requirements_doc: str, architecture_doc: str, baseline: str = ""):
         """
         创建测试阶段的Crew
+        提供 baseline（模板基线）时只生成需要调整的章节
         """
         task = create_test_planning_task(
             agent=self.agents['test_engineer'],
             requirements_doc=requirements_doc,
-            architecture_doc=architecture_doc
+            architecture_doc=architecture_doc,
+            baseline=baseline
         )
         
-        return Crew(
+        return self._build_crew(
             agents=[self.agents['test_engineer']],
             tasks=[task],
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
         )
     
-    def create_deployment_crew(self, architecture_doc: str, environment_requirements: str = ""):
+    def run_testing_pipeline(self, requirements_doc: str, architecture_doc: str,
+                             module_specs: Optional[Dict[str, str]] = None, performance_requirements: str = "",
+                             code_version: str = "", max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        执行测试子工作流
+        制定测试计划后按模块并行设计测试用例，并行进行性能测试设计，返回结果和各任务延迟
+        """
+        pipeline = TestingPipeline(self.llm, max_concurrency=max_concurrency)
+        return pipeline.run(
+            requirements_doc=requirements_doc,
+            architecture_doc=architecture_doc,
+            module_specs=module_specs,
+            performance_requirements=performance_requirements,
+            code_version=code_version
+        )
+    
+    def run_incremental_regression(self, project_id: str, new_changes: Union[str, Dict[str, str]],
+                                   previous_results: str = "", complete: bool = False) -> Dict[str, Any]:
+        """
+        执行增量回归测试
+        只把受变更影响的组件发送给模型，结果合并回该项目按组件索引的测试基线；
+        基线为空时使用 previous_results 初始化
+        """
+        baseline = RegressionBaseline.load(get_baseline_path(project_id))
+        if baseline.is_empty() and previous_results:
+            baseline.seed(previous_results)
+        return IncrementalRegression(self.llm, baseline).run(new_changes, complete=complete)
+    
+    def create_deployment_crew(self, architecture_doc: str, environment_requirements: str = "", baseline: str = ""):
         """
         创建部署阶段的Crew
+        提供 baseline（模板基线）时只生成需要调整的章节
         """
         task = create_deployment_planning_task(
             agent=self.agents['devops_engineer'],
             architecture_doc=architecture_doc,
-            environment_requirements=environment_requirements
+            environment_requirements=environment_requirements,
+            baseline=baseline
         )
         
-        return Crew(
+        return self._build_crew(
             agents=[self.agents['devops_engineer']],
             tasks=[task],
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
+        )
+    
+    def create_deployment_fanout_crew(self, deployment_plan: str, code_repository: str = "",
+                                      performance_requirements: str = "", security_requirements: str = "",
+                                      timer: Optional[TaskTimer] = None):
+        """
+        创建部署扇出阶段的Crew
+        CI/CD、基础设施、监控和安全加固四个任务基于同一部署方案异步并行执行，
+        其输出作为上下文汇总到生产环境部署任务
+        """
+        # 每个并行分支使用独立的DevOps智能体，避免并发任务共享智能体状态
+        branch_agents = {name: create_devops_engineer(self.llm) for name in DEPLOYMENT_FANOUT_LABELS}
+        
+        branch_tasks = {
+            'cicd': create_cicd_setup_task(
+                agent=branch_agents['cicd'],
+                deployment_plan=deployment_plan,
+                code_repository=code_repository
+            ),
+            'infrastructure': create_infrastructure_setup_task(
+                agent=branch_agents['infrastructure'],
+                deployment_architecture=deployment_plan
+            ),
+            'monitoring': create_monitoring_setup_task(
+                agent=branch_agents['monitoring'],
+                system_architecture=deployment_plan,
+                performance_requirements=performance_requirements
+            ),
+            'security': create_security_hardening_task(
+                agent=branch_agents['security'],
+                security_requirements=security_requirements,
+                deployment_config=deployment_plan
+            )
+        }
+        for task in branch_tasks.values():
+            task.async_execution = True
+        
+        production_task = create_production_deployment_task(
+            agent=branch_agents['production'],
+            deployment_package="见上下文中CI/CD、基础设施、监控和安全加固任务的输出",
+            environment_config=deployment_plan
         )
+        production_task.context = list(branch_tasks.values())
+        
+        if timer is not None:
+            for name, task in branch_tasks.items():
+                task.callback = timer.callback(name)
+            production_task.callback = timer.callback('production')
+        
+        return self._build_crew(
+            agents=list(branch_agents.values()),
+            tasks=list(branch_tasks.values()) + [production_task],
+            process=Process.sequential
+        )
+    
+    def run_deployment_fanout(self, deployment_plan: str, code_repository: str = "",
+                              performance_requirements: str = "", security_requirements: str = "") -> Dict[str, Any]:
+        """
+        执行部署扇出阶段并分析关键路径
+        与其他阶段一样经由 run_phase 执行（用量归属、预算降级、追踪、流式写入和产物保存），阶段名为 deployment_fanout；
+        返回生产部署结果、各任务耗时、关键路径及其Markdown报告
+        """
+        timer = TaskTimer()
+        crew = self.create_deployment_fanout_crew(
+            deployment_plan=deployment_plan,
+            code_repository=code_repository,
+            performance_requirements=performance_requirements,
+            security_requirements=security_requirements,
+            timer=timer
+        )
+        
+        timer.start()
+        result = self.run_phase("deployment_fanout", crew)
+        
+        timings = timer.timings(DEPLOYMENT_FANOUT_DEPENDENCIES)
+        durations = {name: timing["duration"] for name, timing in timings.items()}
+        path, total = critical_path(durations, DEPLOYMENT_FANOUT_DEPENDENCIES)
+        return {
+            "result": str(result),
+            "timings": timings,
+            "critical_path": path,
+            "critical_path_time": total,
+            "report": render_timing_report(timings, path, total, DEPLOYMENT_FANOUT_LABELS)
+        }
+    
+    def run_structured_task(self, factory: Callable, agent_key: str,
+                            on_section: Optional[Callable[[str, Any], None]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        以结构化输出模式执行任务
+        直接流式调用LLM，章节一生成完就解析校验并回调 on_section，
+        最终只重新请求缺失或未通过校验的章节
+        """
+        agent = self.agents[agent_key]
+        task = create_structured_task(factory, agent=agent, **kwargs)
+        runner = StructuredOutputRunner(self.llm, get_structured_schema(factory.__name__), task_key=factory.__name__)
+        prompt = f"你是{agent.role}。{agent.goal}\n{task.description}"
+        return runner.run(prompt, on_section=on_section)
+    
+    def run_task_with_early_stop(self, factory: Callable, agent_key: str, **kwargs) -> Dict[str, Any]:
+        """
+        流式执行任务，expected_output 列出的章节全部完成后提前终止生成
+        返回截至停止点的输出 output，以及章节完成情况和停止原因
+        """
+        agent = self.agents[agent_key]
+        task = factory(agent=agent, **kwargs)
+        prompt = f"你是{agent.role}。{agent.goal}\n{task.description}\n输出要求：{task.expected_output}"
+        return generate_with_early_stop(self.llm, prompt, task.expected_output, task_key=factory.__name__)
+    
+    def refine_phase_output(self, output: str, factory: Callable, agent_key: str, **kwargs) -> Dict[str, Any]:
+        """
+        章节级精修阶段输出
+        按任务的 expected_output 逐章节评分，只重新生成低于质量门槛的章节并拼接回原文档
+        """
+        agent = self.agents[agent_key]
+        task = factory(agent=agent, **kwargs)
+        refiner = SectionRefiner(self.llm)
+        return refiner.refine(
+            str(output),
+            task_description=f"你是{agent.role}。{agent.goal}\n{task.description}",
+            expected_output=task.expected_output,
+            task_key=factory.__name__
+        )
+    
+    def run_gated_review(self, document: str, create_review_crew: Callable[[str], Any],
+                         expected_output: str = "", name: str = "") -> Dict[str, Any]:
+        """
+        先做本地质量预检，再决定是否执行LLM评审
+        预检未通过（章节缺失、篇幅异常、语言不符、大量重复）时直接返回预检问题，不再调用评审Crew；
+        expected_output 为产出该文档的任务的输出要求，用于检查章节覆盖
+        """
+        local = self.quality_scorer.score(str(document), expected_output)
+        name = name or getattr(create_review_crew, '__name__', 'review')
+        if local["verdict"] == "reject":
+            self.quality_scorer.log(name, local)
+            return {"skipped_review": True, "local": local, "review": None, "requires_changes": True}
+        
+        review_output = str(create_review_crew(str(document)).kickoff())
+        requires_changes = review_requires_changes(review_output)
+        self.quality_scorer.log(name, local, review_verdict="需要重大修改" if requires_changes else "通过")
+        return {
+            "skipped_review": False,
+            "local": local,
+            "review": review_output,
+            "requires_changes": requires_changes
+        }
+    
+    def warm_template_cache(self, template_keys: Optional[list] = None, force: bool = False,
+                            cache: Optional[TemplateCache] = None) -> Dict[str, str]:
+        """
+        为项目模板预先生成系统设计、部署方案和测试计划基线
+        已有有效缓存的模板默认跳过，返回 模板 -> 缓存文件路径（跳过的模板为 "cached"）
+        """
+        cache = cache or TemplateCache()
+        results = {}
+        for template_key in template_keys or list(PROJECT_TEMPLATES):
+            if not force and cache.load(template_key) is not None:
+                results[template_key] = "cached"
+                continue
+            requirements_doc = describe_template(template_key)
+            architecture_doc = str(self.create_system_design_crew(requirements_doc).kickoff())
+            # 部署方案和测试计划只依赖架构设计，并行生成
+            records = run_parallel({
+                'deployment_plan': lambda: str(self.create_deployment_crew(architecture_doc).kickoff()),
+                'test_plan': lambda: str(self.create_testing_crew(requirements_doc, architecture_doc).kickoff())
+            })
+            for record in records.values():
+                if record["error"] is not None:
+                    raise RuntimeError(f"模板 {template_key} 的 {record['name']} 生成失败: {record['error']}")
+            results[template_key] = cache.save(template_key, {
+                'system_design': architecture_doc,
+                'deployment_plan': records['deployment_plan']["output"],
+                'test_plan': records['test_plan']["output"]
+            })
+        return results
+    
+    def run_phase_from_template(self, template_key: str, phase: str,
+                                cache: Optional[TemplateCache] = None, **kwargs) -> Dict[str, Any]:
+        """
+        以模板基线为起点执行阶段
+        phase 为 system_design / deployment_plan / test_plan，kwargs 为对应Crew的参数；
+        有可用基线时只请求需要调整的章节并拼接回基线，否则完整生成
+        """
+        if phase not in TEMPLATE_PHASES:
+            raise ValueError(f"不支持的模板阶段: {phase}")
+        crew_factories = {
+            'system_design': self.create_system_design_crew,
+            'deployment_plan': self.create_deployment_crew,
+            'test_plan': self.create_testing_crew
+        }
+        with get_tracer().span(f"phase.{phase}", kind="crew", phase=phase, template=template_key) as phase_span:
+            baseline = (cache or TemplateCache()).get_baseline(template_key, phase)
+            phase_span.increment("cache.hits" if baseline else "cache.misses")
+            crew = crew_factories[phase](baseline=baseline, **kwargs)
+            output = str(crew.kickoff())
+            if baseline:
+                output = merge_with_baseline(baseline, output, crew.tasks[0].expected_output)
+        return {"output": output, "baseline_used": bool(baseline)}
     
     def create_full_development_crew(self, project_description: str):
         """
@@ -203,7 +961,7 @@ class SoftwareDevelopmentWorkflow:
             environment_requirements=""
         )
         
-        return Crew(
+        return self._build_crew(
             agents=list(self.agents.values()),
             tasks=[
                 initiation_task,
@@ -213,12 +971,14 @@ class SoftwareDevelopmentWorkflow:
                 test_planning_task,
                 deployment_task
             ],
-            process=Process.sequential,
-            verbose=True
+            process=Process.sequential
         )
 
-def create_software_development_workflow(llm) -> SoftwareDevelopmentWorkflow:
+def create_software_development_workflow(llm, memory_namespace: Optional[str] = None,
+                                         token_history: Optional[TokenHistory] = None) -> SoftwareDevelopmentWorkflow:
     """
     创建软件开发工作流实例
+    memory_namespace 用于隔离不同项目的智能体记忆，默认使用 MEMORY_CONFIG["namespace"]
+    token_history 为输出长度历史，提供时各阶段智能体的 max_tokens 按历史自适应设置
     """
-    return SoftwareDevelopmentWorkflow(llm)
\ No newline at end of file
+    return SoftwareDevelopmentWorkflow(llm, memory_namespace=memory_namespace, token_history=token_history)
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+推测执行评审
+
+评审任务（需求评审、架构评审）与下一阶段串行执行会使该段耗时翻倍。
+推测执行模式下，下一阶段直接基于未评审的文档与评审同时运行；
+评审要求重大修改时，只有依赖该文档的工作被作废并基于修订后的文档重新执行。
+SpeculationStats 统计推测命中率以及节省的墙钟时间
+"""
+
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .parallel import run_parallel
+
+# 评审结论行，例如 "评审结论：需要重大修改"
+_VERDICT_PATTERN = re.compile(r'(?:评审|审查)结论[^\n:：]*[:：]?\s*([^\n]*)')
+_MATERIAL_CHANGE_MARKERS = ('需要重大修改', '重大修改', '不通过', '未通过', '驳回', '重新设计')
+_APPROVAL_MARKERS = ('通过', '批准', '无需修改')
+# 紧邻标记之前的否定词，例如 "无需重大修改"、"不需要重新设计"、"没有进行重大修改"
+_NEGATION_PATTERN = re.compile(r'(?:无需|无须|不需要|不需|不必|不用|没有|无|不|未)(?:进行|做|作)?$')
+
+
+def _mentions(text: str, markers) -> bool:
+    """
+    text 中出现未被否定的任一标记
+    """
+    for marker in markers:
+        start = text.find(marker)
+        while start != -1:
+            if not _NEGATION_PATTERN.search(text[max(0, start - 5):start]):
+                return True
+            start = text.find(marker, start + 1)
+    return False
+
+
+def review_requires_changes(review_output: str) -> bool:
+    """
+    判断评审结果是否要求对文档进行重大修改
+
+    优先解析评审结论；没有结论时，以正文中出现的重大修改标记为准。
+    被否定的标记（如 "通过，无需重大修改"）不计入
+    """
+    text = review_output or ''
+    for match in _VERDICT_PATTERN.finditer(text):
+        verdict = match.group(1).strip()
+        if not verdict:
+            # 结论可能写在标题的下一行
+            rest = text[match.end():].strip().splitlines()
+            verdict = rest[0] if rest else ''
+        if _mentions(verdict, _MATERIAL_CHANGE_MARKERS):
+            return True
+        if _mentions(verdict, _APPROVAL_MARKERS):
+            return False
+    return _mentions(text, _MATERIAL_CHANGE_MARKERS)
+
+
+class SpeculationStats:
+    """
+    推测执行统计：命中（评审通过，推测结果直接可用）与未命中（依赖工作需要重跑）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.time_saved = 0.0
+
+    def record(self, hit: bool, serial_time: float, actual_time: float) -> None:
+        with self._lock:
+            self.attempts += 1
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.time_saved += serial_time - actual_time
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+                "time_saved": self.time_saved
+            }
+
+
+class SpeculativeReviewRunner:
+    """
+    评审与下一阶段的推测执行器
+    """
+
+    def __init__(self, stats: Optional[SpeculationStats] = None):
+        self.stats = stats or SpeculationStats()
+
+    def run(self, document: str, review: Callable[[str], str], dependents: Dict[str, Callable[[str], str]],
+            revise: Callable[[str, str], str]) -> Dict[str, Any]:
+        """
+        推测执行一次评审
+
+        review(document) 返回评审结果；dependents 中的每个 依赖阶段名 -> 调用 以文档为输入；
+        revise(document, review_output) 返回修订后的文档。
+        返回字典包含评审结果 review、最终文档 document、各依赖阶段结果 outputs、
+        是否命中 hit 以及本次的耗时统计 timing
+        """
+        start = time.perf_counter()
+        jobs = {"review": lambda: review(document)}
+        for name, dependent in dependents.items():
+            jobs[name] = lambda dependent=dependent: dependent(document)
+        # 推测执行本身就是让评审与后续阶段同时运行，不受全局并行开关影响
+        records = run_parallel(jobs, max_workers=len(jobs), enabled=True)
+
+        if records["review"]["error"] is not None:
+            raise RuntimeError(f"评审执行失败: {records['review']['error']}")
+        review_output = str(records["review"]["output"])
+        review_time = records["review"]["duration"]
+        hit = not review_requires_changes(review_output)
+
+        outputs = {name: records[name]["output"] for name in dependents}
+        final_document = document
+        revise_time = 0.0
+        rerun_time = 0.0
+        if not hit:
+            revise_start = time.perf_counter()
+            final_document = revise(document, review_output)
+            revise_time = time.perf_counter() - revise_start
+            # 只有依赖评审文档的工作需要作废并重新执行
+            rerun = run_parallel(
+                {name: lambda dependent=dependent: dependent(final_document) for name, dependent in dependents.items()},
+                max_workers=len(dependents), enabled=True
+            )
+            rerun_time = max((record["end"] for record in rerun.values()), default=0.0)
+            records.update(rerun)
+            outputs = {name: record["output"] for name, record in rerun.items()}
+
+        failed = {name: records[name]["error"] for name in dependents if records[name]["error"] is not None}
+        if failed:
+            raise RuntimeError(f"依赖阶段执行失败: {failed}")
+
+        actual_time = time.perf_counter() - start
+        dependents_time = max((records[name]["duration"] for name in dependents), default=0.0)
+        # 串行执行时：先评审，（需要时）修订，再执行依赖阶段
+        serial_time = review_time + revise_time + (rerun_time if not hit else dependents_time)
+        self.stats.record(hit, serial_time, actual_time)
+
+        return {
+            "review": review_output,
+            "document": final_document,
+            "outputs": {name: str(output) for name, output in outputs.items()},
+            "hit": hit,
+            "timing": {
+                "review": review_time,
+                "dependents": dependents_time,
+                "revise": revise_time,
+                "rerun": rerun_time,
+                "actual": actual_time,
+                "serial_estimate": serial_time,
+                "saved": serial_time - actual_time
+            }
+        }
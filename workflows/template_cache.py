@@ -0,0 +1,120 @@
+"""
+项目模板预热缓存
+
+为 PROJECT_TEMPLATES 中的每种项目模板预先生成可复用的通用系统设计、部署方案和测试计划，
+并按模板持久化。同类型的新项目以缓存的基线为起点，只向模型请求需要调整的章节，
+再把调整结果拼接回基线
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import Config, PROJECT_TEMPLATES
+from observability import get_metrics_registry
+from utils import map_sections, parse_expected_sections, render_sections
+
+# 缓存格式或生成方式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+# 预热的阶段：阶段名 -> 说明
+TEMPLATE_PHASES = {
+    'system_design': '系统架构设计',
+    'deployment_plan': '部署方案',
+    'test_plan': '测试计划'
+}
+
+
+def template_fingerprint(template: Dict[str, Any]) -> str:
+    """
+    计算模板定义的指纹，模板内容变化时缓存自动失效
+    """
+    payload = json.dumps({"version": CACHE_VERSION, "template": template}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def describe_template(template_key: str) -> str:
+    """
+    根据模板定义生成通用的项目描述，作为预热生成的输入
+    """
+    template = PROJECT_TEMPLATES[template_key]
+    return (
+        f"{template['name']}：{template['description']}\n"
+        f"技术栈：{'、'.join(template['tech_stack'])}\n"
+        f"项目阶段：{' → '.join(template['phases'])}\n"
+        f"这是该类型项目的通用方案，不针对具体业务，请覆盖此类项目的常见需求和最佳实践。"
+    )
+
+
+def merge_with_baseline(baseline: str, delta: str, expected_output: str) -> str:
+    """
+    把模型输出的调整章节拼接回基线
+
+    按 expected_output 的章节清单逐章节合并：调整结果中出现的章节替换基线中的对应章节，
+    其余章节沿用基线内容
+    """
+    titles = parse_expected_sections(expected_output)
+    if not titles:
+        return delta or baseline
+    base_sections, _ = map_sections(baseline, titles)
+    if not any(base_sections.values()):
+        # 基线未按章节组织，无法逐章节合并
+        return delta or baseline
+    delta_sections, extras = map_sections(delta, titles)
+    merged = [(title, delta_sections[title] or base_sections[title] or '（缺失）') for title in titles]
+    merged += [(heading, body) for heading, body in extras if heading]
+    return render_sections(merged)
+
+
+CACHE_REQUESTS = get_metrics_registry().counter("cache_requests_total", "缓存查找次数", ("cache", "result"))
+
+
+class TemplateCache:
+    """
+    按项目模板存放的阶段基线，每个模板一个JSON文件
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or Config.TEMPLATE_CACHE_CONFIG["cache_dir"]
+
+    def _path(self, template_key: str) -> str:
+        return os.path.join(self.cache_dir, f"{template_key}.json")
+
+    def load(self, template_key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取模板缓存；缓存不存在或模板定义已变化时返回 None
+        """
+        path = self._path(template_key)
+        if template_key not in PROJECT_TEMPLATES or not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if entry.get("fingerprint") != template_fingerprint(PROJECT_TEMPLATES[template_key]):
+            return None
+        return entry
+
+    def get_baseline(self, template_key: str, phase: str) -> str:
+        """
+        获取某个模板某个阶段的基线，没有可用缓存时返回空字符串
+        """
+        entry = self.load(template_key)
+        baseline = entry["phases"].get(phase, "") if entry else ""
+        CACHE_REQUESTS.labels("template", "hit" if baseline else "miss").inc()
+        return baseline
+
+    def save(self, template_key: str, phases: Dict[str, str]) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "template": template_key,
+            "fingerprint": template_fingerprint(PROJECT_TEMPLATES[template_key]),
+            "created_at": datetime.now().isoformat(),
+            "phases": phases
+        }
+        path = self._path(template_key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,154 @@
+"""
+并行测试设计流水线
+
+先基于需求和架构文档制定测试计划，再以测试计划为输入，
+按模块并行设计测试用例，同时并行进行性能测试设计；
+提供代码版本时继续按模块并行执行测试。总并发数受 max_concurrency 限制
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+from crewai import Crew, Process
+
+from agents import create_test_engineer
+from config import Config
+from observability import is_verbose
+from tasks import (
+    create_test_planning_task,
+    create_test_case_design_task,
+    create_test_execution_task,
+    create_performance_testing_task
+)
+from utils import split_sections
+from .parallel import run_parallel
+
+
+def _single_task_crew(agent, task) -> Crew:
+    return Crew(
+        agents=[agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=is_verbose()
+    )
+
+
+def derive_module_specs(architecture_doc: str) -> Dict[str, str]:
+    """
+    未显式提供模块规格时，以架构文档的各章节作为模块规格
+    """
+    specs = {heading: body for heading, body in split_sections(architecture_doc) if heading and body}
+    return specs or {"system": architecture_doc}
+
+
+class TestingPipeline:
+    """
+    测试阶段子工作流
+    """
+
+    def __init__(self, llm, max_concurrency: Optional[int] = None):
+        self.llm = llm
+        self.max_concurrency = max_concurrency or Config.TESTING_PIPELINE_CONFIG["max_concurrency"]
+
+    def run(self, requirements_doc: str, architecture_doc: str, module_specs: Optional[Dict[str, str]] = None,
+            performance_requirements: str = "", code_version: str = "") -> Dict[str, Any]:
+        """
+        执行测试子工作流
+
+        返回字典包含测试计划 test_plan、各模块测试用例 test_cases、性能测试设计 performance、
+        各模块测试执行报告 executions（提供 code_version 时）以及延迟指标 metrics
+        """
+        module_specs = module_specs or derive_module_specs(architecture_doc)
+        metrics: List[Dict[str, Any]] = []
+        pipeline_start = time.perf_counter()
+
+        # 阶段1：测试计划，后续任务均依赖其输出
+        agent = create_test_engineer(self.llm)
+        planning_task = create_test_planning_task(
+            agent=agent,
+            requirements_doc=requirements_doc,
+            architecture_doc=architecture_doc
+        )
+        start = time.perf_counter()
+        test_plan = str(_single_task_crew(agent, planning_task).kickoff())
+        metrics.append(self._metric("test_planning", start - pipeline_start, time.perf_counter() - start))
+
+        # 阶段2：按模块扇出测试用例设计，性能测试设计与之并行
+        jobs = {}
+        for module, spec in module_specs.items():
+            agent = create_test_engineer(self.llm)
+            task = create_test_case_design_task(agent=agent, test_plan=test_plan, module_spec=spec)
+            jobs[f"test_case_design:{module}"] = _single_task_crew(agent, task).kickoff
+        agent = create_test_engineer(self.llm)
+        task = create_performance_testing_task(
+            agent=agent,
+            performance_requirements=performance_requirements or requirements_doc,
+            system_architecture=architecture_doc
+        )
+        jobs["performance_testing"] = _single_task_crew(agent, task).kickoff
+        design_records = self._run_stage(jobs, pipeline_start, metrics)
+
+        test_cases = {
+            module: design_records[f"test_case_design:{module}"]["output"]
+            for module in module_specs
+        }
+        performance = design_records["performance_testing"]["output"]
+
+        # 阶段3（可选）：按模块并行执行测试
+        executions = {}
+        if code_version:
+            jobs = {}
+            for module, cases in test_cases.items():
+                if cases is None:
+                    continue
+                agent = create_test_engineer(self.llm)
+                task = create_test_execution_task(agent=agent, test_cases=cases, code_version=code_version)
+                jobs[f"test_execution:{module}"] = _single_task_crew(agent, task).kickoff
+            execution_records = self._run_stage(jobs, pipeline_start, metrics)
+            executions = {name.split(':', 1)[1]: record["output"] for name, record in execution_records.items()}
+
+        wall_time = time.perf_counter() - pipeline_start
+        return {
+            "test_plan": test_plan,
+            "test_cases": test_cases,
+            "performance": performance,
+            "executions": executions,
+            "metrics": {
+                "tasks": metrics,
+                "wall_time": wall_time,
+                "task_time_total": sum(metric["duration"] for metric in metrics),
+                "max_concurrency": self.max_concurrency
+            }
+        }
+
+    def _run_stage(self, jobs: Dict[str, Any], pipeline_start: float, metrics: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        stage_offset = time.perf_counter() - pipeline_start
+        records = run_parallel(jobs, self.max_concurrency)
+        for name, record in records.items():
+            if record["output"] is not None:
+                record["output"] = str(record["output"])
+            metrics.append(self._metric(name, stage_offset + record["start"], record["duration"], record["error"]))
+        return records
+
+    @staticmethod
+    def _metric(name: str, start: float, duration: float, error: Optional[str] = None) -> Dict[str, Any]:
+        return {"task": name, "start": start, "duration": duration, "error": error}
+
+
+def render_latency_report(metrics: Dict[str, Any]) -> str:
+    """
+    渲染测试子工作流的任务延迟表
+    """
+    lines = [
+        "| 任务 | 开始(秒) | 耗时(秒) | 状态 |",
+        "| --- | --- | --- | --- |"
+    ]
+    for metric in metrics["tasks"]:
+        status = "成功" if metric["error"] is None else f"失败: {metric['error']}"
+        lines.append(f"| {metric['task']} | {metric['start']:.2f} | {metric['duration']:.2f} | {status} |")
+    lines.append("")
+    lines.append(
+        f"总耗时 {metrics['wall_time']:.2f} 秒，任务耗时合计 {metrics['task_time_total']:.2f} 秒，"
+        f"最大并发 {metrics['max_concurrency']}"
+    )
+    return '\n'.join(lines)